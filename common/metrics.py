@@ -0,0 +1,369 @@
+"""
+Prometheus metrics aggregated across processes through Redis.
+
+Every process (gunicorn/daphne workers, Celery workers) accumulates its
+samples in memory and a background thread adds them to Redis every
+METRICS_FLUSH_SECONDS, so recording a sample never touches the network.
+The metrics view renders the sum of every process in the Prometheus text
+exposition format.
+
+Gauges are not summed into a single field, since the value of a process
+that dies (ex: a worker killed with open WebSockets) would never be taken
+back: each process writes its own value and a heartbeat, and the values of
+processes silent for more than METRICS_PROCESS_TIMEOUT_SECONDS are dropped.
+"""
+
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "metrics"
+# processo -> timestamp do último flush (ver gauges)
+PROCESSES_KEY = f"{KEY_PREFIX}:processes"
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# buckets padrão (segundos), os mesmos do prometheus_client
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    7.5,
+    10.0,
+)
+
+
+class Metric:
+    """
+    A metric family. Samples are stored in the Redis hash metrics:<name>,
+    one field per label values (and bucket, for histograms, or process, for
+    gauges).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if kind == HISTOGRAM else ()
+
+    @property
+    def key(self) -> str:
+        return f"{KEY_PREFIX}:{self.name}"
+
+    def label_values(self, labels: dict) -> str:
+        return json.dumps([str(labels[name]) for name in self.labelnames])
+
+    def inc(self, amount: float = 1, **labels):
+        registry.add(self, self.label_values(labels), amount)
+
+    def dec(self, amount: float = 1, **labels):
+        registry.add(self, self.label_values(labels), -amount)
+
+    def observe(self, value: float, **labels):
+        values = self.label_values(labels)
+        # bucket não cumulativo; o render acumula
+        bucket = bisect_left(self.buckets, value)
+        registry.add(self, f"{values}|{bucket}", 1)
+        registry.add(self, f"{values}|sum", value)
+        registry.add(self, f"{values}|count", 1)
+
+    def render(self, fields: dict) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {escape_help(self.documentation)}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        if self.kind != HISTOGRAM:
+            for values, value in sorted(fields.items()):
+                lines.append(
+                    f"{self.name}{self.format_labels(values)} {format_value(value)}"
+                )
+            return lines
+
+        series = defaultdict(dict)
+        for field, value in fields.items():
+            values, _, suffix = field.rpartition("|")
+            series[values][suffix] = value
+
+        for values, samples in sorted(series.items()):
+            cumulative = 0
+            bounds = [*map(format_value, self.buckets), "+Inf"]
+            for bucket, bound in enumerate(bounds):
+                cumulative += samples.get(str(bucket), 0)
+                lines.append(
+                    f"{self.name}_bucket{self.format_labels(values, le=bound)} "
+                    f"{format_value(cumulative)}"
+                )
+            lines.append(
+                f"{self.name}_sum{self.format_labels(values)} "
+                f"{format_value(samples.get('sum', 0))}"
+            )
+            lines.append(
+                f"{self.name}_count{self.format_labels(values)} "
+                f"{format_value(samples.get('count', 0))}"
+            )
+        return lines
+
+    def format_labels(self, values: str, **extra) -> str:
+        pairs = [*zip(self.labelnames, json.loads(values)), *extra.items()]
+        if not pairs:
+            return ""
+        return (
+            "{"
+            + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs)
+            + "}"
+        )
+
+
+class MetricsRegistry:
+    """
+    Metric families of the service and the samples of this process waiting
+    to be flushed to Redis.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._pending = defaultdict(lambda: defaultdict(float))
+        # valores absolutos dos gauges deste processo, regravados a cada flush
+        self._gauges = defaultdict(lambda: defaultdict(float))
+        self._pid = None
+        self.process = None
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()):
+        return self.register(Metric(name, documentation, COUNTER, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()):
+        return self.register(Metric(name, documentation, GAUGE, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        return self.register(
+            Metric(name, documentation, HISTOGRAM, labelnames, buckets)
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return settings.METRICS_ENABLED
+
+    def add(self, metric: Metric, field: str, amount: float):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.check_process()
+            if metric.kind == GAUGE:
+                self._gauges[metric.key][field] += amount
+            else:
+                self._pending[metric.key][field] += amount
+
+    def check_process(self):
+        # processo filho (fork do gunicorn/celery): descarta o que era do pai
+        # e sobe o flusher deste processo. Chamado com o lock.
+        if self._pid == os.getpid():
+            return
+        self._pending.clear()
+        self._gauges.clear()
+        self._pid = os.getpid()
+        self.process = f"{socket.gethostname()}:{self._pid}"
+        threading.Thread(
+            target=self.flush_periodically, name="metrics-flusher", daemon=True
+        ).start()
+        atexit.register(self.shutdown)
+
+    def flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_SECONDS)
+            self.flush()
+
+    def flush(self):
+        """
+        Adds the samples accumulated by this process to Redis. On error
+        they are kept for the next flush.
+        """
+        with self._lock:
+            self.check_process()
+            pending, self._pending = self._pending, defaultdict(
+                lambda: defaultdict(float)
+            )
+            gauges = {
+                key: {
+                    f"{field}|{self.process}": value for field, value in fields.items()
+                }
+                for key, fields in self._gauges.items()
+            }
+        if not pending and not gauges:
+            return
+
+        try:
+            pipeline = get_redis_connection("default").pipeline(transaction=False)
+            if gauges:
+                # heartbeat antes dos valores: o render descarta valores sem ele
+                pipeline.hset(PROCESSES_KEY, self.process, time.time())
+                for key, fields in gauges.items():
+                    pipeline.hset(key, mapping=fields)
+            for key, fields in pending.items():
+                for field, amount in fields.items():
+                    if amount:
+                        pipeline.hincrbyfloat(key, field, amount)
+            pipeline.execute()
+        except RedisError:
+            logger.exception("Erro ao enviar métricas ao Redis")
+            with self._lock:
+                for key, fields in pending.items():
+                    for field, amount in fields.items():
+                        self._pending[key][field] += amount
+
+    def shutdown(self):
+        """
+        Flushes this process on exit and takes its gauge values back, so
+        they do not wait for the timeout.
+        """
+        self.flush()
+        if not self._gauges:
+            return
+        try:
+            pipeline = get_redis_connection("default").pipeline(transaction=False)
+            for key, fields in self._gauges.items():
+                pipeline.hdel(key, *(f"{field}|{self.process}" for field in fields))
+            pipeline.hdel(PROCESSES_KEY, self.process)
+            pipeline.execute()
+        except RedisError:
+            logger.exception("Erro ao remover gauges do processo")
+
+    def get_live_processes(self, redis) -> set[str]:
+        """
+        Processes that flushed within METRICS_PROCESS_TIMEOUT_SECONDS. The
+        heartbeats of the others are removed.
+        """
+        oldest = time.time() - settings.METRICS_PROCESS_TIMEOUT_SECONDS
+        live, dead = [], []
+        for process, seen in redis.hgetall(PROCESSES_KEY).items():
+            (live if float(seen) >= oldest else dead).append(process.decode())
+        if dead:
+            redis.hdel(PROCESSES_KEY, *dead)
+        return set(live)
+
+    def collect(self) -> dict[str, dict]:
+        """
+        Samples of every process, by metric name. Gauges are summed over the
+        live processes, and the values of dead processes are removed.
+        """
+        redis = get_redis_connection("default")
+        live = self.get_live_processes(redis)
+        pipeline = redis.pipeline(transaction=False)
+        for metric in self.metrics.values():
+            pipeline.hgetall(metric.key)
+
+        samples = {}
+        for metric, fields in zip(self.metrics.values(), pipeline.execute()):
+            fields = {field.decode(): float(value) for field, value in fields.items()}
+            if metric.kind == GAUGE:
+                fields = self.sum_gauge(redis, metric, fields, live)
+            samples[metric.name] = fields
+        return samples
+
+    @staticmethod
+    def sum_gauge(redis, metric: Metric, fields: dict, live: set[str]) -> dict:
+        totals, dead = defaultdict(float), []
+        for field, value in fields.items():
+            values, _, process = field.rpartition("|")
+            if process in live:
+                totals[values] += value
+            else:
+                dead.append(field)
+        if dead:
+            # um processo novo pode cair aqui antes do heartbeat: o próximo
+            # flush regrava o valor dele
+            redis.hdel(metric.key, *dead)
+        return totals
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (0.0.4).
+        """
+        self.flush()
+        samples = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines += metric.render(samples[name])
+        return "\n".join(lines) + "\n"
+
+
+def escape_help(text: str) -> str:
+    return text.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def escape_label(value: str) -> str:
+    return escape_help(value).replace('"', r"\"")
+
+
+def format_value(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = MetricsRegistry()
+
+pokeapi_cache_lookups = registry.counter(
+    "pokeapi_cache_lookups_total",
+    "Cache lookups of the PokeAPI helpers by outcome (hit, stale, miss).",
+    ("helper", "state"),
+)
+pokeapi_upstream_seconds = registry.histogram(
+    "pokeapi_upstream_request_seconds",
+    "Duration of PokeAPI requests (rate limit wait excluded), by service method.",
+    ("method", "outcome"),
+)
+celery_task_seconds = registry.histogram(
+    "celery_task_duration_seconds",
+    "Duration of Celery tasks by final state.",
+    ("task", "state"),
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+websocket_connections = registry.gauge(
+    "websocket_connections",
+    "Open WebSocket connections.",
+)
+websocket_connections_total = registry.counter(
+    "websocket_connections_total",
+    "WebSocket connections accepted.",
+)
@@ -29,6 +29,11 @@ class AbstractDatableModel(models.Model):
 
         if not incoming_updated_at:
             self.updated_at = timezone.now()
+            if updated_fields is not None:
+                updated_fields = [*updated_fields, "updated_at"]
+
+        if updated_fields is not None:
+            kwargs["update_fields"] = updated_fields
 
         super().save(*args, **kwargs)
 
@@ -1,3 +1,222 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django_redis.exceptions import ConnectionInterrupted
+
+from common.metrics import PROCESSES_KEY, registry, websocket_connections
+from common.utils.cache import cached
+from common.utils.requests import (
+    RETRY_ALL,
+    RETRY_CONNECT,
+    get_http_session,
+    get_retry,
+)
+from common.utils.task import acquire_locks
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class CachedTestCase(SimpleTestCase):
+    def test_lru_hit_and_eviction(self):
+        calls = []
+
+        @cached(maxsize=2)
+        def double(value):
+            calls.append(value)
+            return value * 2
+
+        self.assertEqual(double(1), 2)
+        self.assertEqual(double(1), 2)
+        self.assertEqual(calls, [1])
+
+        # 1 é o mais recente: o 2 sai quando o 3 entra
+        double(2)
+        double(1)
+        double(3)
+        double(1)
+        double(2)
+        self.assertEqual(calls, [1, 2, 3, 2])
+
+    def test_kwargs_are_part_of_the_key(self):
+        @cached()
+        def join(first, second="-"):
+            return f"{first}{second}"
+
+        self.assertEqual(join("a"), "a-")
+        self.assertEqual(join("a", second="+"), "a+")
+
+    def test_ttl_expiry(self):
+        calls = []
+
+        @cached(maxsize=10, ttl=0.05)
+        def load(value):
+            calls.append(value)
+            return value
+
+        load("a")
+        load("a")
+        time.sleep(0.1)
+        load("a")
+        self.assertEqual(calls, ["a", "a"])
+
+    def test_getsizeof_skips_values_larger_than_the_cache(self):
+        calls = []
+
+        @cached(maxsize=10, getsizeof=len)
+        def repeat(size):
+            calls.append(size)
+            return "x" * size
+
+        repeat(50)
+        repeat(50)
+        repeat(5)
+        repeat(5)
+        self.assertEqual(calls, [50, 50, 5])
+
+    def test_is_valid_rejection_recomputes(self):
+        @cached(is_valid=lambda path: os.path.exists(path))
+        def make_file():
+            fd, path = tempfile.mkstemp()
+            os.close(fd)
+            return path
+
+        first = make_file()
+        self.assertEqual(make_file(), first)
+
+        os.remove(first)
+        second = make_file()
+        self.addCleanup(os.remove, second)
+        self.assertNotEqual(second, first)
+
+    def test_unhashable_arguments_bypass_the_cache(self):
+        calls = []
+
+        @cached()
+        def total(values):
+            calls.append(values)
+            return sum(values)
+
+        self.assertEqual(total([1, 2]), 3)
+        self.assertEqual(total([1, 2]), 3)
+        self.assertEqual(len(calls), 2)
+
+    def test_exceptions_are_not_cached(self):
+        calls = []
+
+        @cached()
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ValueError("first call fails")
+            return "ok"
+
+        with self.assertRaises(ValueError):
+            flaky()
+        self.assertEqual(flaky(), "ok")
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_second_tier_is_shared(self):
+        calls = []
+
+        @cached(redis_ttl=60)
+        def convert(value):
+            calls.append(value)
+            return value.upper()
+
+        self.assertEqual(convert("a"), "A")
+        # outro processo: primeiro nível vazio, segundo nível preenchido
+        convert.cache_clear()
+        self.assertEqual(convert("a"), "A")
+        self.assertEqual(calls, ["a"])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_second_tier_down_falls_back_to_computing(self):
+        calls = []
+
+        @cached(redis_ttl=60)
+        def convert(value):
+            calls.append(value)
+            return value.upper()
+
+        error = ConnectionInterrupted(connection=None)
+        with (
+            mock.patch("common.utils.cache.django_cache.get", side_effect=error),
+            mock.patch("common.utils.cache.django_cache.set", side_effect=error),
+            self.assertLogs("common.utils.cache", level="ERROR"),
+        ):
+            self.assertEqual(convert("a"), "A")
+            # o primeiro nível continua funcionando
+            self.assertEqual(convert("a"), "A")
+        self.assertEqual(calls, ["a"])
+
+
+class GaugeTestCase(SimpleTestCase):
+    @override_settings(METRICS_PROCESS_TIMEOUT_SECONDS=60)
+    def test_dead_processes_are_reaped(self):
+        redis = mock.Mock()
+        redis.hgetall.return_value = {
+            b"web:1": str(time.time()).encode(),
+            b"web:2": str(time.time() - 120).encode(),
+        }
+
+        live = registry.get_live_processes(redis)
+        self.assertEqual(live, {"web:1"})
+        redis.hdel.assert_called_once_with(PROCESSES_KEY, "web:2")
+
+        redis.reset_mock()
+        fields = {"[]|web:1": 2.0, "[]|web:2": 5.0}
+        totals = registry.sum_gauge(redis, websocket_connections, fields, live)
+        self.assertEqual(totals, {"[]": 2.0})
+        redis.hdel.assert_called_once_with(websocket_connections.key, "[]|web:2")
+
+
+class RetryPolicyTestCase(SimpleTestCase):
+    def test_connect_policy_never_retries_answers(self):
+        retry = get_retry(RETRY_CONNECT)
+        self.assertFalse(retry.is_retry("GET", 429, has_retry_after=True))
+        self.assertFalse(retry.is_retry("GET", 503))
+        self.assertEqual(retry.read, 0)
+        self.assertTrue(retry.connect is None or retry.connect > 0)
+
+    def test_default_policy_retries_throttling(self):
+        self.assertTrue(get_retry(RETRY_ALL).is_retry("GET", 429))
+
+    def test_each_policy_has_its_own_session(self):
+        self.assertIsNot(get_http_session(RETRY_ALL), get_http_session(RETRY_CONNECT))
+        self.assertIs(get_http_session(RETRY_CONNECT), get_http_session(RETRY_CONNECT))
+
+
+class HttpSessionTestCase(SimpleTestCase):
+    def test_session_is_reused_within_the_process(self):
+        session = get_http_session()
+        self.assertIs(get_http_session(), session)
+
+    def test_session_is_recreated_after_a_fork(self):
+        session = get_http_session()
+        with mock.patch("common.utils.requests.os.getpid", return_value=-1):
+            forked = get_http_session()
+            self.assertIsNot(forked, session)
+            self.assertIs(get_http_session(), forked)
+
+    @override_settings(HTTP_POOL_MAXSIZE=7)
+    def test_session_pools_connections_and_retries(self):
+        with mock.patch("common.utils.requests.os.getpid", return_value=-2):
+            adapter = get_http_session().get_adapter("https://pokeapi.co/")
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertGreater(adapter.max_retries.total, 0)
+
+
+class AcquireLocksTestCase(SimpleTestCase):
+    def test_one_round_trip_for_every_lock(self):
+        redis = fakeredis.FakeRedis()
+        with mock.patch("common.utils.task.get_redis_connection", return_value=redis):
+            self.assertEqual(acquire_locks(["lock:a", "lock:b"]), [True, True])
+            self.assertEqual(acquire_locks(["lock:b", "lock:c"]), [False, True])
+        self.assertGreater(redis.ttl(cache.make_key("lock:a")), 0)
@@ -1,97 +1,76 @@
 # Imports para manter compatibilidade com código existente
 # Este arquivo permite que imports como "from common.utils import function_name" continuem funcionando
+#
+# Os submódulos são carregados sob demanda (PEP 562): importar common.utils não
+# carrega OpenCV, Tesseract, PyMuPDF, pandas e numpy, só o primeiro acesso a uma
+# função que precisa deles. Ver o comando benchmark_startup.
 
-# Base utilities (data manipulation, business days)
-from .base import (
-    is_business_day,
-    get_next_business_day,
-    get_next_month_day,
-    to_dict,
-    from_dict,
-    to_dataclass,
-    calendar,
-    T,
-)
+import importlib
 
-# Text processing
-from .text import (
-    sanitize_string,
-    estimate_strings_similarity,
-    replace_accents_characters,
-    normalize_mathematical_text,
-    format_phone_number,
-)
+# nome exportado -> submódulo que o define
+_EXPORTS = {
+    # Base utilities (data manipulation, business days)
+    "is_business_day": "base",
+    "get_next_business_day": "base",
+    "get_next_month_day": "base",
+    "to_dict": "base",
+    "from_dict": "base",
+    "to_dataclass": "base",
+    "calendar": "base",
+    "get_calendar": "base",
+    "T": "base",
+    # Caching
+    "cached": "cache",
+    # Text processing
+    "sanitize_string": "text",
+    "estimate_strings_similarity": "text",
+    "replace_accents_characters": "text",
+    "normalize_mathematical_text": "text",
+    "format_phone_number": "text",
+    # HTTP requests
+    "retry_on_failure": "requests",
+    "get_http_session": "requests",
+    "get_async_http_client": "requests",
+    "url_to_buffer": "requests",
+    "make_api_request": "requests",
+    "async_make_api_request": "requests",
+    "RETRY_ALL": "requests",
+    "RETRY_CONNECT": "requests",
+    "RETRY_NONE": "requests",
+    # Image processing
+    "extract_text_from_image": "image",
+    "enhance_image": "image",
+    # Audio and video processing removed - not needed for this project
+    # Document processing
+    "extract_text_from_pdf": "document",
+    "extract_text_from_docx": "document",
+    "extract_text_from_xlsx": "document",
+    "convert_document_url_to_text": "document",
+    # File handling
+    "save_tmp_file_from_url": "file",
+    # Task management
+    "is_task_running_or_waiting": "task",
+    "cancel_previous_tasks": "task",
+    "acquire_lock": "task",
+    "release_lock": "task",
+    "acquire_locks": "task",
+    "release_locks": "task",
+}
 
-# HTTP requests
-from .requests import (
-    retry_on_failure,
-    url_to_buffer,
-    make_api_request,
-)
-
-# Image processing
-from .image import (
-    extract_text_from_image,
-    enhance_image,
-)
-
-# Audio and video processing removed - not needed for this project
+# Manter todas as funções disponíveis no namespace principal
+__all__ = list(_EXPORTS)
 
-# Document processing
-from .document import (
-    extract_text_from_pdf,
-    extract_text_from_docx,
-    extract_text_from_xlsx,
-    convert_document_url_to_text,
-)
 
-# File handling
-from .file import save_tmp_file_from_url
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Task management
-from .task import (
-    is_task_running_or_waiting,
-    cancel_previous_tasks,
-    acquire_lock,
-    release_lock,
-)
+    module = importlib.import_module(f"{__name__}.{_EXPORTS[name]}")
+    value = getattr(module, name)
+    # próximos acessos não passam mais por aqui
+    globals()[name] = value
+    return value
 
 
-# Manter todas as funções disponíveis no namespace principal
-__all__ = [
-    # Base
-    "is_business_day",
-    "get_next_business_day",
-    "get_next_month_day",
-    "to_dict",
-    "from_dict",
-    "to_dataclass",
-    "calendar",
-    "T",
-    # Text
-    "sanitize_string",
-    "estimate_strings_similarity",
-    "replace_accents_characters",
-    "normalize_mathematical_text",
-    "format_phone_number",
-    # Requests
-    "retry_on_failure",
-    "url_to_buffer",
-    "make_api_request",
-    # Image
-    "extract_text_from_image",
-    "_looks_like_document",
-    "enhance_image",
-    # Document
-    "extract_text_from_pdf",
-    "extract_text_from_docx",
-    "extract_text_from_xlsx",
-    "convert_document_url_to_text",
-    # File
-    "save_tmp_file_from_url",
-    # Task
-    "is_task_running_or_waiting",
-    "cancel_previous_tasks",
-    "acquire_lock",
-    "release_lock",
-]
+def __dir__():
+    return sorted({*globals(), *__all__})
@@ -1,22 +1,36 @@
 import json
 import monthdelta
 from dataclasses import asdict
+from functools import cache
 from typing import Type, TypeVar, Union
-from bizdays import Calendar
 
 # Configurações globais
-calendar = Calendar.load("ANBIMA")
 T = TypeVar("T")
 
 
+@cache
+def get_calendar():
+    # bizdays carrega pandas e o calendário ANBIMA: só no primeiro uso
+    from bizdays import Calendar
+
+    return Calendar.load("ANBIMA")
+
+
+def __getattr__(name):
+    # compatibilidade com o antigo atributo de módulo "calendar"
+    if name == "calendar":
+        return get_calendar()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def is_business_day(date):
-    return calendar.isbizday(date)
+    return get_calendar().isbizday(date)
 
 
 def get_next_business_day(date):
     if is_business_day(date):
         return date
-    return calendar.offset(date, 1)
+    return get_calendar().offset(date, 1)
 
 
 def get_next_month_day(date, preffered_day=None):
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import threading
+from collections.abc import Callable
+from functools import wraps
+
+from cachetools import LRUCache, TTLCache
+from cachetools.keys import hashkey
+from django.core.cache import cache as django_cache
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# falhas do segundo nível: o django-redis embrulha as do redis-py
+REDIS_ERRORS = (ConnectionInterrupted, RedisError)
+
+
+def cached(
+    maxsize: int = 1024,
+    ttl: float | None = None,
+    redis_ttl: int | None = None,
+    getsizeof: Callable | None = None,
+    is_valid: Callable | None = None,
+):
+    """
+    Two-tier memoization decorator.
+
+    The first tier is a bounded in-process LRU: maxsize entries (or maxsize
+    units of getsizeof(value), ex: bytes) kept for ttl seconds (None: until
+    evicted). With redis_ttl, misses fall back to the Django cache (Redis),
+    shared by every process, before calling the function. Leave it unset
+    for cheap functions, so they never touch the network.
+
+    is_valid(value) can reject a cached value (ex: a temporary file that was
+    deleted), which is then recomputed. Exceptions are not cached, and calls
+    with unhashable arguments bypass the cache.
+    """
+
+    def decorator(func):
+        if ttl is None:
+            local = LRUCache(maxsize, getsizeof=getsizeof)
+        else:
+            local = TTLCache(maxsize, ttl, getsizeof=getsizeof)
+        lock = threading.Lock()
+        prefix = f"memo:{func.__module__}.{func.__qualname__}"
+
+        def get_redis_key(key) -> str:
+            return f"{prefix}:{hashlib.sha256(repr(key).encode()).hexdigest()}"
+
+        def lookup(key):
+            with lock:
+                value = local.get(key, _MISSING)
+            if value is not _MISSING and (is_valid is None or is_valid(value)):
+                return value
+
+            if redis_ttl:
+                try:
+                    value = django_cache.get(get_redis_key(key), _MISSING)
+                except REDIS_ERRORS:
+                    logger.exception(f"Erro ao ler cache de {func.__qualname__}")
+                    value = _MISSING
+                if value is not _MISSING and (is_valid is None or is_valid(value)):
+                    store_local(key, value)
+                    return value
+            return _MISSING
+
+        def store_local(key, value):
+            with lock:
+                try:
+                    local[key] = value
+                except ValueError:
+                    # maior que o cache inteiro: não guarda
+                    pass
+
+        def store(key, value):
+            store_local(key, value)
+            if redis_ttl:
+                try:
+                    django_cache.set(get_redis_key(key), value, redis_ttl)
+                except REDIS_ERRORS:
+                    logger.exception(f"Erro ao gravar cache de {func.__qualname__}")
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = hashkey(*args, **kwargs)
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+
+            value = lookup(key)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                store(key, value)
+            return value
+
+        def cache_clear():
+            """
+            Clears the in-process tier of this process.
+            """
+            with lock:
+                local.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
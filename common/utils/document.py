@@ -12,8 +12,8 @@ import docx
 import pandas as pd
 from typing import List, Tuple
 from io import BytesIO
-from memoize import memoize
 
+from common.utils.cache import cached
 from common.utils.image import enhance_image, extract_text_from_image
 from common.utils.requests import url_to_buffer
 
@@ -212,7 +212,8 @@ def extract_text_from_xlsx(file_content: bytes) -> str:
     return text
 
 
-@memoize()
+# conversão cara (OCR): compartilhada entre processos via Redis
+@cached(maxsize=128, ttl=60 * 5, redis_ttl=60 * 60)
 def convert_document_url_to_text(file_url: str) -> Tuple[str, str, list[str]]:
     """
     Converts a file URL to text.
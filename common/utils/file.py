@@ -1,14 +1,21 @@
+import os
 import tempfile
 import logging
 from typing import Tuple
-from memoize import memoize
 
+from common.utils.cache import cached
 from common.utils.requests import url_to_buffer
 
 logger = logging.getLogger(__name__)
 
 
-@memoize()
+# o caminho só vale nesta máquina: sem Redis, e refeito se o arquivo sumiu
+@cached(
+    maxsize=64 * 1024 * 1024,
+    ttl=60 * 5,
+    getsizeof=lambda value: len(value[1]),
+    is_valid=lambda value: os.path.exists(value[0]),
+)
 def save_tmp_file_from_url(media_url: str) -> Tuple[str, bytes]:
     content, _ = url_to_buffer(media_url)
     with tempfile.NamedTemporaryFile(delete=False, suffix=".in") as tmp_in:
@@ -1,12 +1,147 @@
+import os
 import time
+import random
+import asyncio
 import logging
+import threading
+import weakref
+import httpx
 import requests
 from functools import wraps
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError
-from memoize import memoize
+from urllib3.util.retry import Retry
+
+from common.utils.cache import cached
 
 logger = logging.getLogger(__name__)
 
+_sessions = {}
+_sessions_pid = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+# respostas e métodos em que uma nova tentativa é segura
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = {"get", "put", "delete"}
+
+# políticas de retry do transporte
+RETRY_ALL = "all"  # erros de conexão e respostas 429/5xx
+RETRY_CONNECT = "connect"  # só falhas ao conectar, que não chegam ao servidor
+RETRY_NONE = "none"
+
+
+class JitteredRetry(Retry):
+    """
+    Retry com backoff exponencial e jitter completo, para que clientes que
+    falharam juntos não tentem novamente ao mesmo tempo.
+    """
+
+    def get_backoff_time(self):
+        return random.uniform(0, super().get_backoff_time())
+
+
+def get_retry(retry: str) -> Retry:
+    """
+    Returns:
+        Retry: Retry do urllib3 para a política retry (RETRY_*)
+    """
+    if retry == RETRY_NONE:
+        return Retry(total=0, read=False, redirect=False, raise_on_status=False)
+    if retry == RETRY_CONNECT:
+        return JitteredRetry(
+            total=settings.HTTP_MAX_RETRIES,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=settings.HTTP_RETRY_BACKOFF_FACTOR,
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+    return JitteredRetry(
+        total=settings.HTTP_MAX_RETRIES,
+        backoff_factor=settings.HTTP_RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        raise_on_status=False,
+    )
+
+
+def get_http_session(retry: str = RETRY_ALL) -> requests.Session:
+    """
+    Retorna a sessão HTTP compartilhada pelo processo para a política de
+    retry, com pool de conexões keep-alive e retry com backoff nos métodos
+    idempotentes.
+
+    A sessão é recriada após um fork (workers do Celery/gunicorn), pois
+    conexões abertas não podem ser compartilhadas entre processos.
+
+    Args:
+        retry: Política de retry (RETRY_ALL, RETRY_CONNECT ou RETRY_NONE)
+
+    Returns:
+        requests.Session: Sessão HTTP do processo
+    """
+    global _sessions, _sessions_pid
+
+    session = _sessions.get(retry) if _sessions_pid == os.getpid() else None
+    if session is None:
+        with _session_lock:
+            if _sessions_pid != os.getpid():
+                _sessions, _sessions_pid = {}, os.getpid()
+            session = _sessions.get(retry)
+            if session is None:
+                adapter = HTTPAdapter(
+                    pool_connections=settings.HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+                    max_retries=get_retry(retry),
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[retry] = session
+
+    return session
+
+
+def get_default_timeout() -> tuple[float, float]:
+    """
+    Returns:
+        tuple[float, float]: Timeouts (conexão, leitura) padrão em segundos
+    """
+    return settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Retorna o cliente HTTP assíncrono do event loop atual, com pool de
+    conexões keep-alive compartilhado pelas requisições do loop.
+
+    Returns:
+        httpx.AsyncClient: Cliente HTTP do event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        connect_timeout, read_timeout = get_default_timeout()
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_POOL_MAXSIZE,
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def get_retry_backoff(attempt: int) -> float:
+    """
+    Returns:
+        float: Espera (com jitter completo) antes da tentativa attempt + 1
+    """
+    return random.uniform(0, settings.HTTP_RETRY_BACKOFF_FACTOR * (2**attempt))
+
 
 def retry_on_failure(max_retries=3, delay=3):
     """
@@ -41,7 +176,8 @@ def retry_on_failure(max_retries=3, delay=3):
     return decorator
 
 
-@memoize()
+# downloads ficam só em memória local (até 64 MB por processo)
+@cached(maxsize=64 * 1024 * 1024, ttl=60 * 5, getsizeof=lambda value: len(value[0]))
 def url_to_buffer(url: str, timeout: int = 30) -> tuple[bytes, dict]:
     """
     Baixa o conteúdo de um URL e retorna o conteúdo e os headers.
@@ -52,7 +188,7 @@ def url_to_buffer(url: str, timeout: int = 30) -> tuple[bytes, dict]:
     Returns:
         tuple[bytes, dict]: Conteúdo e headers do arquivo
     """
-    response = requests.get(url, timeout=timeout)
+    response = get_http_session().get(url, timeout=timeout)
     response.raise_for_status()
     return response.content, response.headers
 
@@ -64,6 +200,9 @@ def make_api_request(
     url: str = None,
     headers: dict = None,
     log_prefix="API",
+    return_headers: bool = False,
+    timeout: float | tuple[float, float] = None,
+    retry: str = RETRY_ALL,
 ):
     """
     Realiza uma requisição à API e trata os erros de forma padronizada.
@@ -75,22 +214,30 @@ def make_api_request(
         url (str, optional): URL base da API
         headers (dict, optional): Cabeçalhos da requisição
         log_prefix (str, optional): Prefixo para as mensagens de log
+        return_headers (bool, optional): Inclui os cabeçalhos da resposta no retorno
+        timeout (float | tuple, optional): Timeout ou (conexão, leitura) em segundos.
+            Padrão: HTTP_CONNECT_TIMEOUT/HTTP_READ_TIMEOUT
+        retry (str, optional): Política de retry do transporte (RETRY_*)
 
     Returns:
-        dict or False: Resposta da API em caso de sucesso ou False em caso de erro
+        tuple: (resposta da API, status) em caso de sucesso ou (False, status) em
+        caso de erro (status None quando não houve resposta). A resposta é None
+        em 304 Not Modified. Com return_headers, (resposta, status, cabeçalhos).
     """
     method = method.lower()
+    session = get_http_session(retry)
     request_methods = {
-        "get": requests.get,
-        "post": requests.post,
-        "put": requests.put,
-        "patch": requests.patch,
-        "delete": requests.delete,
+        "get": session.get,
+        "post": session.post,
+        "put": session.put,
+        "patch": session.patch,
+        "delete": session.delete,
     }
+    timeout = timeout if timeout is not None else get_default_timeout()
 
     if method not in request_methods:
         logging.error(f"Método HTTP inválido: {method}")
-        return False
+        return (False, None, {}) if return_headers else (False, None)
 
     request_func = request_methods[method]
 
@@ -103,13 +250,24 @@ def make_api_request(
 
         # Fazer a requisição com os parâmetros apropriados
         if payload and params:
-            response = request_func(url, json=payload, params=params, headers=headers)
+            response = request_func(
+                url, json=payload, params=params, headers=headers, timeout=timeout
+            )
         elif payload:
-            response = request_func(url, json=payload, headers=headers)
+            response = request_func(url, json=payload, headers=headers, timeout=timeout)
         elif params:
-            response = request_func(url, params=params, headers=headers)
+            response = request_func(
+                url, params=params, headers=headers, timeout=timeout
+            )
         else:
-            response = request_func(url, headers=headers)
+            response = request_func(url, headers=headers, timeout=timeout)
+
+        # 304: o conteúdo não mudou desde a última requisição condicional
+        if response.status_code == 304:
+            logging.debug(f"{log_prefix}: Conteúdo não modificado (304)")
+            if return_headers:
+                return None, response.status_code, response.headers
+            return None, response.status_code
 
         # Registrar resposta antes de verificar o status
         try:
@@ -122,6 +280,8 @@ def make_api_request(
         response.raise_for_status()
 
         # Se chegou aqui, a requisição foi bem-sucedida
+        if return_headers:
+            return response.json(), response.status_code, response.headers
         return response.json(), response.status_code
 
     except requests.exceptions.RequestException as e:
@@ -137,4 +297,96 @@ def make_api_request(
                 error_message += f" - Resposta: {e.response.text}"
 
         logging.error(error_message)
-        return False, e.response.status_code
+        status_code = getattr(e.response, "status_code", None)
+        if return_headers:
+            return False, status_code, getattr(e.response, "headers", None) or {}
+        return False, status_code
+
+
+async def async_make_api_request(
+    method: str,
+    payload=None,
+    params=None,
+    url: str = None,
+    headers: dict = None,
+    log_prefix="API",
+    return_headers: bool = False,
+    timeout: float | tuple[float, float] = None,
+    retry: str = RETRY_ALL,
+):
+    """
+    Versão assíncrona de make_api_request, com o mesmo retorno. Usa o cliente
+    httpx do event loop e tenta novamente, com backoff e jitter, os métodos
+    idempotentes em erros de conexão e respostas 429/5xx, conforme a
+    política retry.
+    """
+    method = method.lower()
+    if method not in {"get", "post", "put", "patch", "delete"}:
+        logging.error(f"Método HTTP inválido: {method}")
+        return (False, None, {}) if return_headers else (False, None)
+
+    request_kwargs = {"headers": headers}
+    if payload:
+        request_kwargs["json"] = payload
+    if params:
+        request_kwargs["params"] = params
+    if timeout is not None:
+        connect_timeout, read_timeout = (
+            timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        )
+        request_kwargs["timeout"] = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+    client = get_async_http_client()
+    attempts = settings.HTTP_MAX_RETRIES + 1 if method in IDEMPOTENT_METHODS else 1
+    if retry == RETRY_NONE:
+        attempts = 1
+    # com RETRY_CONNECT, só falhas que não chegaram ao servidor
+    retry_errors = (
+        (httpx.ConnectError, httpx.ConnectTimeout)
+        if retry == RETRY_CONNECT
+        else httpx.HTTPError
+    )
+
+    logging.debug(f"{log_prefix}: Enviando requisição {method.upper()} para {url}")
+    for attempt in range(attempts):
+        try:
+            response = await client.request(method.upper(), url, **request_kwargs)
+        except httpx.HTTPError as e:
+            if isinstance(e, retry_errors) and attempt < attempts - 1:
+                await asyncio.sleep(get_retry_backoff(attempt))
+                continue
+            logging.error(f"Erro na requisição {method.upper()} para {url}: {e}")
+            return (False, None, {}) if return_headers else (False, None)
+
+        if (
+            retry == RETRY_ALL
+            and response.status_code in RETRY_STATUS_CODES
+            and attempt < attempts - 1
+        ):
+            await asyncio.sleep(get_retry_backoff(attempt))
+            continue
+        break
+
+    # 304: o conteúdo não mudou desde a última requisição condicional
+    if response.status_code == 304:
+        logging.debug(f"{log_prefix}: Conteúdo não modificado (304)")
+        if return_headers:
+            return None, response.status_code, response.headers
+        return None, response.status_code
+
+    try:
+        if response.is_error:
+            raise ValueError(response.text)
+        response_data = response.json()
+    except ValueError as e:
+        logging.error(
+            f"Erro na requisição {method.upper()} para {url}: {e} "
+            f"(Status: {response.status_code})"
+        )
+        if return_headers:
+            return False, response.status_code, response.headers
+        return False, response.status_code
+
+    if return_headers:
+        return response_data, response.status_code, response.headers
+    return response_data, response.status_code
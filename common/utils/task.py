@@ -2,6 +2,7 @@ import logging
 from typing import Any, Dict, List, Optional
 from celery.app.task import Task
 from django.core.cache import cache
+from django_redis import get_redis_connection
 from service.celery import app as celery_app
 
 logger = logging.getLogger(__name__)
@@ -181,6 +182,37 @@ def acquire_lock(key: str, timeout: int = 60) -> bool:
     return cache.add(key, "true", timeout)
 
 
+def acquire_locks(keys: List[str], timeout: int = 60) -> List[bool]:
+    """
+    Acquires the locks for several keys in a single Redis round-trip, with
+    the same semantics as acquire_lock.
+    Args:
+        keys (List[str]): The keys to acquire the locks for.
+        timeout (int): The timeout for the locks. (in seconds)
+
+    Returns:
+        List[bool]: For each key, True if its lock was acquired.
+    """
+    if not keys:
+        return []
+    pipeline = get_redis_connection("default").pipeline(transaction=False)
+    for key in keys:
+        pipeline.set(
+            cache.make_key(key), cache.client.encode("true"), nx=True, ex=timeout
+        )
+    return [bool(acquired) for acquired in pipeline.execute()]
+
+
+def release_locks(keys: List[str]):
+    """
+    Releases the locks for several keys in a single round-trip.
+    Args:
+        keys (List[str]): The keys to release the locks for.
+    """
+    if keys:
+        cache.delete_many(keys)
+
+
 def release_lock(key: str) -> bool:
     """
     Releases a lock for a given key.
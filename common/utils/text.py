@@ -2,12 +2,13 @@ import unicodedata
 import logging
 from Levenshtein import distance as levenshtein_distance
 from unidecode import unidecode
-from memoize import memoize
+
+from common.utils.cache import cached
 
 logger = logging.getLogger(__name__)
 
 
-@memoize()
+@cached(maxsize=4096)
 def sanitize_string(string, remove_diacritics=True, uppercase=True):
     if not string:
         return None
@@ -24,7 +25,7 @@ def sanitize_string(string, remove_diacritics=True, uppercase=True):
     return string.strip()
 
 
-@memoize()
+@cached(maxsize=4096)
 def estimate_strings_similarity(string1, string2):
     """
     Estima a similaridade entre duas strings.
@@ -64,7 +65,7 @@ def estimate_strings_similarity(string1, string2):
     return similarity
 
 
-@memoize()
+@cached(maxsize=4096)
 def replace_accents_characters(str):
     """
     Function to replace accented characters with their corresponding non-accented ascii characters
@@ -88,7 +89,7 @@ def normalize_mathematical_text(text):
     return result
 
 
-@memoize()
+@cached(maxsize=1024)
 def format_phone_number(phone_number: str) -> str:
     """
     Formats a phone number to the format +55 (11) 99999-9999
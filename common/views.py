@@ -4,6 +4,7 @@ from django.http import HttpResponse, HttpResponseRedirect, Http404
 from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from storages.backends.s3boto3 import S3Boto3Storage
+from common.metrics import registry
 
 
 def _b64url_decode(s: str) -> bytes:
@@ -49,3 +50,24 @@ def media_proxy(request, token, path):
 
     # GET → redireciona pro link assinado
     return HttpResponseRedirect(data["g"])
+
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Prometheus scrape endpoint, aggregated across every worker (see
+    common.metrics). With METRICS_TOKEN set, requires it as a Bearer token.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404("Metrics disabled")
+
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(
+            authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+        ):
+            return HttpResponse(status=401)
+
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
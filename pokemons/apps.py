@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class PokemonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pokemons'
+
+    def ready(self):
+        from pokemons.timing import install_db_execute_wrapper
+
+        connection_created.connect(install_db_execute_wrapper)
@@ -0,0 +1,406 @@
+"""
+End-to-end benchmarks of the Pokémon API hot paths (see the
+benchmark_pokeapi management command).
+
+Every scenario sends real requests through the URL conf, middlewares, views,
+helpers and PokeApiService, with the PokeAPI answered by a replay store
+(pokemons.replay), so runs are reproducible and never touch the network.
+"""
+
+import math
+import platform
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from pokemons.models import (
+    FavoritedPokemon,
+    Pokemon,
+    PokemonEvolutionChain,
+    PokemonSpecie,
+)
+from pokemons.replay import ReplayStore
+from pokemons.services import PokeApiService
+
+API_PREFIX = "/api/pokemons"
+POKEAPI_URL = "https://pokeapi.co/api/v2"
+
+# membros por evolution chain no corpus sintético
+CHAIN_SIZE = 3
+
+
+@dataclass
+class Scenario:
+    """
+    A benchmarked request. path(i) is the URL of the i-th iteration. Cold
+    scenarios reset the PokeAPI cache before every iteration (untimed), warm
+    ones request every path once before measuring.
+    """
+
+    name: str
+    path: Callable[[int], str]
+    cold: bool
+    # ao esfriar, mantém os Pokémon favoritados (os favoritos apontam para eles)
+    keep_favorites: bool = False
+    setup: Callable | None = None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    iterations: int
+    # requisições/s com clientes concorrentes; None nos cenários frios
+    throughput: float | None
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries_per_request: float
+    upstream_calls_per_request: float
+    errors: int = 0
+    latencies_ms: list = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("latencies_ms")
+        return data
+
+
+def percentile(values: list[float], percent: float) -> float:
+    # nearest-rank
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(1, math.ceil(percent / 100 * len(ordered))) - 1]
+
+
+def pokemon_name(external_id: int) -> str:
+    return f"benchmon-{external_id}"
+
+
+def build_corpus(store: ReplayStore, size: int, page_size: int):
+    """
+    Writes a synthetic PokeAPI corpus of size Pokémon (with their species,
+    evolution chains of CHAIN_SIZE members and the list pages) to the store.
+    Objects are addressable by id and by name, like the real API.
+    """
+    for external_id in range(1, size + 1):
+        name = pokemon_name(external_id)
+        chain_id = (external_id - 1) // CHAIN_SIZE + 1
+        pokemon = {
+            "id": external_id,
+            "name": name,
+            "height": external_id % 20 + 1,
+            "weight": external_id * 10,
+            "types": [
+                {
+                    "slot": 1,
+                    "type": {"name": ("grass", "fire", "water")[external_id % 3]},
+                }
+            ],
+            "abilities": [{"ability": {"name": "overgrow"}, "is_hidden": False}],
+            "cries": {"latest": f"https://example.com/cries/{external_id}.ogg"},
+            "sprites": {
+                "other": {
+                    "official-artwork": {
+                        "front_default": f"https://example.com/{external_id}.png",
+                        "front_shiny": f"https://example.com/shiny/{external_id}.png",
+                    }
+                }
+            },
+            "species": {
+                "name": name,
+                "url": f"{POKEAPI_URL}/pokemon-species/{external_id}/",
+            },
+            # volume parecido com o payload real (moves é a maior parte dele)
+            "moves": [
+                {"move": {"name": f"move-{move}", "url": f"{POKEAPI_URL}/move/{move}/"}}
+                for move in range(80)
+            ],
+        }
+        specie = {
+            "id": external_id,
+            "name": name,
+            "evolution_chain": {"url": f"{POKEAPI_URL}/evolution-chain/{chain_id}/"},
+            "flavor_text_entries": [
+                {
+                    "flavor_text": f"Benchmark\nPokémon {external_id}.",
+                    "language": {"name": "en"},
+                }
+            ],
+        }
+        for identifier in (external_id, name):
+            store.save("GET", f"/pokemon/{identifier}", 200, pokemon)
+            store.save("GET", f"/pokemon-species/{identifier}", 200, specie)
+
+    for chain_id in range(1, math.ceil(size / CHAIN_SIZE) + 1):
+        first = (chain_id - 1) * CHAIN_SIZE + 1
+        members = list(range(first, min(first + CHAIN_SIZE, size + 1)))
+        node = None
+        for external_id in reversed(members):
+            details = (
+                [{"min_level": 16, "trigger": {"name": "level-up"}}]
+                if external_id != first
+                else []
+            )
+            node = {
+                "species": {"name": pokemon_name(external_id)},
+                "evolution_details": details,
+                "evolves_to": [node] if node else [],
+            }
+        store.save(
+            "GET", f"/evolution-chain/{chain_id}", 200, {"id": chain_id, "chain": node}
+        )
+
+    for offset in range(0, size, page_size):
+        names = range(offset + 1, min(offset + page_size, size) + 1)
+        store.save(
+            "GET",
+            f"/pokemon?limit={page_size}&offset={offset}",
+            200,
+            {
+                "count": size,
+                "next": None,
+                "previous": None,
+                "results": [
+                    {"name": pokemon_name(i), "url": f"{POKEAPI_URL}/pokemon/{i}/"}
+                    for i in names
+                ],
+            },
+        )
+
+
+@contextmanager
+def count_upstream_calls():
+    """
+    Counts the attempts sent by PokeApiService (including hedges) while the
+    block runs.
+    """
+    calls = [0]
+    send_once = PokeApiService.send_once
+
+    def counting_send_once(self, *args, **kwargs):
+        calls[0] += 1
+        return send_once(self, *args, **kwargs)
+
+    PokeApiService.send_once = counting_send_once
+    try:
+        yield calls
+    finally:
+        PokeApiService.send_once = send_once
+
+
+def reset_pokeapi_cache(keep_favorites: bool = False):
+    """
+    Makes the next request cold: drops the PokeAPI keys from the Django
+    cache and every row ingested from the PokeAPI. With keep_favorites, the
+    favorites and their Pokémon rows stay, but their species must be
+    fetched again.
+    """
+    cache.delete_pattern("pokeapi:*")
+    PokemonEvolutionChain.objects.all().delete()
+    PokemonSpecie.objects.all().delete()
+    if keep_favorites:
+        Pokemon.objects.filter(favorited_pokemons__isnull=True).delete()
+        return
+    FavoritedPokemon.objects.all().delete()
+    Pokemon.objects.all().delete()
+
+
+class BenchmarkRunner:
+    """
+    Runs the scenarios with an authenticated API client. Each request is
+    timed, and its DB queries and upstream calls are counted. Warm scenarios
+    also measure throughput: concurrency clients sending the requests at the
+    same time, over wall-clock time.
+    """
+
+    def __init__(
+        self, user, size: int, page_size: int, iterations: int, concurrency: int = 4
+    ):
+        self.user = user
+        self.size = size
+        self.page_size = page_size
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.client = self.get_client()
+
+    def get_client(self) -> APIClient:
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        return client
+
+    def get_scenarios(self) -> list[Scenario]:
+        pages = max(1, self.size // self.page_size)
+        chains = max(1, self.size // CHAIN_SIZE)
+
+        def list_path(i):
+            offset = (i % pages) * self.page_size
+            return f"{API_PREFIX}/pokemons/?limit={self.page_size}&offset={offset}"
+
+        def retrieve_path(i):
+            return f"{API_PREFIX}/pokemons/{i % self.size + 1}/"
+
+        def chain_path(i):
+            return f"{API_PREFIX}/evolution-chains/{(i % chains) * CHAIN_SIZE + 1}/"
+
+        def favorites_path(i):
+            return f"{API_PREFIX}/favorited-pokemons/?limit={self.page_size}"
+
+        scenarios = []
+        for cold in (True, False):
+            state = "cold" if cold else "warm"
+            scenarios += [
+                Scenario(f"pokemon-list-{state}", list_path, cold),
+                Scenario(f"pokemon-retrieve-{state}", retrieve_path, cold),
+                Scenario(f"evolution-chain-{state}", chain_path, cold),
+                Scenario(
+                    f"favorites-list-{state}",
+                    favorites_path,
+                    cold,
+                    keep_favorites=True,
+                    setup=self.setup_favorites,
+                ),
+            ]
+        return scenarios
+
+    def setup_favorites(self):
+        for i in range(min(self.page_size, self.size)):
+            self.client.post(f"{API_PREFIX}/pokemons/{i + 1}/favorite/")
+
+    def request(self, path: str) -> tuple[float, int, int, bool]:
+        with (
+            CaptureQueriesContext(connection) as queries,
+            count_upstream_calls() as calls,
+        ):
+            started = time.perf_counter()
+            response = self.client.get(path)
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries), calls[0], response.status_code >= 400
+
+    def run_scenario(self, scenario: Scenario) -> ScenarioResult:
+        reset_pokeapi_cache()
+        if scenario.setup:
+            scenario.setup()
+
+        if not scenario.cold:
+            for i in range(self.iterations):
+                self.client.get(scenario.path(i))
+
+        latencies, queries, upstream_calls, errors = [], 0, 0, 0
+        for i in range(self.iterations):
+            if scenario.cold:
+                reset_pokeapi_cache(keep_favorites=scenario.keep_favorites)
+            elapsed, query_count, call_count, failed = self.request(scenario.path(i))
+            latencies.append(elapsed)
+            queries += query_count
+            upstream_calls += call_count
+            errors += failed
+
+        # cada request frio depende de um reset antes dele: não há como
+        # enviá-los em paralelo
+        throughput = None
+        if not scenario.cold:
+            throughput = round(self.measure_throughput(scenario), 2)
+
+        return ScenarioResult(
+            name=scenario.name,
+            iterations=self.iterations,
+            throughput=throughput,
+            p50_ms=round(percentile(latencies, 50) * 1000, 2),
+            p95_ms=round(percentile(latencies, 95) * 1000, 2),
+            p99_ms=round(percentile(latencies, 99) * 1000, 2),
+            queries_per_request=round(queries / self.iterations, 2),
+            upstream_calls_per_request=round(upstream_calls / self.iterations, 2),
+            errors=errors,
+            latencies_ms=[round(latency * 1000, 3) for latency in latencies],
+        )
+
+    def measure_throughput(self, scenario: Scenario) -> float:
+        """
+        Requests per second of the scenario's paths split among concurrency
+        clients running at the same time, each in its own thread.
+        """
+        paths = [scenario.path(i) for i in range(self.iterations)]
+
+        def run_client(client_paths: list[str]):
+            client = self.get_client()
+            try:
+                for path in client_paths:
+                    client.get(path)
+            finally:
+                # cada thread abre sua própria conexão com o DB
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(
+                executor.map(
+                    run_client,
+                    [paths[i :: self.concurrency] for i in range(self.concurrency)],
+                )
+            )
+        return self.iterations / (time.perf_counter() - started)
+
+    def run(self, only: list[str] | None = None) -> dict:
+        results = {}
+        for scenario in self.get_scenarios():
+            if only and not any(name in scenario.name for name in only):
+                continue
+            results[scenario.name] = self.run_scenario(scenario).to_dict()
+        return {
+            "meta": {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "corpus_size": self.size,
+                "page_size": self.page_size,
+                "iterations": self.iterations,
+                "concurrency": self.concurrency,
+            },
+            "scenarios": results,
+        }
+
+
+def compare_results(
+    results: dict,
+    baseline: dict,
+    latency_tolerance: float,
+    only: list[str] | None = None,
+) -> list[str]:
+    """
+    Returns the regressions of results against baseline: a p95 latency
+    above the baseline by more than latency_tolerance (fraction), more
+    errors, DB queries or upstream calls per request than the baseline
+    (those are deterministic, so any increase counts), or a baseline
+    scenario that was not run (unless left out by only).
+    """
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        if only and not any(selected in name for selected in only):
+            continue
+        result = results["scenarios"].get(name)
+        if result is None:
+            regressions.append(f"{name}: missing from the results")
+            continue
+
+        if result["p95_ms"] > base["p95_ms"] * (1 + latency_tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']}ms > baseline {base['p95_ms']}ms "
+                f"(+{latency_tolerance:.0%} tolerance)"
+            )
+        for metric in ("errors", "queries_per_request", "upstream_calls_per_request"):
+            expected = base.get(metric, 0)
+            if result[metric] > expected:
+                regressions.append(
+                    f"{name}: {metric} {result[metric]} > baseline {expected}"
+                )
+    return regressions
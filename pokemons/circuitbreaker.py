@@ -0,0 +1,220 @@
+import logging
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de fatias da janela deslizante de estatísticas
+WINDOW_BUCKETS = 6
+
+# apaga a chave só se ela ainda guarda o token informado
+RELEASE_PROBE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class UpstreamCircuitBreaker:
+    """
+    Cluster-wide circuit breaker for the PokeAPI, kept in Redis so every
+    node sees the same state.
+
+    CLOSED: requests flow and their outcome (error or slow) is counted over
+    a sliding window of POKEAPI_CIRCUIT_WINDOW_SECONDS. Once the window has
+    POKEAPI_CIRCUIT_MIN_REQUESTS and the error or slow rate reaches its
+    threshold, the breaker trips.
+    OPEN: requests are rejected without touching the network for
+    POKEAPI_CIRCUIT_OPEN_SECONDS.
+    HALF_OPEN: a single probe request is let through; it closes the breaker
+    on success and reopens it on failure. Only the probe holder's outcome
+    counts: a request that started before the trip and finishes late is
+    ignored.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    open_key = "pokeapi:circuit:open"
+    tripped_key = "pokeapi:circuit:tripped"
+    probe_key = "pokeapi:circuit:probe"
+    stats_key_prefix = "pokeapi:circuit:stats"
+
+    @property
+    def enabled(self) -> bool:
+        return settings.POKEAPI_CIRCUIT_BREAKER
+
+    @property
+    def bucket_seconds(self) -> float:
+        return settings.POKEAPI_CIRCUIT_WINDOW_SECONDS / WINDOW_BUCKETS
+
+    def stats_keys(self) -> list[str]:
+        """
+        Keys of the window buckets, the current one first.
+        """
+        current = int(time.time() // self.bucket_seconds)
+        return [
+            f"{self.stats_key_prefix}:{bucket}"
+            for bucket in range(current, current - WINDOW_BUCKETS, -1)
+        ]
+
+    def get_state(self) -> str:
+        try:
+            is_open, tripped = get_redis_connection("default").mget(
+                self.open_key, self.tripped_key
+            )
+        except RedisError:
+            return self.CLOSED
+        if is_open:
+            return self.OPEN
+        if tripped:
+            return self.HALF_OPEN
+        return self.CLOSED
+
+    def allow_request(self) -> tuple[bool, str | None]:
+        """
+        Returns (allowed, probe). allowed is False while the breaker is open,
+        or half-open with the probe request already taken by another caller.
+        probe is the token of the half-open probe, to be passed to record (or
+        release_probe when the request is not sent). Fails open if Redis is
+        unavailable.
+        """
+        if not self.enabled:
+            return True, None
+
+        state = self.get_state()
+        if state == self.OPEN:
+            return False, None
+        if state == self.HALF_OPEN:
+            probe = uuid.uuid4().hex
+            try:
+                acquired = get_redis_connection("default").set(
+                    self.probe_key,
+                    probe,
+                    nx=True,
+                    ex=int(settings.HTTP_CONNECT_TIMEOUT + settings.HTTP_READ_TIMEOUT)
+                    + 1,
+                )
+            except RedisError:
+                return True, None
+            return (True, probe) if acquired else (False, None)
+        return True, None
+
+    def is_probe(self, probe: str | None) -> bool:
+        if probe is None:
+            return False
+        current = get_redis_connection("default").get(self.probe_key)
+        return current is not None and current.decode() == probe
+
+    def release_probe(self, probe: str | None):
+        """
+        Gives the probe back when its request was not sent (ex: no rate limit
+        token), so another request can probe right away instead of after the
+        probe key expires.
+        """
+        if probe is None:
+            return
+        try:
+            connection = get_redis_connection("default")
+            connection.eval(RELEASE_PROBE_SCRIPT, 1, self.probe_key, probe)
+        except RedisError:
+            logger.warning("Circuit breaker da PokeAPI indisponível")
+
+    def record(self, success: bool, elapsed: float, probe: str | None = None):
+        """
+        Records the outcome of an upstream request. A request slower than
+        POKEAPI_CIRCUIT_SLOW_SECONDS counts as slow even when it succeeded.
+        While half-open, only the outcome of the probe (the token returned by
+        allow_request) closes or reopens the breaker.
+        """
+        if not self.enabled:
+            return
+
+        slow = elapsed >= settings.POKEAPI_CIRCUIT_SLOW_SECONDS
+        try:
+            if self.get_state() == self.HALF_OPEN:
+                if not self.is_probe(probe):
+                    return
+                if success and not slow:
+                    self.close()
+                else:
+                    self.trip()
+                return
+
+            keys = self.stats_keys()
+            connection = get_redis_connection("default")
+            pipeline = connection.pipeline()
+            pipeline.hincrby(keys[0], "total", 1)
+            if not success:
+                pipeline.hincrby(keys[0], "errors", 1)
+            if slow:
+                pipeline.hincrby(keys[0], "slow", 1)
+            pipeline.expire(keys[0], settings.POKEAPI_CIRCUIT_WINDOW_SECONDS * 2)
+            for key in keys:
+                pipeline.hgetall(key)
+            buckets = pipeline.execute()[-len(keys) :]
+        except RedisError:
+            logger.warning("Circuit breaker da PokeAPI indisponível")
+            return
+
+        if success and not slow:
+            return
+
+        total = sum(int(bucket.get(b"total", 0)) for bucket in buckets)
+        errors = sum(int(bucket.get(b"errors", 0)) for bucket in buckets)
+        slow_total = sum(int(bucket.get(b"slow", 0)) for bucket in buckets)
+        if total < settings.POKEAPI_CIRCUIT_MIN_REQUESTS:
+            return
+
+        if (
+            errors / total >= settings.POKEAPI_CIRCUIT_ERROR_RATE
+            or slow_total / total >= settings.POKEAPI_CIRCUIT_SLOW_RATE
+        ):
+            logger.warning(
+                f"PokeAPI: {errors}/{total} erros e {slow_total}/{total} lentas na "
+                f"janela, abrindo o circuit breaker"
+            )
+            try:
+                self.trip()
+            except RedisError:
+                logger.warning("Circuit breaker da PokeAPI indisponível")
+
+    def trip(self):
+        open_seconds = settings.POKEAPI_CIRCUIT_OPEN_SECONDS
+        pipeline = get_redis_connection("default").pipeline()
+        pipeline.set(self.open_key, 1, ex=open_seconds)
+        pipeline.set(self.tripped_key, 1, ex=open_seconds * 10)
+        pipeline.delete(self.probe_key)
+        pipeline.execute()
+        logger.warning(
+            f"Circuit breaker da PokeAPI aberto por {open_seconds}s, "
+            f"servindo apenas dados locais"
+        )
+
+    def close(self):
+        get_redis_connection("default").delete(
+            self.open_key, self.tripped_key, self.probe_key, *self.stats_keys()
+        )
+        logger.info("Circuit breaker da PokeAPI fechado")
+
+    async def aallow_request(self) -> tuple[bool, str | None]:
+        return await sync_to_async(self.allow_request, thread_sensitive=False)()
+
+    async def arelease_probe(self, probe: str | None):
+        if probe is not None:
+            await sync_to_async(self.release_probe, thread_sensitive=False)(probe)
+
+    async def arecord(self, success: bool, elapsed: float, probe: str | None = None):
+        await sync_to_async(self.record, thread_sensitive=False)(
+            success, elapsed, probe
+        )
+
+
+circuit_breaker = UpstreamCircuitBreaker()
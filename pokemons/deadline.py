@@ -0,0 +1,56 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# instante (time.monotonic) em que o request atual deixa de valer a pena
+_deadline: ContextVar[float | None] = ContextVar("pokeapi_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float | None):
+    """
+    Runs the block with a time budget for upstream requests. Nested blocks
+    can only shorten the current deadline. None means no budget.
+    """
+    deadline = None if seconds is None else time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining() -> float | None:
+    """
+    Seconds left in the current budget (possibly negative), or None when
+    there is no deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_expired() -> bool:
+    remaining = get_remaining()
+    return remaining is not None and remaining <= 0
+
+
+def get_timeout() -> tuple[float, float] | None:
+    """
+    (connect, read) timeout for the next upstream request: the HTTP defaults
+    capped by the remaining budget, or None when there is no deadline.
+    """
+    remaining = get_remaining()
+    if remaining is None:
+        return None
+    return (
+        min(settings.HTTP_CONNECT_TIMEOUT, remaining),
+        min(settings.HTTP_READ_TIMEOUT, remaining),
+    )
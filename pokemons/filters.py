@@ -0,0 +1,30 @@
+import django_filters
+
+from pokemons.models import Pokemon
+
+
+class PokemonFilter(django_filters.FilterSet):
+    """
+    Filters answered from the local catalog: types and abilities use the GIN
+    indexes of the array columns, weight and height ranges use btree indexes.
+    """
+
+    type = django_filters.CharFilter(method="filter_contains", field_name="types")
+    ability = django_filters.CharFilter(
+        method="filter_contains", field_name="abilities"
+    )
+    min_weight = django_filters.NumberFilter(field_name="weight", lookup_expr="gte")
+    max_weight = django_filters.NumberFilter(field_name="weight", lookup_expr="lte")
+    min_height = django_filters.NumberFilter(field_name="height", lookup_expr="gte")
+    max_height = django_filters.NumberFilter(field_name="height", lookup_expr="lte")
+
+    def filter_contains(self, queryset, name, value):
+        # aceita vários valores separados por vírgula (ex: type=fire,flying)
+        values = [v.strip().lower() for v in value.split(",") if v.strip()]
+        if not values:
+            return queryset
+        return queryset.filter(**{f"{name}__contains": values})
+
+    class Meta:
+        model = Pokemon
+        fields = []
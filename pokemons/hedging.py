@@ -0,0 +1,102 @@
+import math
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class LatencyTracker:
+    """
+    Sliding window of the latest upstream response times (in seconds) of
+    this process, used to pick the hedging delay.
+    """
+
+    def __init__(self, size: int):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, elapsed: float):
+        with self._lock:
+            self._samples.append(elapsed)
+
+    def percentile(self, percent: float) -> float | None:
+        """
+        Nearest-rank percentile of the window, or None while it holds fewer
+        than POKEAPI_HEDGE_MIN_SAMPLES samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < settings.POKEAPI_HEDGE_MIN_SAMPLES:
+            return None
+        rank = max(1, math.ceil(percent / 100 * len(samples)))
+        return samples[rank - 1]
+
+
+latency_tracker = LatencyTracker(settings.POKEAPI_HEDGE_WINDOW)
+
+
+def get_hedge_delay() -> float | None:
+    """
+    How long the first attempt may take before a hedge is sent: the
+    POKEAPI_HEDGE_PERCENTILE of the recent latencies, never below
+    POKEAPI_HEDGE_MIN_DELAY_SECONDS. None when hedging is disabled or there
+    are not enough samples yet.
+    """
+    if not settings.POKEAPI_HEDGE_REQUESTS:
+        return None
+
+    delay = latency_tracker.percentile(settings.POKEAPI_HEDGE_PERCENTILE)
+    if delay is None:
+        return None
+    return max(delay, settings.POKEAPI_HEDGE_MIN_DELAY_SECONDS)
+
+
+class HedgeExecutor:
+    """
+    Thread pool that only takes work when it has an idle worker: a queued
+    attempt would spend the hedging delay waiting instead of running.
+    """
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pokeapi-hedge"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def try_submit(self, fn, *args) -> Future | None:
+        """
+        Runs fn(*args) on an idle worker, or returns None when every worker
+        is busy.
+        """
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+_hedge_executor = None
+_hedge_executor_pid = None
+_hedge_executor_lock = threading.Lock()
+
+
+def get_hedge_executor() -> HedgeExecutor:
+    """
+    Thread pool that runs hedged requests, one per process (recreated after
+    a fork, like the HTTP session).
+    """
+    global _hedge_executor, _hedge_executor_pid
+
+    pid = os.getpid()
+    if _hedge_executor is None or _hedge_executor_pid != pid:
+        with _hedge_executor_lock:
+            if _hedge_executor is None or _hedge_executor_pid != pid:
+                _hedge_executor = HedgeExecutor(settings.POKEAPI_HEDGE_MAX_WORKERS)
+                _hedge_executor_pid = pid
+    return _hedge_executor
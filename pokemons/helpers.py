@@ -1,8 +1,26 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from asgiref.sync import sync_to_async
+from dataclasses import dataclass
 from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
+from django.db.models import prefetch_related_objects
+from django.db.models.functions import Coalesce
+from django_redis import get_redis_connection
 
+from common.metrics import pokeapi_cache_lookups
+from common.utils import acquire_lock, acquire_locks, release_lock, release_locks
 from users.models import User
 from pokemons.models import (
     Pokemon,
@@ -10,16 +28,346 @@ from pokemons.models import (
     PokemonEvolutionChain,
     FavoritedPokemon,
 )
-from pokemons.services import PokeApiService
+from pokemons import deadline, timing
+from pokemons.services import (
+    AsyncPokeApiService,
+    PokeApiDeadlineExceeded,
+    PokeApiError,
+    PokeApiService,
+    PokeApiNotFound,
+    PokeApiUnavailable,
+)
 
+logger = logging.getLogger(__name__)
 
 service = PokeApiService()
+async_service = AsyncPokeApiService()
+
+# estados de cache de uma instância (ver BasePokeApiHelper.get_freshness)
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+FETCH_WAIT_INTERVAL_SECONDS = 0.05
+
+# contagem de acessos por external_id de Pokémon (ver PokeApiRefreshHelper)
+POPULARITY_KEY = "pokeapi:popularity:pokemon"
+
+# objetos servidos do DB sem revalidação no request atual (PokeAPI fora do ar)
+_stale_objects: ContextVar[list | None] = ContextVar(
+    "pokeapi_stale_objects", default=None
+)
+
+
+@contextmanager
+def track_stale_objects():
+    """
+    Collects the objects served stale (see mark_stale) while the block runs.
+    The list is shared with the worker threads and tasks it spawns.
+    """
+    stale_objects = []
+    token = _stale_objects.set(stale_objects)
+    try:
+        yield stale_objects
+    finally:
+        _stale_objects.reset(token)
+
+
+def mark_response_stale(label: str):
+    stale_objects = _stale_objects.get()
+    if stale_objects is not None:
+        stale_objects.append(label)
+
+
+def mark_stale(instance):
+    """
+    Flags an instance served from the DB because the PokeAPI could not be
+    reached, regardless of its age.
+    """
+    instance.is_stale = True
+    mark_response_stale(f"{instance._meta.model_name}:{instance.external_id}")
+    return instance
+
+
+@dataclass
+class FetchResult:
+    """
+    Result of a (conditional) PokeAPI fetch. data is None when the API
+    answered 304 Not Modified.
+    """
+
+    data: dict | None
+    etag: str = ""
+    last_modified: str = ""
+
+
+def compute_content_hash(data: dict) -> str:
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
 
 
 class BasePokeApiHelper:
     model = None
     service_method = None
+    async_service_method = None
     cache_ttl_days = 7
+    hard_expiry_days = settings.POKEAPI_HARD_EXPIRY_DAYS
+    stale_while_revalidate = settings.POKEAPI_STALE_WHILE_REVALIDATE
+    max_concurrency = settings.POKEAPI_MAX_CONCURRENCY
+    async_max_concurrency = settings.POKEAPI_ASYNC_MAX_CONCURRENCY
+    # campo com o external_id do Pokémon usado para priorizar refreshes
+    popularity_field = None
+    bulk_update_fields = [
+        "data",
+        "content_hash",
+        "etag",
+        "upstream_last_modified",
+        "last_updated",
+        "verified_at",
+        "updated_at",
+    ]
+    verify_fields = ["etag", "upstream_last_modified", "verified_at", "updated_at"]
+
+    @staticmethod
+    def normalize_identifier(name_or_id: str | int) -> str | int:
+        """
+        Returns the external_id (int) or the lowercase name used as lookup key.
+        """
+        if isinstance(name_or_id, int) or str(name_or_id).isdigit():
+            return int(name_or_id)
+        return str(name_or_id).lower()
+
+    @staticmethod
+    def lookup_filter(name_or_id: str | int) -> models.Q:
+        # externo ID (numérico) ou nome
+        if isinstance(name_or_id, int) or str(name_or_id).isdigit():
+            return models.Q(external_id=int(name_or_id))
+        return models.Q(name__iexact=str(name_or_id))
+
+    @classmethod
+    def get_ttl(cls, external_id: int, cache_days: int | None = None) -> timedelta:
+        """
+        Returns the cache TTL of a row: cache_days shortened by a deterministic
+        per-row jitter of up to POKEAPI_TTL_JITTER, so rows ingested together
+        do not all expire together.
+        """
+        cache_days = cache_days if cache_days is not None else cls.cache_ttl_days
+        fraction = zlib.crc32(f"{cls.__name__}:{external_id}".encode()) / 0xFFFFFFFF
+        return timedelta(days=cache_days) * (1 - settings.POKEAPI_TTL_JITTER * fraction)
+
+    @classmethod
+    def get_freshness(cls, instance, cache_days: int | None = None) -> str:
+        """
+        Classifies an instance as FRESH (younger than cache_days), STALE (can
+        be served while a background refresh runs) or EXPIRED (must be
+        refetched before being served).
+        """
+        age = timezone.now() - (instance.verified_at or instance.last_updated)
+
+        if age < cls.get_ttl(instance.external_id, cache_days):
+            return FRESH
+        if cls.stale_while_revalidate and age < timedelta(days=cls.hard_expiry_days):
+            return STALE
+        return EXPIRED
+
+    @classmethod
+    def record_lookup(cls, state: str, count: int = 1):
+        """
+        Accounts cache lookups (timing.CACHE_HIT/CACHE_STALE/CACHE_MISS) in
+        the current request metrics and the pokeapi_cache_lookups_total
+        counter.
+        """
+        if count:
+            timing.record_cache(cls.__name__, state, count)
+            pokeapi_cache_lookups.inc(count, helper=cls.__name__, state=state)
+
+    @classmethod
+    def refresh_lock_key(cls, name_or_id: str | int) -> str:
+        return f"pokeapi:refresh:{cls.__name__}:{cls.normalize_identifier(name_or_id)}"
+
+    @classmethod
+    def schedule_refresh(cls, name_or_id: str | int) -> bool:
+        """
+        Enqueues a background refresh of the instance. Deduplicated through a
+        lock, so at most one refresh per object is waiting or running.
+        """
+        from pokemons.tasks import refresh_pokeapi_object
+
+        lock_key = cls.refresh_lock_key(name_or_id)
+        if not acquire_lock(lock_key, timeout=settings.POKEAPI_REFRESH_LOCK_SECONDS):
+            return False
+
+        try:
+            refresh_pokeapi_object.delay(cls.__name__, name_or_id)
+        except Exception:
+            release_lock(lock_key)
+            logger.exception(
+                f"Erro ao agendar atualização de {cls.model.__name__} '{name_or_id}'"
+            )
+            return False
+        return True
+
+    @classmethod
+    def schedule_refreshes(cls, identifiers: list[str | int]) -> list[str | int]:
+        """
+        Batch version of schedule_refresh: takes the refresh locks in a single
+        Redis round-trip and enqueues one task for every identifier whose
+        lock was free. Returns those identifiers.
+        """
+        from pokemons.tasks import refresh_pokeapi_objects
+
+        if not identifiers:
+            return []
+        lock_keys = [cls.refresh_lock_key(i) for i in identifiers]
+        try:
+            acquired = acquire_locks(
+                lock_keys, timeout=settings.POKEAPI_REFRESH_LOCK_SECONDS
+            )
+        except Exception:
+            logger.exception(f"Erro ao agendar atualização de {cls.model.__name__}")
+            return []
+
+        scheduled = [i for i, ok in zip(identifiers, acquired) if ok]
+        if not scheduled:
+            return []
+        try:
+            refresh_pokeapi_objects.delay(cls.__name__, scheduled)
+        except Exception:
+            release_locks([cls.refresh_lock_key(i) for i in scheduled])
+            logger.exception(
+                f"Erro ao agendar atualização de {len(scheduled)} "
+                f"{cls.model.__name__}"
+            )
+            return []
+        return scheduled
+
+    @classmethod
+    def fetch_lock_key(cls, name_or_id: str | int) -> str:
+        return f"pokeapi:fetch:{cls.__name__}:{cls.normalize_identifier(name_or_id)}"
+
+    @staticmethod
+    def get_fetch_wait_seconds() -> float:
+        remaining = deadline.get_remaining()
+        if remaining is None:
+            return settings.POKEAPI_FETCH_WAIT_SECONDS
+        return max(0, min(settings.POKEAPI_FETCH_WAIT_SECONDS, remaining))
+
+    @classmethod
+    def wait_for_fetches(cls, identifiers: list[str | int]):
+        """
+        Waits (up to POKEAPI_FETCH_WAIT_SECONDS, or the remaining request
+        budget) while other workers hold the fetch locks of the identifiers.
+        """
+        lock_keys = [cls.fetch_lock_key(i) for i in identifiers]
+        wait_until = time.monotonic() + cls.get_fetch_wait_seconds()
+        while time.monotonic() < wait_until and cache.get_many(lock_keys):
+            time.sleep(FETCH_WAIT_INTERVAL_SECONDS)
+
+    @classmethod
+    async def await_fetches(cls, identifiers: list[str | int]):
+        """
+        Async version of wait_for_fetches.
+        """
+        lock_keys = [cls.fetch_lock_key(i) for i in identifiers]
+        wait_until = time.monotonic() + cls.get_fetch_wait_seconds()
+        while time.monotonic() < wait_until and await cache.aget_many(lock_keys):
+            await asyncio.sleep(FETCH_WAIT_INTERVAL_SECONDS)
+
+    @classmethod
+    def not_found_cache_key(cls, name_or_id: str | int) -> str:
+        return (
+            f"pokeapi:not-found:{cls.__name__}:{cls.normalize_identifier(name_or_id)}"
+        )
+
+    @classmethod
+    def fetch(cls, name_or_id: str | int, instance=None) -> FetchResult:
+        """
+        Fetches the identifier from the API. When instance is given the
+        request is conditional (If-None-Match/If-Modified-Since).
+        404s are remembered in the negative cache for
+        POKEAPI_NOT_FOUND_CACHE_SECONDS and answered locally with PokeApiNotFound.
+        """
+        not_found_key = cls.not_found_cache_key(name_or_id)
+        if cache.get(not_found_key):
+            raise PokeApiNotFound(str(name_or_id), 404)
+
+        try:
+            data, response_headers = cls.service_method(
+                name_or_id,
+                headers=cls.conditional_headers(instance),
+                return_response_headers=True,
+            )
+        except PokeApiNotFound:
+            cache.set(not_found_key, True, settings.POKEAPI_NOT_FOUND_CACHE_SECONDS)
+            raise
+
+        return cls.build_fetch_result(data, response_headers)
+
+    @classmethod
+    async def afetch(cls, name_or_id: str | int, instance=None) -> FetchResult:
+        """
+        Async version of fetch, using async_service_method.
+        """
+        not_found_key = cls.not_found_cache_key(name_or_id)
+        if await cache.aget(not_found_key):
+            raise PokeApiNotFound(str(name_or_id), 404)
+
+        try:
+            data, response_headers = await cls.async_service_method(
+                name_or_id,
+                headers=cls.conditional_headers(instance),
+                return_response_headers=True,
+            )
+        except PokeApiNotFound:
+            await cache.aset(
+                not_found_key, True, settings.POKEAPI_NOT_FOUND_CACHE_SECONDS
+            )
+            raise
+
+        return cls.build_fetch_result(data, response_headers)
+
+    @staticmethod
+    def conditional_headers(instance=None) -> dict | None:
+        headers = {}
+        if instance is not None and instance.etag:
+            headers["If-None-Match"] = instance.etag
+        if instance is not None and instance.upstream_last_modified:
+            headers["If-Modified-Since"] = instance.upstream_last_modified
+        return headers or None
+
+    @staticmethod
+    def build_fetch_result(data: dict | None, response_headers) -> FetchResult:
+        return FetchResult(
+            data=data,
+            etag=response_headers.get("ETag", ""),
+            last_modified=response_headers.get("Last-Modified", ""),
+        )
+
+    @staticmethod
+    def is_unchanged(instance, result: FetchResult) -> bool:
+        """
+        True when the API answered 304 or returned the same content as stored.
+        """
+        if result.data is None:
+            return True
+        return bool(instance.content_hash) and (
+            instance.content_hash == compute_content_hash(result.data)
+        )
+
+    @classmethod
+    def apply_verification(cls, instance, result: FetchResult):
+        """
+        Marks the instance as verified against the API without touching its
+        data (used when the upstream content did not change).
+        """
+        now = timezone.now()
+        instance.etag = result.etag or instance.etag
+        instance.upstream_last_modified = (
+            result.last_modified or instance.upstream_last_modified
+        )
+        instance.verified_at = now
+        instance.updated_at = now
+        return instance
 
     @classmethod
     def get_object(
@@ -32,71 +380,756 @@ class BasePokeApiHelper:
     ):
         """
         Busca no DB ou atualiza/cria a partir da API.
+        Instâncias STALE são retornadas na hora e atualizadas em background.
         kwargs são passados para create_instance/update_instance (ex: pokemon=..., specie=...).
         """
         assert cls.model is not None, "Defina cls.model no helper."
         assert cls.service_method is not None, "Defina cls.service_method no helper."
 
-        cache_days = cache_days if cache_days is not None else cls.cache_ttl_days
-        cutoff = timezone.now() - timedelta(days=cache_days)
-
-        # build filter: externo ID (numérico) ou nome
-        if isinstance(name_or_id, int) or str(name_or_id).isdigit():
-            filters = models.Q(external_id=int(name_or_id))
-        else:
-            filters = models.Q(name__iexact=str(name_or_id))
+        # identificador que a API já respondeu como inexistente
+        if cache.get(cls.not_found_cache_key(name_or_id)):
+            raise PokeApiNotFound(str(name_or_id), 404)
 
+        filters = cls.lookup_filter(name_or_id)
         instance = cls.model.objects.filter(filters).first()
 
         # se existe e não for forçar atualização
-        if instance and not force_update and instance.last_updated > cutoff:
-            return instance
+        if instance and not force_update:
+            freshness = cls.get_freshness(instance, cache_days)
+            if freshness == FRESH:
+                cls.record_lookup(timing.CACHE_HIT)
+                return instance
+            if freshness == STALE:
+                cls.record_lookup(timing.CACHE_STALE)
+                cls.schedule_refresh(name_or_id)
+                return instance
 
-        # obtém dados da API
-        data = cls.service_method(name_or_id)
+        if not force_update:
+            cls.record_lookup(timing.CACHE_MISS)
 
-        # atualiza ou cria usando os hooks
-        if instance:
-            return cls.update_instance(instance, data, **kwargs)
-        else:
-            return cls.create_instance(data, **kwargs)
+        # single-flight: apenas um worker busca na API, os demais aguardam
+        # e leem o resultado do DB
+        lock_key = cls.fetch_lock_key(name_or_id)
+        if not acquire_lock(lock_key, timeout=settings.POKEAPI_FETCH_LOCK_SECONDS):
+            cls.wait_for_fetches([name_or_id])
+            instance = cls.model.objects.filter(filters).first()
+            if instance and cls.get_freshness(instance, cache_days) == FRESH:
+                return instance
+            # o outro worker falhou ou demorou demais: busca sem o lock
+            lock_key = None
+
+        try:
+            # obtém dados da API (condicional quando já temos a instância)
+            try:
+                result = cls.fetch(name_or_id, instance)
+            except PokeApiNotFound:
+                raise
+            except PokeApiError:
+                # PokeAPI fora do ar: serve o que houver no DB, qualquer idade
+                if instance is None or force_update:
+                    raise
+                logger.warning(
+                    f"PokeAPI indisponível, servindo {cls.model.__name__} "
+                    f"'{name_or_id}' do DB"
+                )
+                return mark_stale(instance)
+
+            # conteúdo inalterado: só registra a verificação, sem reescrever o JSON
+            if instance and cls.is_unchanged(instance, result):
+                cls.apply_verification(instance, result)
+                instance.save(update_fields=cls.verify_fields)
+                return instance
+
+            validators = {"etag": result.etag, "last_modified": result.last_modified}
+
+            # atualiza ou cria usando os hooks
+            if instance:
+                return cls.update_instance(
+                    instance, result.data, **validators, **kwargs
+                )
+            else:
+                return cls.create_or_get_instance(result.data, **validators, **kwargs)
+        finally:
+            if lock_key:
+                release_lock(lock_key)
 
     @classmethod
-    def create_instance(cls, data: dict, **kwargs):
+    async def aget_object(
+        cls,
+        name_or_id: str | int,
+        *,
+        force_update: bool = False,
+        cache_days: int | None = None,
+        **kwargs,
+    ):
         """
-        Create the instance in the database. Subclasses that need extra fields
-        (ex: pokemon from specie) must override this method.
+        Async version of get_object: the API request runs on the event loop
+        (async_service_method), the DB reads use the async ORM and the writes
+        run through sync_to_async.
+        """
+        assert cls.model is not None, "Defina cls.model no helper."
+        assert (
+            cls.async_service_method is not None
+        ), "Defina cls.async_service_method no helper."
+
+        if await cache.aget(cls.not_found_cache_key(name_or_id)):
+            raise PokeApiNotFound(str(name_or_id), 404)
+
+        filters = cls.lookup_filter(name_or_id)
+        instance = await cls.model.objects.filter(filters).afirst()
+
+        if instance and not force_update:
+            freshness = cls.get_freshness(instance, cache_days)
+            if freshness == FRESH:
+                cls.record_lookup(timing.CACHE_HIT)
+                return instance
+            if freshness == STALE:
+                cls.record_lookup(timing.CACHE_STALE)
+                await sync_to_async(cls.schedule_refresh)(name_or_id)
+                return instance
+
+        if not force_update:
+            cls.record_lookup(timing.CACHE_MISS)
+
+        lock_key = cls.fetch_lock_key(name_or_id)
+        if not await sync_to_async(acquire_lock)(
+            lock_key, timeout=settings.POKEAPI_FETCH_LOCK_SECONDS
+        ):
+            await cls.await_fetches([name_or_id])
+            instance = await cls.model.objects.filter(filters).afirst()
+            if instance and cls.get_freshness(instance, cache_days) == FRESH:
+                return instance
+            lock_key = None
+
+        try:
+            try:
+                result = await cls.afetch(name_or_id, instance)
+            except PokeApiNotFound:
+                raise
+            except PokeApiError:
+                if instance is None or force_update:
+                    raise
+                logger.warning(
+                    f"PokeAPI indisponível, servindo {cls.model.__name__} "
+                    f"'{name_or_id}' do DB"
+                )
+                return mark_stale(instance)
+
+            if instance and cls.is_unchanged(instance, result):
+                cls.apply_verification(instance, result)
+                await instance.asave(update_fields=cls.verify_fields)
+                return instance
+
+            validators = {"etag": result.etag, "last_modified": result.last_modified}
+
+            if instance:
+                return await sync_to_async(cls.update_instance)(
+                    instance, result.data, **validators, **kwargs
+                )
+            return await sync_to_async(cls.create_or_get_instance)(
+                result.data, **validators, **kwargs
+            )
+        finally:
+            if lock_key:
+                await sync_to_async(release_lock)(lock_key)
+
+    @classmethod
+    def get_many(
+        cls,
+        identifiers: list[str | int],
+        *,
+        force_update: bool = False,
+        cache_days: int | None = None,
+        instance_kwargs: dict | None = None,
+        background_refresh: bool = True,
+    ) -> list:
+        """
+        Batch version of get_object.
+
+        Resolves every identifier with a single DB query, fetches only the
+        missing or stale ones from the API concurrently (at most
+        max_concurrency requests in flight) and writes them back in bulk.
+        Returns the instances in the same order as identifiers, skipping the
+        ones the API could not resolve.
+        instance_kwargs maps an identifier to the kwargs passed to
+        build_instance/apply_data (ex: {"bulbasaur": {"pokemon": pokemon}}).
+        background_refresh=False refetches STALE instances inline instead of
+        scheduling a refresh task (ex: bulk ingestion).
+        """
+        assert cls.model is not None, "Defina cls.model no helper."
+        assert cls.service_method is not None, "Defina cls.service_method no helper."
+
+        instance_kwargs = cls.normalize_instance_kwargs(instance_kwargs)
+        keys = list(dict.fromkeys(cls.normalize_identifier(i) for i in identifiers))
+        if not keys:
+            return []
+
+        # uma única query para todos os identificadores (IDs e nomes)
+        found = cls.lookup_many(keys)
+        to_fetch = cls.plan_fetches(
+            keys, found, force_update, cache_days, background_refresh
+        )
+
+        # single-flight: busca apenas as chaves cujo lock foi obtido, as demais
+        # já estão sendo buscadas por outro worker
+        owned = cls.acquire_fetch_locks(to_fetch)
+        waiting = [key for key in to_fetch if key not in owned]
+
+        try:
+            cls.store_many(cls.fetch_many(owned, found), found, instance_kwargs)
+        finally:
+            cls.release_fetch_locks(owned)
+
+        if waiting:
+            cls.wait_for_fetches(waiting)
+            found.update(cls.lookup_many(waiting))
+            missing = cls.not_fresh(waiting, found, cache_days)
+            cls.store_many(cls.fetch_many(missing, found), found, instance_kwargs)
+
+        return cls.ordered_results(keys, found)
+
+    @classmethod
+    async def aget_many(
+        cls,
+        identifiers: list[str | int],
+        *,
+        force_update: bool = False,
+        cache_days: int | None = None,
+        instance_kwargs: dict | None = None,
+        background_refresh: bool = True,
+    ) -> list:
+        """
+        Async version of get_many: the API requests run concurrently on the
+        event loop, the DB and lock steps are shared with get_many.
+        """
+        assert cls.model is not None, "Defina cls.model no helper."
+        assert (
+            cls.async_service_method is not None
+        ), "Defina cls.async_service_method no helper."
+
+        instance_kwargs = cls.normalize_instance_kwargs(instance_kwargs)
+        keys = list(dict.fromkeys(cls.normalize_identifier(i) for i in identifiers))
+        if not keys:
+            return []
+
+        found = await sync_to_async(cls.lookup_many)(keys)
+        to_fetch = await sync_to_async(cls.plan_fetches)(
+            keys, found, force_update, cache_days, background_refresh
+        )
+
+        owned = await sync_to_async(cls.acquire_fetch_locks)(to_fetch)
+        waiting = [key for key in to_fetch if key not in owned]
+
+        try:
+            fetched = await cls.afetch_many(owned, found)
+            await sync_to_async(cls.store_many)(fetched, found, instance_kwargs)
+        finally:
+            await sync_to_async(cls.release_fetch_locks)(owned)
+
+        if waiting:
+            await cls.await_fetches(waiting)
+            found.update(await sync_to_async(cls.lookup_many)(waiting))
+            missing = cls.not_fresh(waiting, found, cache_days)
+            fetched = await cls.afetch_many(missing, found)
+            await sync_to_async(cls.store_many)(fetched, found, instance_kwargs)
+
+        return cls.ordered_results(keys, found)
+
+    @classmethod
+    def normalize_instance_kwargs(cls, instance_kwargs: dict | None) -> dict:
+        return {
+            cls.normalize_identifier(k): v for k, v in (instance_kwargs or {}).items()
+        }
+
+    @classmethod
+    def plan_fetches(
+        cls,
+        keys: list[str | int],
+        found: dict,
+        force_update: bool,
+        cache_days: int | None,
+        background_refresh: bool,
+    ) -> list[str | int]:
+        """
+        Returns the keys that must be fetched now: missing, EXPIRED or forced
+        ones, plus STALE ones when background_refresh is off (otherwise a
+        refresh task is scheduled for them).
+        """
+        to_fetch, stale = [], []
+        for key in keys:
+            if key not in found or force_update:
+                to_fetch.append(key)
+                continue
+
+            freshness = cls.get_freshness(found[key], cache_days)
+            if freshness == STALE and background_refresh:
+                stale.append(key)
+            elif freshness != FRESH:
+                to_fetch.append(key)
+
+        # uma ida ao Redis e uma task para a página inteira
+        cls.schedule_refreshes(stale)
+
+        if not force_update:
+            cls.record_lookup(timing.CACHE_HIT, len(keys) - len(to_fetch) - len(stale))
+            cls.record_lookup(timing.CACHE_STALE, len(stale))
+            cls.record_lookup(timing.CACHE_MISS, len(to_fetch))
+        return to_fetch
+
+    @classmethod
+    def acquire_fetch_locks(cls, keys: list[str | int]) -> list[str | int]:
+        return [
+            key
+            for key in keys
+            if acquire_lock(
+                cls.fetch_lock_key(key), timeout=settings.POKEAPI_FETCH_LOCK_SECONDS
+            )
+        ]
+
+    @classmethod
+    def release_fetch_locks(cls, keys: list[str | int]):
+        for key in keys:
+            release_lock(cls.fetch_lock_key(key))
+
+    @classmethod
+    def not_fresh(
+        cls, keys: list[str | int], found: dict, cache_days: int | None
+    ) -> list[str | int]:
+        return [
+            key
+            for key in keys
+            if key not in found or cls.get_freshness(found[key], cache_days) != FRESH
+        ]
+
+    @staticmethod
+    def ordered_results(keys: list[str | int], found: dict) -> list:
+        # na ordem de keys, sem repetir instâncias (ex: ID e nome do mesmo objeto)
+        results = {}
+        for key in keys:
+            instance = found.get(key)
+            if instance is not None:
+                results.setdefault(instance.pk, instance)
+        return list(results.values())
+
+    @classmethod
+    def lookup_many(cls, keys: list[str | int]) -> dict:
+        """
+        Loads the instances for normalized identifiers in a single query,
+        indexed by both external_id and lowercase name.
+        """
+        ids = [k for k in keys if isinstance(k, int)]
+        names = [k for k in keys if isinstance(k, str)]
+        found = {}
+        for instance in cls.model.objects.filter(
+            models.Q(external_id__in=ids) | models.Q(name__in=names)
+        ):
+            found[instance.external_id] = instance
+            found[instance.name.lower()] = instance
+        return found
+
+    @classmethod
+    def store_many(cls, fetched: dict, found: dict, instance_kwargs: dict):
+        """
+        Writes fetched API results in bulk: updates the instances already in
+        found (or only marks them verified when unchanged) and creates the
+        missing ones. found is updated in place.
+        """
+        to_create = {}
+        to_update = {}
+        to_verify = {}
+        for key, result in fetched.items():
+            if not result:
+                # falha na API: a instância que já temos é servida como está
+                if key in found:
+                    mark_stale(found[key])
+                continue
+
+            instance = found.get(key)
+            if instance is None and result.data is not None:
+                instance = found.get(result.data["id"])
+
+            if instance is not None and cls.is_unchanged(instance, result):
+                cls.apply_verification(instance, result)
+                to_verify[instance.external_id] = instance
+                continue
+
+            kwargs = {
+                "etag": result.etag,
+                "last_modified": result.last_modified,
+                **instance_kwargs.get(key, {}),
+            }
+            data = result.data
+            if instance is not None:
+                cls.apply_data(instance, data, **kwargs)
+                to_update[instance.external_id] = instance
+            elif data["id"] not in to_create:
+                to_create[data["id"]] = cls.build_instance(data, **kwargs)
+
+        if to_verify:
+            cls.model.objects.bulk_update(list(to_verify.values()), cls.verify_fields)
+
+        if to_update:
+            cls.model.objects.bulk_update(
+                list(to_update.values()), cls.bulk_update_fields
+            )
+
+        if to_create:
+            # ignore_conflicts: outro worker pode ter criado a mesma linha
+            cls.model.objects.bulk_create(
+                list(to_create.values()), ignore_conflicts=True
+            )
+            for instance in cls.model.objects.filter(external_id__in=to_create):
+                found[instance.external_id] = instance
+                found[instance.name.lower()] = instance
+
+        for key, result in fetched.items():
+            if result and result.data and key not in found:
+                if result.data["id"] in found:
+                    found[key] = found[result.data["id"]]
+
+    @classmethod
+    def fetch_many(
+        cls, identifiers: list[str | int], instances: dict | None = None
+    ) -> dict:
+        """
+        Fetches the identifiers from the API concurrently, bounded by
+        max_concurrency. instances (identifier -> stored instance) makes the
+        requests conditional. Failed requests are returned as False.
+        """
+        if not identifiers:
+            return {}
+
+        instances = instances or {}
+
+        def fetch(name_or_id):
+            try:
+                return cls.fetch(name_or_id, instances.get(name_or_id))
+            except PokeApiNotFound:
+                logger.warning(f"{cls.model.__name__} '{name_or_id}' não encontrado")
+                return False
+            except (PokeApiUnavailable, PokeApiDeadlineExceeded):
+                return False
+            except Exception:
+                logger.exception(f"Erro ao buscar {cls.model.__name__} '{name_or_id}'")
+                return False
+
+        # Cada worker roda numa cópia do contexto atual (lane do rate limit)
+        contexts = [copy_context() for _ in identifiers]
+        workers = max(1, min(cls.max_concurrency, len(identifiers)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                lambda context, name_or_id: context.run(fetch, name_or_id),
+                contexts,
+                identifiers,
+            )
+            return dict(zip(identifiers, results))
+
+    @classmethod
+    async def afetch_many(
+        cls, identifiers: list[str | int], instances: dict | None = None
+    ) -> dict:
+        """
+        Async version of fetch_many: the requests run on the event loop,
+        bounded by async_max_concurrency.
+        """
+        if not identifiers:
+            return {}
+
+        instances = instances or {}
+        semaphore = asyncio.Semaphore(cls.async_max_concurrency)
+
+        async def fetch(name_or_id):
+            async with semaphore:
+                try:
+                    return await cls.afetch(name_or_id, instances.get(name_or_id))
+                except PokeApiNotFound:
+                    logger.warning(
+                        f"{cls.model.__name__} '{name_or_id}' não encontrado"
+                    )
+                    return False
+                except (PokeApiUnavailable, PokeApiDeadlineExceeded):
+                    return False
+                except Exception:
+                    logger.exception(
+                        f"Erro ao buscar {cls.model.__name__} '{name_or_id}'"
+                    )
+                    return False
+
+        results = await asyncio.gather(*(fetch(i) for i in identifiers))
+        return dict(zip(identifiers, results))
+
+    @classmethod
+    def build_instance(
+        cls, data: dict, *, etag: str = "", last_modified: str = "", **kwargs
+    ):
         """
-        # by default creates only with the common fields
-        return cls.model.objects.create(
+        Builds a new (unsaved) instance. Subclasses that need extra fields
+        must override this method.
+        """
+        now = timezone.now()
+        return cls.model(
             external_id=data["id"],
             name=data.get("name", f"unknown-{data['id']}"),
             data=data,
-            last_updated=timezone.now(),
+            content_hash=compute_content_hash(data),
+            etag=etag,
+            upstream_last_modified=last_modified,
+            last_updated=now,
+            verified_at=now,
+            created_at=now,
+            updated_at=now,
+            **cls.model.project(data),
         )
 
+    @classmethod
+    def apply_data(
+        cls, instance, data: dict, *, etag: str = "", last_modified: str = "", **kwargs
+    ):
+        """
+        Applies fresh API data to an existing instance without saving it.
+        """
+        now = timezone.now()
+        instance.data = data
+        for field, value in cls.model.project(data).items():
+            setattr(instance, field, value)
+        instance.content_hash = compute_content_hash(data)
+        instance.etag = etag
+        instance.upstream_last_modified = last_modified
+        instance.last_updated = now
+        instance.verified_at = now
+        instance.updated_at = now
+        return instance
+
+    @classmethod
+    def create_or_get_instance(cls, data: dict, **kwargs):
+        """
+        Creates the instance, falling back to the row written concurrently by
+        another worker when a unique constraint is violated.
+        """
+        try:
+            with transaction.atomic():
+                return cls.create_instance(data, **kwargs)
+        except IntegrityError:
+            instance = cls.model.objects.filter(external_id=data["id"]).first()
+            if instance is None:
+                raise
+            return instance
+
+    @classmethod
+    def create_instance(cls, data: dict, **kwargs):
+        """
+        Create the instance in the database. Subclasses that need extra fields
+        (ex: pokemon from specie) must override build_instance.
+        """
+        instance = cls.build_instance(data, **kwargs)
+        instance.save()
+        return instance
+
     @classmethod
     def update_instance(cls, instance, data: dict, **kwargs):
         """
         Update the existing instance. Subclasses can override to
         handle additional relationships.
         """
-        instance.data = data
-        instance.last_updated = timezone.now()
-        instance.save(update_fields=["data", "last_updated"])
+        cls.apply_data(instance, data, **kwargs)
+        instance.save(update_fields=cls.bulk_update_fields)
         return instance
 
 
 class PokemonHelper(BasePokeApiHelper):
     model = Pokemon
     service_method = service.get_pokemon
+    async_service_method = async_service.get_pokemon
+    upstream_count_cache_key = "pokeapi:pokemon:upstream-count"
+    popularity_field = "external_id"
+    bulk_update_fields = (
+        BasePokeApiHelper.bulk_update_fields + Pokemon.projection_fields
+    )
+
+    @classmethod
+    def get_object(cls, name_or_id: str | int, **kwargs):
+        if not kwargs.get("force_update"):
+            pokemon = cls.get_hydrated(name_or_id, kwargs.get("cache_days"))
+            if pokemon is not None:
+                return pokemon
+
+        pokemon = super().get_object(name_or_id, **kwargs)
+        try:
+            PokemonSpecieHelper.get_object(name_or_id, pokemon=pokemon)
+        except PokeApiNotFound:
+            # formas alternativas (ex: deoxys-normal) não possuem specie própria
+            logger.warning(f"Specie de '{name_or_id}' não encontrada")
+        except PokeApiError:
+            # PokeAPI fora do ar: o Pokémon é servido sem a specie
+            logger.warning(f"Specie de '{name_or_id}' indisponível")
+            mark_stale(pokemon)
+        return pokemon
 
     @classmethod
-    def get_object(cls, name_or_id: str | int):
-        pokemon = super().get_object(name_or_id)
-        PokemonSpecieHelper.get_object(name_or_id, pokemon=pokemon)
+    async def aget_object(cls, name_or_id: str | int, **kwargs):
+        if not kwargs.get("force_update"):
+            pokemon = await sync_to_async(cls.get_hydrated)(
+                name_or_id, kwargs.get("cache_days")
+            )
+            if pokemon is not None:
+                return pokemon
+
+        pokemon = await super().aget_object(name_or_id, **kwargs)
+        try:
+            await PokemonSpecieHelper.aget_object(name_or_id, pokemon=pokemon)
+        except PokeApiNotFound:
+            # formas alternativas (ex: deoxys-normal) não possuem specie própria
+            logger.warning(f"Specie de '{name_or_id}' não encontrada")
+        except PokeApiError:
+            logger.warning(f"Specie de '{name_or_id}' indisponível")
+            mark_stale(pokemon)
         return pokemon
 
+    @classmethod
+    def get_hydrated(
+        cls, name_or_id: str | int, cache_days: int | None = None
+    ) -> Pokemon | None:
+        """
+        Read path for warm objects: loads the Pokémon, its specie and its
+        evolution chains in two queries, with no writes. Returns None when
+        any of them is missing, unlinked or expired, so that get_object falls
+        back to the full get/create/update flow.
+        """
+        pokemon = (
+            cls.model.objects.filter(cls.lookup_filter(name_or_id))
+            .select_related("specie")
+            .defer("specie__data")
+            .prefetch_related(
+                models.Prefetch(
+                    "evolution_chains",
+                    queryset=PokemonEvolutionChain.objects.defer("data"),
+                )
+            )
+            .first()
+        )
+        if pokemon is None:
+            return None
+
+        rows = [(cls, pokemon, cache_days)]
+        specie = getattr(pokemon, "specie", None)
+        if specie is None:
+            # formas alternativas não possuem specie: só vale se a API já
+            # respondeu 404 para ela
+            if not cache.get(PokemonSpecieHelper.not_found_cache_key(name_or_id)):
+                return None
+        else:
+            rows.append((PokemonSpecieHelper, specie, None))
+            if specie.evolution_chain_external_id:
+                chain = next(
+                    (
+                        chain
+                        for chain in pokemon.evolution_chains.all()
+                        if chain.external_id == specie.evolution_chain_external_id
+                    ),
+                    None,
+                )
+                if chain is None:
+                    return None
+                rows.append((PokemonEvolutionChainHelper, chain, None))
+
+        freshness = [
+            (helper, row, helper.get_freshness(row, row_cache_days))
+            for helper, row, row_cache_days in rows
+        ]
+        if any(state == EXPIRED for _, _, state in freshness):
+            return None
+
+        for helper, row, state in freshness:
+            if state == STALE:
+                helper.record_lookup(timing.CACHE_STALE)
+                helper.schedule_refresh(
+                    name_or_id if row is pokemon else row.external_id
+                )
+            else:
+                helper.record_lookup(timing.CACHE_HIT)
+        return pokemon
+
+    @classmethod
+    def get_many(
+        cls, identifiers: list[str | int], *, with_relations: bool = True, **kwargs
+    ) -> list[Pokemon]:
+        pokemons = super().get_many(identifiers, **kwargs)
+        if with_relations:
+            PokemonSpecieHelper.get_many_for_pokemons(
+                pokemons, background_refresh=kwargs.get("background_refresh", True)
+            )
+        return pokemons
+
+    @classmethod
+    async def aget_many(
+        cls, identifiers: list[str | int], *, with_relations: bool = True, **kwargs
+    ) -> list[Pokemon]:
+        pokemons = await super().aget_many(identifiers, **kwargs)
+        if with_relations:
+            await PokemonSpecieHelper.aget_many_for_pokemons(
+                pokemons, background_refresh=kwargs.get("background_refresh", True)
+            )
+        return pokemons
+
+    @staticmethod
+    def prefetch_species(pokemons: list[Pokemon]):
+        """
+        Loads the species used by the serializer (flavor_text) in a single
+        query, without their raw data.
+        """
+        prefetch_related_objects(
+            pokemons,
+            models.Prefetch(
+                "specie",
+                queryset=PokemonSpecie.objects.only("id", "pokemon_id", "flavor_text"),
+            ),
+        )
+
+    @staticmethod
+    def record_hits(pokemons: list[Pokemon]):
+        """
+        Counts one request for each Pokémon in the popularity ranking used by
+        the background refresh scheduler.
+        """
+        if not pokemons:
+            return
+        try:
+            redis = get_redis_connection("default")
+            pipeline = redis.pipeline(transaction=False)
+            for pokemon in pokemons:
+                pipeline.zincrby(POPULARITY_KEY, 1, pokemon.external_id)
+            pipeline.execute()
+        except Exception:
+            # a popularidade é só uma heurística, não deve derrubar a requisição
+            logger.warning("Erro ao registrar popularidade dos Pokémons")
+
+    @classmethod
+    def set_upstream_count(cls, count: int | None):
+        """
+        Remembers the total number of Pokémon reported by the PokeAPI list.
+        """
+        if count is not None:
+            cache.set(
+                cls.upstream_count_cache_key,
+                count,
+                settings.POKEAPI_UPSTREAM_COUNT_CACHE_SECONDS,
+            )
+
+    @classmethod
+    def get_local_catalog_count(cls) -> int | None:
+        """
+        Returns the number of locally stored Pokémon when the local catalog is
+        known to be complete (at least the cached upstream count), None otherwise.
+        """
+        upstream_count = cache.get(cls.upstream_count_cache_key)
+        if upstream_count is None:
+            return None
+
+        local_count = cls.model.objects.count()
+        if local_count < upstream_count:
+            return None
+        return local_count
+
     @staticmethod
     def favorite_pokemon(user: User, pokemon: Pokemon):
         already_favorited = FavoritedPokemon.objects.filter(
@@ -116,58 +1149,206 @@ class PokemonHelper(BasePokeApiHelper):
 class PokemonSpecieHelper(BasePokeApiHelper):
     model = PokemonSpecie
     service_method = service.get_pokemon_specie
+    async_service_method = async_service.get_pokemon_specie
+    bulk_update_fields = (
+        BasePokeApiHelper.bulk_update_fields
+        + PokemonSpecie.projection_fields
+        + ["pokemon"]
+    )
+    popularity_field = "pokemon__external_id"
 
     @classmethod
     def get_object(cls, name_or_id: str | int, *, pokemon=None, **kwargs):
         specie = super().get_object(name_or_id, pokemon=pokemon, **kwargs)
 
         # chama a evolution chain
-        evo_chain_url = specie.data.get("evolution_chain", {}).get("url")
-        if evo_chain_url:
-            evo_chain_id = evo_chain_url.rstrip("/").split("/")[-1]
+        if specie.evolution_chain_external_id:
             evolution_chain = PokemonEvolutionChainHelper.get_object(
-                int(evo_chain_id), specie=specie
+                specie.evolution_chain_external_id, specie=specie
             )
 
-            # associa a specie e o pokemon
-            evolution_chain.species.add(specie)
-            if pokemon:
-                evolution_chain.pokemons.add(pokemon)
+            # associa a specie e o pokemon (insere só as relações que faltam)
+            PokemonEvolutionChainHelper.link_members([(evolution_chain, specie)])
 
         return specie
 
     @classmethod
-    def create_instance(cls, data: dict, *, pokemon=None, **kwargs):
+    async def aget_object(cls, name_or_id: str | int, *, pokemon=None, **kwargs):
+        specie = await super().aget_object(name_or_id, pokemon=pokemon, **kwargs)
+
+        if specie.evolution_chain_external_id:
+            evolution_chain = await PokemonEvolutionChainHelper.aget_object(
+                specie.evolution_chain_external_id, specie=specie
+            )
+            await sync_to_async(PokemonEvolutionChainHelper.link_members)(
+                [(evolution_chain, specie)]
+            )
+
+        return specie
+
+    @classmethod
+    def get_many_for_pokemons(
+        cls, pokemons: list[Pokemon], *, by_external_id: bool = False, **kwargs
+    ) -> list[PokemonSpecie]:
+        """
+        Batch version of get_object for a list of Pokémon: resolves their
+        species and evolution chains in bulk. kwargs are passed to get_many.
+        by_external_id looks the species up by the Pokémon external_id
+        instead of its name, for default varieties whose name differs from
+        the species (ex: deoxys-normal).
+        """
+        identifiers = cls.get_pokemon_identifiers(pokemons, by_external_id)
+        species = cls.get_many(
+            list(identifiers),
+            instance_kwargs={
+                identifier: {"pokemon": pokemon}
+                for identifier, pokemon in identifiers.items()
+            },
+            **kwargs,
+        )
+
+        species_by_chain = cls.group_by_chain(species)
+        chains = PokemonEvolutionChainHelper.get_many(list(species_by_chain), **kwargs)
+        PokemonEvolutionChainHelper.link_members(
+            cls.chain_members(chains, species_by_chain)
+        )
+        return species
+
+    @classmethod
+    async def aget_many_for_pokemons(
+        cls, pokemons: list[Pokemon], *, by_external_id: bool = False, **kwargs
+    ) -> list[PokemonSpecie]:
+        """
+        Async version of get_many_for_pokemons.
+        """
+        identifiers = cls.get_pokemon_identifiers(pokemons, by_external_id)
+        species = await cls.aget_many(
+            list(identifiers),
+            instance_kwargs={
+                identifier: {"pokemon": pokemon}
+                for identifier, pokemon in identifiers.items()
+            },
+            **kwargs,
+        )
+
+        species_by_chain = cls.group_by_chain(species)
+        chains = await PokemonEvolutionChainHelper.aget_many(
+            list(species_by_chain), **kwargs
+        )
+        await sync_to_async(PokemonEvolutionChainHelper.link_members)(
+            cls.chain_members(chains, species_by_chain)
+        )
+        return species
+
+    @staticmethod
+    def get_pokemon_identifiers(
+        pokemons: list[Pokemon], by_external_id: bool
+    ) -> dict[str | int, Pokemon]:
+        return {
+            pokemon.external_id if by_external_id else pokemon.name: pokemon
+            for pokemon in pokemons
+        }
+
+    @staticmethod
+    def group_by_chain(species: list[PokemonSpecie]) -> dict:
+        species_by_chain = {}
+        for specie in species:
+            if specie.evolution_chain_external_id:
+                species_by_chain.setdefault(
+                    specie.evolution_chain_external_id, []
+                ).append(specie)
+        return species_by_chain
+
+    @staticmethod
+    def chain_members(
+        chains: list[PokemonEvolutionChain], species_by_chain: dict
+    ) -> list[tuple[PokemonEvolutionChain, PokemonSpecie]]:
+        return [
+            (chain, specie)
+            for chain in chains
+            for specie in species_by_chain.get(chain.external_id, [])
+        ]
+
+    @classmethod
+    def build_instance(cls, data: dict, *, pokemon=None, **kwargs):
         if pokemon is None:
             raise ValueError(
-                "PokemonSpecieHelper.create_instance requires the 'pokemon' parameter."
+                "PokemonSpecieHelper.build_instance requires the 'pokemon' parameter."
             )
 
-        with transaction.atomic():
-            instance = cls.model.objects.create(
-                external_id=data["id"],
-                name=data.get("name", f"unknown-{data['id']}"),
-                data=data,
-                pokemon=pokemon,
-                last_updated=timezone.now(),
-            )
+        instance = super().build_instance(data, **kwargs)
+        instance.pokemon = pokemon
         return instance
 
     @classmethod
-    def update_instance(cls, instance, data: dict, *, pokemon=None, **kwargs):
-        instance.data = data
-        instance.last_updated = timezone.now()
+    def apply_data(cls, instance, data: dict, *, pokemon=None, **kwargs):
+        super().apply_data(instance, data, **kwargs)
         if pokemon and instance.pokemon_id != pokemon.id:
             instance.pokemon = pokemon
-            instance.save(update_fields=["data", "last_updated", "pokemon"])
-        else:
-            instance.save(update_fields=["data", "last_updated"])
         return instance
 
 
 class PokemonEvolutionChainHelper(BasePokeApiHelper):
     model = PokemonEvolutionChain
     service_method = service.get_evolution_chain
+    async_service_method = async_service.get_evolution_chain
+
+    @classmethod
+    def build_instance(cls, data: dict, **kwargs):
+        instance = super().build_instance(data, **kwargs)
+        instance.name = data.get("name", f"evo-chain-{data['id']}")
+        return instance
+
+    @classmethod
+    def link_members(cls, pairs: list[tuple[PokemonEvolutionChain, PokemonSpecie]]):
+        """
+        Associates species (and their Pokémon) to evolution chains in bulk,
+        inserting only the missing relation rows.
+        """
+        if not pairs:
+            return
+
+        chain_ids = {chain.id for chain, _ in pairs}
+        SpeciesThrough = cls.model.species.through
+        PokemonsThrough = cls.model.pokemons.through
+
+        existing_species = set(
+            SpeciesThrough.objects.filter(
+                pokemonevolutionchain_id__in=chain_ids
+            ).values_list("pokemonevolutionchain_id", "pokemonspecie_id")
+        )
+        existing_pokemons = set(
+            PokemonsThrough.objects.filter(
+                pokemonevolutionchain_id__in=chain_ids
+            ).values_list("pokemonevolutionchain_id", "pokemon_id")
+        )
+
+        new_species = {
+            (chain.id, specie.id)
+            for chain, specie in pairs
+            if (chain.id, specie.id) not in existing_species
+        }
+        new_pokemons = {
+            (chain.id, specie.pokemon_id)
+            for chain, specie in pairs
+            if specie.pokemon_id
+            and (chain.id, specie.pokemon_id) not in existing_pokemons
+        }
+
+        SpeciesThrough.objects.bulk_create(
+            [
+                SpeciesThrough(pokemonevolutionchain_id=c, pokemonspecie_id=s)
+                for c, s in new_species
+            ],
+            ignore_conflicts=True,
+        )
+        PokemonsThrough.objects.bulk_create(
+            [
+                PokemonsThrough(pokemonevolutionchain_id=c, pokemon_id=p)
+                for c, p in new_pokemons
+            ],
+            ignore_conflicts=True,
+        )
 
     @classmethod
     def create_instance(cls, data: dict, *, specie=None, **kwargs):
@@ -177,12 +1358,7 @@ class PokemonEvolutionChainHelper(BasePokeApiHelper):
             )
 
         with transaction.atomic():
-            instance = cls.model.objects.create(
-                external_id=data["id"],
-                name=data.get("name", f"evo-chain-{data['id']}"),
-                data=data,
-                last_updated=timezone.now(),
-            )
+            instance = super().create_instance(data, **kwargs)
 
             # associa depois de criar
             instance.species.add(specie)
@@ -193,13 +1369,293 @@ class PokemonEvolutionChainHelper(BasePokeApiHelper):
 
     @classmethod
     def update_instance(cls, instance, data: dict, *, specie=None, **kwargs):
-        instance.data = data
-        instance.last_updated = timezone.now()
-        instance.save(update_fields=["data", "last_updated"])
+        super().update_instance(instance, data, **kwargs)
 
         if specie:
-            instance.species.add(specie)
-            if hasattr(specie, "pokemon"):
-                instance.pokemons.add(specie.pokemon)
+            cls.link_members([(instance, specie)])
 
         return instance
+
+
+class PokeApiCatalogHelper:
+    """
+    Ingests the whole PokeAPI catalog page by page. The progress is
+    checkpointed in Redis, so an interrupted sync resumes where it stopped.
+    """
+
+    stages = ["pokemon", "species", "evolution-chain"]
+    checkpoint_cache_key = "pokeapi:sync:checkpoint"
+    lock_cache_key = "pokeapi:sync:lock"
+
+    @classmethod
+    def sync(
+        cls,
+        stages: list[str] | None = None,
+        page_size: int = 100,
+        restart: bool = False,
+        max_seconds: float | None = None,
+    ) -> dict | None:
+        """
+        Runs the given stages (all by default) and returns the number of
+        objects ingested per stage, or None if another sync is running.
+        With max_seconds, stops after the first page that ends past it and
+        keeps the checkpoint (see is_pending), so the next run resumes there.
+        """
+        stop_at = time.monotonic() + max_seconds if max_seconds else None
+        stages = [stage for stage in cls.stages if not stages or stage in stages]
+
+        if not acquire_lock(
+            cls.lock_cache_key, timeout=settings.POKEAPI_SYNC_LOCK_SECONDS
+        ):
+            logger.info("[sync_pokeapi] Sincronização já em andamento")
+            return None
+
+        try:
+            if restart:
+                cache.delete(cls.checkpoint_cache_key)
+            checkpoint = cache.get(cls.checkpoint_cache_key) or {}
+
+            summary = {}
+            for stage in stages:
+                offset = 0
+                if checkpoint.get("stage") in stages:
+                    checkpoint_index = stages.index(checkpoint["stage"])
+                    if stages.index(stage) < checkpoint_index:
+                        continue
+                    if stage == checkpoint["stage"]:
+                        offset = checkpoint["offset"]
+
+                summary[stage], done = cls.sync_stage(stage, page_size, offset, stop_at)
+                if not done:
+                    return summary
+
+            cache.delete(cls.checkpoint_cache_key)
+            return summary
+        finally:
+            release_lock(cls.lock_cache_key)
+
+    @classmethod
+    def sync_stage(
+        cls,
+        stage: str,
+        page_size: int,
+        offset: int = 0,
+        stop_at: float | None = None,
+    ) -> tuple[int, bool]:
+        """
+        Ingests the pages of a stage from offset, checkpointing after each
+        one. Returns the number of objects ingested and whether the stage was
+        finished (False when stop_at, a time.monotonic() value, was reached).
+        """
+        list_method, ingest = {
+            "pokemon": (service.get_pokemon_list, cls.ingest_pokemons),
+            "species": (service.get_pokemon_species_list, cls.ingest_species),
+            "evolution-chain": (
+                service.get_evolution_chains_list,
+                cls.ingest_evolution_chains,
+            ),
+        }[stage]
+
+        total = 0
+        while True:
+            page = list_method(limit=page_size, offset=offset)
+            results = page.get("results", [])
+            if not results:
+                break
+
+            if stage == "pokemon":
+                PokemonHelper.set_upstream_count(page.get("count"))
+
+            total += ingest(results)
+            offset += len(results)
+
+            cache.set(
+                cls.checkpoint_cache_key, {"stage": stage, "offset": offset}, None
+            )
+            cache.touch(cls.lock_cache_key, settings.POKEAPI_SYNC_LOCK_SECONDS)
+            logger.info(f"[sync_pokeapi] {stage}: {offset}/{page.get('count')}")
+
+            if not page.get("next"):
+                break
+            if stop_at is not None and time.monotonic() >= stop_at:
+                return total, False
+
+        return total, True
+
+    @classmethod
+    def is_pending(cls) -> bool:
+        """
+        Whether a sync was interrupted and has a checkpoint to resume from.
+        """
+        return cache.get(cls.checkpoint_cache_key) is not None
+
+    @staticmethod
+    def ingest_pokemons(results: list[dict]) -> int:
+        names = [item["name"] for item in results]
+        pokemons = PokemonHelper.get_many(
+            names, with_relations=False, background_refresh=False
+        )
+        return len(pokemons)
+
+    @staticmethod
+    def ingest_species(results: list[dict]) -> int:
+        # species são associadas à sua variedade padrão, que na PokeAPI tem o
+        # mesmo id da species (o nome pode diferir: deoxys -> deoxys-normal)
+        ids = [int(item["url"].rstrip("/").split("/")[-1]) for item in results]
+        pokemons = list(Pokemon.objects.filter(external_id__in=ids))
+        species = PokemonSpecieHelper.get_many_for_pokemons(
+            pokemons, by_external_id=True, background_refresh=False
+        )
+        return len(species)
+
+    @staticmethod
+    def ingest_evolution_chains(results: list[dict]) -> int:
+        ids = [int(item["url"].rstrip("/").split("/")[-1]) for item in results]
+        chains = PokemonEvolutionChainHelper.get_many(ids, background_refresh=False)
+
+        chains_by_specie = {}
+        for chain in chains:
+            for name in chain.species_names:
+                chains_by_specie.setdefault(name, []).append(chain)
+
+        PokemonEvolutionChainHelper.link_members(
+            [
+                (chain, specie)
+                for specie in PokemonSpecie.objects.filter(name__in=chains_by_specie)
+                for chain in chains_by_specie[specie.name]
+            ]
+        )
+        return len(chains)
+
+
+class PokeApiRefreshHelper:
+    """
+    Refreshes rows before they expire, spending a fixed upstream request
+    budget per run on the most requested and oldest rows first.
+    """
+
+    helpers = [PokemonHelper, PokemonSpecieHelper, PokemonEvolutionChainHelper]
+    # species e cadeias entram como candidatos próprios, sem cascata
+    refresh_kwargs = {PokemonHelper: {"with_relations": False}}
+    lock_cache_key = "pokeapi:refresh-due:lock"
+
+    @staticmethod
+    def get_popularity() -> dict[int, float]:
+        try:
+            redis = get_redis_connection("default")
+            ranking = redis.zrange(POPULARITY_KEY, 0, -1, withscores=True)
+        except Exception:
+            logger.warning("Erro ao ler popularidade dos Pokémons")
+            return {}
+        return {int(external_id): hits for external_id, hits in ranking}
+
+    @staticmethod
+    def decay_popularity():
+        """
+        Multiplies every hit count by POKEAPI_POPULARITY_DECAY, so the ranking
+        follows recent traffic, and drops the entries that faded out.
+        """
+        try:
+            redis = get_redis_connection("default")
+            redis.zunionstore(
+                POPULARITY_KEY, {POPULARITY_KEY: settings.POKEAPI_POPULARITY_DECAY}
+            )
+            redis.zremrangebyscore(POPULARITY_KEY, 0, 0.01)
+        except Exception:
+            logger.warning("Erro ao atualizar popularidade dos Pokémons")
+
+    @staticmethod
+    def get_due(
+        helper, popularity: dict[int, float], budget: int
+    ) -> list[tuple[float, int]]:
+        """
+        Returns (priority, external_id) for the rows of a helper that expire
+        within POKEAPI_REFRESH_LEAD_HOURS. The priority grows with the number
+        of hits and with how much of its TTL the row has already used.
+
+        Only rows past the shortest possible TTL are read (an indexed filter),
+        and among them only the popular ones and the `budget` oldest ones are
+        scored: a run never refreshes more than `budget` rows.
+        """
+        now = timezone.now()
+        lead = timedelta(hours=settings.POKEAPI_REFRESH_LEAD_HOURS)
+        # o jitter só encurta o TTL: nenhuma linha vence antes deste corte
+        min_ttl = timedelta(days=helper.cache_ttl_days) * (
+            1 - settings.POKEAPI_TTL_JITTER
+        )
+        cutoff = now - (min_ttl - lead)
+        rows = helper.model.objects.filter(
+            models.Q(verified_at__lte=cutoff)
+            | models.Q(verified_at__isnull=True, last_updated__lte=cutoff)
+        )
+
+        fields = ["external_id", "last_updated", "verified_at"]
+        oldest = rows.order_by(Coalesce("verified_at", "last_updated"))[:budget]
+        querysets = [oldest]
+        if helper.popularity_field:
+            fields.append(helper.popularity_field)
+            querysets.append(
+                rows.filter(**{f"{helper.popularity_field}__in": list(popularity)})
+            )
+        candidates = {
+            row["external_id"]: row
+            for queryset in querysets
+            for row in queryset.values(*fields)
+        }
+
+        due = []
+        for row in candidates.values():
+            ttl = helper.get_ttl(row["external_id"])
+            age = now - (row["verified_at"] or row["last_updated"])
+            if age < ttl - lead:
+                continue
+
+            hits = popularity.get(row.get(helper.popularity_field), 0)
+            due.append(((1 + hits) * (age / ttl), row["external_id"]))
+        return due
+
+    @classmethod
+    def refresh_due(cls, budget: int | None = None) -> dict | None:
+        """
+        Refreshes up to `budget` due rows (POKEAPI_REFRESH_BUDGET by default)
+        and returns how many rows of each helper were refreshed, or None if
+        another run is in progress.
+        """
+        budget = budget if budget is not None else settings.POKEAPI_REFRESH_BUDGET
+
+        if not acquire_lock(
+            cls.lock_cache_key, timeout=settings.POKEAPI_REFRESH_LOCK_SECONDS
+        ):
+            logger.info("[refresh_pokeapi] Refresh já em andamento")
+            return None
+
+        try:
+            popularity = cls.get_popularity()
+            candidates = [
+                (priority, index, external_id)
+                for index, helper in enumerate(cls.helpers)
+                for priority, external_id in cls.get_due(helper, popularity, budget)
+            ]
+            candidates.sort(reverse=True)
+
+            selected = {}
+            for _, index, external_id in candidates[:budget]:
+                selected.setdefault(cls.helpers[index], []).append(external_id)
+
+            summary = {}
+            for helper, ids in selected.items():
+                refreshed = helper.get_many(
+                    ids,
+                    force_update=True,
+                    background_refresh=False,
+                    **cls.refresh_kwargs.get(helper, {}),
+                )
+                summary[helper.__name__] = len(refreshed)
+
+            cls.decay_popularity()
+            logger.info(
+                f"[refresh_pokeapi] {len(candidates)} vencendo, atualizados: {summary}"
+            )
+            return summary
+        finally:
+            release_lock(cls.lock_cache_key)
@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from pokemons.benchmarks import BenchmarkRunner, build_corpus, compare_results
+from pokemons.replay import MODE_REPLAY, ReplayStore
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the Pokémon list/retrieve, evolution chain and favorites "
+        "endpoints (cold and warm cache) against a throwaway test database, "
+        "with the PokeAPI replayed from disk. Saves the results as JSON and "
+        "optionally fails on regressions against a baseline. Cold runs flush "
+        "the cache, so it needs a dedicated Redis database (--redis-url)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument(
+            "--size", type=int, default=60, help="Pokémon in the synthetic corpus."
+        )
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Concurrent clients when measuring the throughput of warm scenarios.",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            help="Run only the scenarios whose name contains this (can be repeated).",
+        )
+        parser.add_argument(
+            "--replay-dir",
+            help="Use a recorded corpus (POKEAPI_REPLAY_MODE=record) instead of "
+            "the synthetic one.",
+        )
+        parser.add_argument("--output", default="benchmark-results.json")
+        parser.add_argument("--baseline", help="Results JSON to compare against.")
+        parser.add_argument(
+            "--latency-tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed p95 increase over the baseline (fraction).",
+        )
+        parser.add_argument(
+            "--redis-url",
+            default=os.getenv("BENCHMARK_REDIS_URL"),
+            help="Dedicated Redis database for the run (ex: redis://redis:6379/15); "
+            "defaults to BENCHMARK_REDIS_URL. Never the one in CACHES.",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database between runs.",
+        )
+
+    def handle(self, *args, **options):
+        caches = self.get_benchmark_caches(options["redis_url"])
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            # os resets do cenário frio só apagam chaves do Redis do benchmark
+            with override_settings(CACHES=caches):
+                results = self.run_benchmarks(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        with open(options["output"], "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+        self.print_results(results)
+        self.stdout.write(f"Results saved to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare_results(
+                results, baseline, options["latency_tolerance"], options["only"]
+            )
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f"{len(regressions)} regression(s) against baseline")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    @staticmethod
+    def get_benchmark_caches(redis_url: str | None) -> dict:
+        """
+        CACHES pointing at the benchmark Redis database. Refuses to run
+        without one, or with the database the service uses: cold scenarios
+        delete the pokeapi:* keys (sync checkpoint, locks, chain trees...).
+        """
+        if not redis_url:
+            raise CommandError(
+                "Pass --redis-url (or BENCHMARK_REDIS_URL) with a dedicated Redis "
+                "database: cold runs delete the pokeapi:* keys."
+            )
+        default = settings.CACHES["default"]
+        if redis_url.rstrip("/") == str(default.get("LOCATION", "")).rstrip("/"):
+            raise CommandError(
+                "--redis-url is the Redis database used by the service; "
+                "use a dedicated one."
+            )
+        return {
+            **settings.CACHES,
+            "default": {**default, "LOCATION": redis_url, "KEY_PREFIX": "benchmark"},
+        }
+
+    def run_benchmarks(self, options) -> dict:
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            replay_dir = options["replay_dir"] or corpus_dir
+            if not options["replay_dir"]:
+                build_corpus(
+                    ReplayStore(corpus_dir), options["size"], options["page_size"]
+                )
+
+            # sem rate limit, breaker, hedge e prazo: mede só o serviço
+            with override_settings(
+                POKEAPI_REPLAY_MODE=MODE_REPLAY,
+                POKEAPI_REPLAY_DIR=replay_dir,
+                POKEAPI_RATE_LIMIT_QPS=0,
+                POKEAPI_CIRCUIT_BREAKER=False,
+                POKEAPI_HEDGE_REQUESTS=False,
+                POKEAPI_REQUEST_DEADLINE_SECONDS=0,
+            ):
+                user, _ = User.objects.get_or_create(email="benchmark@example.com")
+                runner = BenchmarkRunner(
+                    user,
+                    size=options["size"],
+                    page_size=options["page_size"],
+                    iterations=options["iterations"],
+                    concurrency=options["concurrency"],
+                )
+                return runner.run(options["only"])
+
+    def print_results(self, results: dict):
+        header = (
+            f"{'scenario':<26}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'queries':>9}{'upstream':>10}"
+        )
+        self.stdout.write(header)
+        for name, result in results["scenarios"].items():
+            line = (
+                f"{name:<26}{result['throughput'] or '-':>9}{result['p50_ms']:>10}"
+                f"{result['p95_ms']:>10}{result['p99_ms']:>10}"
+                f"{result['queries_per_request']:>9}"
+                f"{result['upstream_calls_per_request']:>10}"
+            )
+            if result["errors"]:
+                line += f"  ({result['errors']} errors)"
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
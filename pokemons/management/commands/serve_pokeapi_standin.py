@@ -0,0 +1,115 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pokemons.replay import ReplayStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves the recorded PokeAPI corpus (see POKEAPI_REPLAY_MODE=record) over "
+        "HTTP, with optional latency and error injection. Point BASE_URL at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=settings.POKEAPI_REPLAY_DIR)
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--prefix",
+            default="/api/v2",
+            help="Path prefix stripped before the lookup (BASE_URL path).",
+        )
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=0,
+            help="Fixed delay added to every response.",
+        )
+        parser.add_argument(
+            "--jitter-ms",
+            type=float,
+            default=0,
+            help="Random extra delay, uniform between 0 and this value.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Fraction of requests (0 to 1) answered with --error-status.",
+        )
+        parser.add_argument("--error-status", type=int, default=503)
+        parser.add_argument(
+            "--seed", type=int, help="Random seed, for reproducible runs."
+        )
+
+    def handle(self, *args, **options):
+        store = ReplayStore(options["dir"])
+        rng = random.Random(options["seed"])
+        prefix = options["prefix"].rstrip("/")
+
+        class StandInHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                delay = options["latency_ms"] + rng.uniform(0, options["jitter_ms"])
+                if delay:
+                    time.sleep(delay / 1000)
+
+                if rng.random() < options["error_rate"]:
+                    return self.send_json(
+                        options["error_status"], {"detail": "Injected error."}
+                    )
+
+                endpoint = self.path
+                if prefix and endpoint.startswith(prefix):
+                    endpoint = endpoint[len(prefix) :]
+
+                entry = store.load_entry("GET", endpoint)
+                if entry is None:
+                    return self.send_json(404, {"detail": "Not found."})
+                if not entry["body"]:
+                    return self.send_json(entry["status"], {"detail": "Not found."})
+
+                etag = entry["headers"].get("ETag", f'"{entry["body"]}"')
+                if self.headers.get("If-None-Match") == etag:
+                    return self.send_body(304, b"", {"ETag": etag})
+
+                headers = {**entry["headers"], "ETag": etag}
+                headers.setdefault("Content-Type", "application/json; charset=utf-8")
+                self.send_body(entry["status"], store.load_body(entry["body"]), headers)
+
+            def send_json(self, status: int, data: dict):
+                self.send_body(
+                    status,
+                    json.dumps(data).encode(),
+                    {"Content-Type": "application/json; charset=utf-8"},
+                )
+
+            def send_body(self, status: int, body: bytes, headers: dict):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options["host"], options["port"]), StandInHandler)
+        self.stdout.write(
+            f"Serving {options['dir']} on http://{options['host']}:{options['port']}"
+            f"{prefix}/"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from pokemons.helpers import PokeApiCatalogHelper
+from pokemons.ratelimit import LANE_BULK, upstream_lane
+from pokemons.tasks import sync_pokeapi_catalog
+
+
+class Command(BaseCommand):
+    help = "Ingests the whole PokeAPI catalog (pokemon, species and evolution chains)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stage",
+            action="append",
+            dest="stages",
+            choices=PokeApiCatalogHelper.stages,
+            help="Stage to run (can be repeated). Defaults to all stages.",
+        )
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the saved checkpoint and start from the beginning.",
+        )
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="run_async",
+            help="Enqueue the sync on Celery instead of running it here.",
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {
+            "stages": options["stages"],
+            "page_size": options["page_size"],
+            "restart": options["restart"],
+        }
+
+        if options["run_async"]:
+            result = sync_pokeapi_catalog.delay(**kwargs)
+            self.stdout.write(f"Sync enqueued (task {result.id})")
+            return
+
+        # aqui não há limite de tempo: roda até o fim, sem reenfileirar
+        with upstream_lane(LANE_BULK):
+            summary = PokeApiCatalogHelper.sync(**kwargs)
+        if summary is None:
+            self.stdout.write(self.style.WARNING("Another sync is already running."))
+            return
+
+        for stage, total in summary.items():
+            self.stdout.write(f"{stage}: {total} objects")
+        self.stdout.write(self.style.SUCCESS("PokeAPI catalog synchronized."))
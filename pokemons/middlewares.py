@@ -0,0 +1,145 @@
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from pokemons import timing
+from pokemons.deadline import request_deadline
+from pokemons.helpers import track_stale_objects
+
+logger = logging.getLogger(__name__)
+
+STALE_WARNING = '110 - "Response is Stale"'
+
+
+class HybridMiddleware:
+    """
+    Base of the middlewares below: runs natively on both stacks, so ASGI
+    requests (AsyncPokemonView) do not hop between the event loop and a
+    thread at each of them. Subclasses implement __call__ (WSGI) and
+    __acall__ (ASGI).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class ServerTimingMiddleware(HybridMiddleware):
+    """
+    Measures where each request spends its time (DB queries, PokeAPI calls,
+    rate limit waits, serialization) and the cache lookups of every helper,
+    and reports it in the Server-Timing header (SERVER_TIMING_ENABLED) and
+    as a structured log line (SERVER_TIMING_LOG).
+    """
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return settings.SERVER_TIMING_ENABLED or settings.SERVER_TIMING_LOG
+
+    def handle(self, request):
+        if not self.is_enabled():
+            return self.get_response(request)
+
+        # as queries são medidas em cada conexão (install_db_execute_wrapper)
+        with timing.collect_metrics() as metrics:
+            response = self.get_response(request)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not self.is_enabled():
+            return await self.get_response(request)
+
+        with timing.collect_metrics() as metrics:
+            response = await self.get_response(request)
+        return self.report(request, response, metrics)
+
+    def report(self, request, response, metrics: timing.RequestMetrics):
+        metrics.finish()
+        if settings.SERVER_TIMING_ENABLED:
+            response["Server-Timing"] = metrics.server_timing()
+        if settings.SERVER_TIMING_LOG:
+            logger.info(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        **metrics.to_dict(),
+                    }
+                )
+            )
+        return response
+
+
+class StaleResponseMiddleware(HybridMiddleware):
+    """
+    Flags responses built from local data that could not be revalidated
+    because the PokeAPI was unavailable (see helpers.mark_stale): they get a
+    Warning: 110 header and X-Stale-Objects lists what was served stale.
+    """
+
+    def handle(self, request):
+        with track_stale_objects() as stale_objects:
+            response = self.get_response(request)
+        return self.flag_stale(response, stale_objects)
+
+    async def __acall__(self, request):
+        with track_stale_objects() as stale_objects:
+            response = await self.get_response(request)
+        return self.flag_stale(response, stale_objects)
+
+    @staticmethod
+    def flag_stale(response, stale_objects: list):
+        if stale_objects:
+            response["Warning"] = STALE_WARNING
+            response["X-Stale-Objects"] = ",".join(dict.fromkeys(stale_objects))
+        return response
+
+
+class RequestDeadlineMiddleware(HybridMiddleware):
+    """
+    Gives each request a time budget for PokeAPI calls: the
+    POKEAPI_REQUEST_DEADLINE_SECONDS default, shortened by the client through
+    the POKEAPI_REQUEST_DEADLINE_HEADER header (in seconds). Once it runs
+    out, the remaining upstream fetches are skipped and the helpers answer
+    with what is stored locally.
+    """
+
+    def handle(self, request):
+        with request_deadline(self.get_budget(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with request_deadline(self.get_budget(request)):
+            return await self.get_response(request)
+
+    @staticmethod
+    def get_budget(request) -> float | None:
+        budget = settings.POKEAPI_REQUEST_DEADLINE_SECONDS or None
+        header = request.headers.get(settings.POKEAPI_REQUEST_DEADLINE_HEADER)
+        if not header:
+            return budget
+
+        try:
+            requested = float(header)
+        except ValueError:
+            logger.warning(f"Prazo inválido no request: {header!r}")
+            return budget
+        return requested if budget is None else min(requested, budget)
@@ -0,0 +1,129 @@
+# Generated by Django 4.2.11 on 2026-10-16 20:55
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+# cópia congelada de Pokemon.project / PokemonSpecie.project na data desta
+# migração: o modelo atual pode mudar sem alterar o que ela grava
+def project_pokemon(data):
+    official_artwork = (
+        data.get('sprites', {}).get('other', {}).get('official-artwork', {})
+    )
+    return {
+        'types': sorted(
+            [t.get('type', {}).get('name', '') for t in data.get('types', []) if t.get('type')],
+            key=str.lower,
+        ),
+        'abilities': sorted(
+            [
+                a.get('ability', {}).get('name', '')
+                for a in data.get('abilities', [])
+                if a.get('ability')
+            ],
+            key=str.lower,
+        ),
+        'height': data.get('height'),
+        'weight': data.get('weight'),
+        'cry': data.get('cries', {}).get('latest'),
+        'sprite_default': official_artwork.get('front_default'),
+        'sprite_shiny': official_artwork.get('front_shiny'),
+    }
+
+
+def project_specie(data):
+    flavor_text = ''
+    for entry in data.get('flavor_text_entries', []):
+        if entry.get('language', {}).get('name') == 'en':
+            flavor_text = entry.get('flavor_text', '').replace('\n', ' ').replace('\f', ' ')
+            break
+
+    evolution_chain_external_id = None
+    evo_chain_url = (data.get('evolution_chain') or {}).get('url')
+    if evo_chain_url:
+        evolution_chain_external_id = int(evo_chain_url.rstrip('/').split('/')[-1])
+
+    return {
+        'flavor_text': flavor_text,
+        'evolution_chain_external_id': evolution_chain_external_id,
+    }
+
+
+PROJECTIONS = {
+    'Pokemon': (
+        project_pokemon,
+        ['types', 'abilities', 'height', 'weight', 'cry', 'sprite_default', 'sprite_shiny'],
+    ),
+    'PokemonSpecie': (project_specie, ['flavor_text', 'evolution_chain_external_id']),
+}
+
+
+def backfill_projections(apps, schema_editor):
+    for model_name, (project, fields) in PROJECTIONS.items():
+        model = apps.get_model('pokemons', model_name)
+        batch = []
+        for instance in model.objects.iterator(chunk_size=200):
+            for field, value in project(instance.data).items():
+                setattr(instance, field, value)
+            batch.append(instance)
+            if len(batch) >= 200:
+                model.objects.bulk_update(batch, fields)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokemons', '0006_pokeapi_revalidation_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pokemon',
+            name='abilities',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='pokemon',
+            name='cry',
+            field=models.URLField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemon',
+            name='height',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemon',
+            name='sprite_default',
+            field=models.URLField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemon',
+            name='sprite_shiny',
+            field=models.URLField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemon',
+            name='types',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='pokemon',
+            name='weight',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonspecie',
+            name='evolution_chain_external_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pokemonspecie',
+            name='flavor_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(backfill_projections, migrations.RunPython.noop),
+    ]
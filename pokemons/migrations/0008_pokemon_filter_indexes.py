@@ -0,0 +1,30 @@
+# Generated by Django 4.2.11 on 2026-10-16 20:57
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokemons', '0007_pokemon_projection_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['types'], name='pokemon_types_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['abilities'], name='pokemon_abilities_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=models.Index(fields=['weight'], name='pokemon_weight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=models.Index(fields=['height'], name='pokemon_height_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.11 on 2026-10-17 11:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokemons', '0008_pokemon_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pokemon',
+            name='last_updated',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='pokemon',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pokemonevolutionchain',
+            name='last_updated',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='pokemonevolutionchain',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pokemonspecie',
+            name='last_updated',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='pokemonspecie',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
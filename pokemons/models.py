@@ -1,15 +1,53 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.core.cache import cache
 from django.db import models
 from django.utils import timezone
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 from common.models import AbstractDatableModel
 from users.models import User
 
 
+class PokeApiQuerySet(models.QuerySet):
+    def with_data(self):
+        """Loads the raw PokeAPI payload, which is deferred by default."""
+        return self.defer(None)
+
+
+class DeferredDataManager(models.Manager.from_queryset(PokeApiQuerySet)):
+    """
+    Defers the raw `data` JSON: reads are served by the projection columns
+    and the payload (hundreds of KB for some Pokémon) is only needed at ingest.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer("data")
+
+
 class AbstractPokeApiModel(AbstractDatableModel):
     external_id = models.IntegerField(unique=True, db_index=True)
     name = models.CharField(max_length=100, unique=True, db_index=True)
     data = models.JSONField()
-    last_updated = models.DateTimeField(default=timezone.now)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    etag = models.CharField(max_length=255, blank=True, default="")
+    upstream_last_modified = models.CharField(max_length=64, blank=True, default="")
+    # indexados: o refresh em background filtra pelas linhas mais antigas
+    last_updated = models.DateTimeField(default=timezone.now, db_index=True)
+    verified_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # colunas extraídas de `data` na ingestão (ver project)
+    projection_fields = []
+
+    @classmethod
+    def project(cls, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns the projection column values extracted from the raw PokeAPI
+        data. Subclasses with projection columns must override this method.
+        """
+        return {}
 
     def __str__(self):
         return self.name
@@ -20,52 +58,66 @@ class AbstractPokeApiModel(AbstractDatableModel):
 
 
 class Pokemon(AbstractPokeApiModel):
-    @property
-    def abilities(self):
-        """Returns the abilities sorted alphabetically by ability.name"""
-        abilities_list = self.data.get("abilities", [])
-        return sorted(
-            [
-                a.get("ability", {}).get("name", "")
-                for a in abilities_list
-                if a.get("ability")
-            ],
-            key=str.lower,
-        )
-
-    @property
-    def height(self):
-        """Returns the height of the Pokemon"""
-        return self.data.get("height")
-
-    @property
-    def weight(self):
-        """Returns the weight of the Pokemon"""
-        return self.data.get("weight")
-
-    @property
-    def types(self):
-        """Returns only the type names, sorted alphabetically."""
-        types_list = self.data.get("types", [])
-        return sorted(
-            [t.get("type", {}).get("name", "") for t in types_list if t.get("type")],
-            key=str.lower,
+    types = ArrayField(models.CharField(max_length=50), default=list, blank=True)
+    abilities = ArrayField(models.CharField(max_length=100), default=list, blank=True)
+    height = models.IntegerField(null=True, blank=True)
+    weight = models.IntegerField(null=True, blank=True)
+    cry = models.URLField(max_length=255, null=True, blank=True)
+    sprite_default = models.URLField(max_length=255, null=True, blank=True)
+    sprite_shiny = models.URLField(max_length=255, null=True, blank=True)
+
+    objects = DeferredDataManager()
+
+    projection_fields = [
+        "types",
+        "abilities",
+        "height",
+        "weight",
+        "cry",
+        "sprite_default",
+        "sprite_shiny",
+    ]
+
+    @classmethod
+    def project(cls, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extracts the fields served by the API: type and ability names sorted
+        alphabetically, height, weight, the latest cry and the official
+        artwork sprites.
+        """
+        official_artwork = (
+            data.get("sprites", {}).get("other", {}).get("official-artwork", {})
         )
-
-    @property
-    def cry(self):
-        """Returns only the latest cry URL."""
-        cries = self.data.get("cries", {})
-        return cries.get("latest")
+        return {
+            "types": sorted(
+                [
+                    t.get("type", {}).get("name", "")
+                    for t in data.get("types", [])
+                    if t.get("type")
+                ],
+                key=str.lower,
+            ),
+            "abilities": sorted(
+                [
+                    a.get("ability", {}).get("name", "")
+                    for a in data.get("abilities", [])
+                    if a.get("ability")
+                ],
+                key=str.lower,
+            ),
+            "height": data.get("height"),
+            "weight": data.get("weight"),
+            "cry": data.get("cries", {}).get("latest"),
+            "sprite_default": official_artwork.get("front_default"),
+            "sprite_shiny": official_artwork.get("front_shiny"),
+        }
 
     @property
     def sprites(self):
         """Returns a dict with the default and shiny sprites."""
-        other = self.data.get("sprites", {}).get("other", {})
-        official_artwork = other.get("official-artwork", {})
         return {
-            "default": official_artwork.get("front_default"),
-            "shiny": official_artwork.get("front_shiny"),
+            "default": self.sprite_default,
+            "shiny": self.sprite_shiny,
         }
 
     @property
@@ -83,25 +135,48 @@ class Pokemon(AbstractPokeApiModel):
     class Meta:
         verbose_name = "Pokemon"
         verbose_name_plural = "Pokemons"
+        indexes = [
+            GinIndex(fields=["types"], name="pokemon_types_gin"),
+            GinIndex(fields=["abilities"], name="pokemon_abilities_gin"),
+            models.Index(fields=["weight"], name="pokemon_weight_idx"),
+            models.Index(fields=["height"], name="pokemon_height_idx"),
+        ]
 
 
 class PokemonSpecie(AbstractPokeApiModel):
     pokemon = models.OneToOneField(
         Pokemon, on_delete=models.CASCADE, related_name="specie"
     )
+    flavor_text = models.TextField(blank=True, default="")
+    evolution_chain_external_id = models.IntegerField(null=True, blank=True)
 
-    @property
-    def flavor_text(self) -> str:
+    objects = DeferredDataManager()
+
+    projection_fields = ["flavor_text", "evolution_chain_external_id"]
+
+    @classmethod
+    def project(cls, data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Returns the English flavor text (summary) of the Pokemon specie.
+        Extracts the English flavor text (summary) and the id of the
+        evolution chain of the specie.
         """
-        entries = self.data.get("flavor_text_entries", [])
-        for entry in entries:
+        flavor_text = ""
+        for entry in data.get("flavor_text_entries", []):
             if entry.get("language", {}).get("name") == "en":
-                return (
+                flavor_text = (
                     entry.get("flavor_text", "").replace("\n", " ").replace("\f", " ")
                 )
-        return ""
+                break
+
+        evolution_chain_external_id = None
+        evo_chain_url = (data.get("evolution_chain") or {}).get("url")
+        if evo_chain_url:
+            evolution_chain_external_id = int(evo_chain_url.rstrip("/").split("/")[-1])
+
+        return {
+            "flavor_text": flavor_text,
+            "evolution_chain_external_id": evolution_chain_external_id,
+        }
 
     def __str__(self):
         return f"{self.name} Specie"
@@ -128,22 +203,16 @@ class PokemonEvolutionChain(AbstractPokeApiModel):
     )
 
     def _parse_chain_node(
-        self, node: Dict[str, Any], context: Dict[str, Any]
+        self, node: Dict[str, Any], pokemons_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """
-        Builds the representation of the chain node.
+        Builds the representation of the chain node from the serialized
+        member Pokémon (by name).
         """
-        from pokemons.helpers import PokemonHelper
-        from pokemons.serializers import PokemonSerializer
-
-        species_name = node["species"]["name"]
-        pokemon = PokemonHelper.get_object(species_name)
-        if not pokemon:
+        pokemon_data = pokemons_data.get(node["species"]["name"])
+        if not pokemon_data:
             return None
 
-        # Serializes the Pokemon
-        pokemon_data = PokemonSerializer(pokemon, context=context).data
-
         # Interprets evolution_details
         details = node.get("evolution_details", [])
         if details:
@@ -156,7 +225,9 @@ class PokemonEvolutionChain(AbstractPokeApiModel):
         # Processes future evolutions
         evolves = node.get("evolves_to", [])
         evolves_to = (
-            [self._parse_chain_node(e, context) for e in evolves] if evolves else []
+            [self._parse_chain_node(e, pokemons_data) for e in evolves]
+            if evolves
+            else []
         )
 
         return {
@@ -193,11 +264,99 @@ class PokemonEvolutionChain(AbstractPokeApiModel):
 
         return ", ".join(parts)
 
+    @property
+    def species_names(self) -> List[str]:
+        """
+        Returns the species names of every node of the chain.
+        """
+        names = []
+        nodes = [self.data.get("chain")]
+        while nodes:
+            node = nodes.pop(0)
+            if not node:
+                continue
+            names.append(node["species"]["name"])
+            nodes.extend(node.get("evolves_to", []))
+        return names
+
+    def get_tree_cache_key(self) -> str:
+        """
+        Cache key of the tree, versioned by the chain and by its members: the
+        tree embeds the serialized Pokémon and species, so a change in any of
+        their content_hash must not serve the old tree. Members are matched
+        by specie, whose name is the one in the chain (the Pokémon of a
+        specie may be named after its default form, ex: deoxys-normal).
+        """
+        members = (
+            PokemonSpecie.objects.filter(name__in=self.species_names)
+            .order_by("external_id")
+            .values_list("external_id", "content_hash", "pokemon__content_hash")
+        )
+        version = hashlib.sha256(repr(list(members)).encode()).hexdigest()[:16]
+        return (
+            f"pokeapi:evolution-chain:{self.external_id}:{self.content_hash}:"
+            f"{version}:tree"
+        )
+
+    def build_tree(self) -> Tuple[Dict[str, Any], bool]:
+        """
+        Builds the user-independent evolution tree, fetching every member
+        Pokémon in bulk. Returns the tree and whether all members resolved.
+        """
+        from pokemons.helpers import PokemonHelper
+        from pokemons.serializers import PokemonSerializer
+
+        names = self.species_names
+        pokemons = PokemonHelper.get_many(names)
+        PokemonHelper.prefetch_species(pokemons)
+
+        pokemons_data = {
+            pokemon_data["name"]: pokemon_data
+            for pokemon_data in PokemonSerializer(pokemons, many=True).data
+        }
+        tree = self._parse_chain_node(self.data["chain"], pokemons_data)
+        return tree, set(names) <= set(pokemons_data)
+
+    def _overlay_favorites(self, node: Dict[str, Any], favorited_ids: set):
+        if not node:
+            return
+        node["pokemon"]["is_favorited"] = node["pokemon"]["id"] in favorited_ids
+        for child in node["evolves_to"]:
+            self._overlay_favorites(child, favorited_ids)
+
+    def _tree_pokemon_ids(self, node: Dict[str, Any]) -> List[int]:
+        if not node:
+            return []
+        ids = [node["pokemon"]["id"]]
+        for child in node["evolves_to"]:
+            ids.extend(self._tree_pokemon_ids(child))
+        return ids
+
     def structured_chain(self, user: User) -> Dict[str, Any]:
         """
-        Returns the structured evolution chain for the frontend.
+        Returns the structured evolution chain for the frontend. The tree is
+        cached per version of the chain and its members; only is_favorited is
+        resolved per user.
         """
-        return self._parse_chain_node(self.data["chain"], context={"user": user})
+        # uma query por request; se o build atualizar membros, a próxima
+        # chamada calcula outra versão e monta a árvore uma vez mais
+        cache_key = self.get_tree_cache_key()
+        tree = cache.get(cache_key)
+        if tree is None:
+            tree, complete = self.build_tree()
+            # membros que falharam na API não devem ficar em cache
+            if complete:
+                cache.set(cache_key, tree, settings.POKEAPI_CHAIN_TREE_CACHE_SECONDS)
+
+        favorited_ids = set()
+        if user is not None and user.is_authenticated:
+            favorited_ids = set(
+                FavoritedPokemon.objects.filter(
+                    user=user, pokemon__in=self._tree_pokemon_ids(tree)
+                ).values_list("pokemon_id", flat=True)
+            )
+        self._overlay_favorites(tree, favorited_ids)
+        return tree
 
     def __str__(self):
         return f"{self.name} Evolution Chain"
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+LANE_INTERACTIVE = "interactive"
+LANE_REFRESH = "refresh"
+LANE_BULK = "bulk"
+LANES = (LANE_INTERACTIVE, LANE_REFRESH, LANE_BULK)
+
+_current_lane: ContextVar[str] = ContextVar("pokeapi_lane", default=LANE_INTERACTIVE)
+
+# Token bucket atômico no Redis. O relógio é o do próprio Redis (TIME), então
+# todos os nós compartilham a mesma taxa sem depender do relógio local.
+# Cada lane só consome enquanto sobrarem mais tokens que a sua reserva; a
+# reserva fica para as lanes de maior prioridade. Retorna "0" quando o token
+# foi concedido, senão quantos segundos faltam para haver um disponível.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+else
+    wait = (reserve + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+def get_current_lane() -> str:
+    return _current_lane.get()
+
+
+@contextmanager
+def upstream_lane(lane: str):
+    """
+    Runs the block with upstream requests accounted to the given lane.
+    Requests default to the interactive lane.
+    """
+    if lane not in LANES:
+        raise ValueError(f"Unknown upstream lane '{lane}'")
+
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+class UpstreamRateLimiter:
+    """
+    Cluster-wide token bucket for the PokeAPI, shared by every web and
+    worker node through Redis. The bucket refills at POKEAPI_RATE_LIMIT_QPS,
+    so the total upstream rate never exceeds it; lower priority lanes leave
+    part of the bucket untouched so user requests are served first.
+    """
+
+    key = "pokeapi:ratelimit:bucket"
+
+    def __init__(self):
+        self._script = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.POKEAPI_RATE_LIMIT_QPS > 0
+
+    @property
+    def capacity(self) -> float:
+        return max(
+            1.0,
+            settings.POKEAPI_RATE_LIMIT_BURST or settings.POKEAPI_RATE_LIMIT_QPS,
+        )
+
+    def get_reserve(self, lane: str) -> float:
+        """
+        Tokens the lane must leave in the bucket for higher priority lanes.
+        """
+        return self.capacity * settings.POKEAPI_RATE_LIMIT_LANE_RESERVES.get(lane, 0)
+
+    def get_script(self):
+        if self._script is None:
+            connection = get_redis_connection("default")
+            self._script = connection.register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    def try_acquire(self, lane: str) -> float:
+        """
+        Takes a token for the lane. Returns 0 when it was granted, otherwise
+        the seconds until the next try. Fails open if Redis is unavailable.
+        """
+        try:
+            wait = self.get_script()(
+                keys=[self.key],
+                args=[
+                    settings.POKEAPI_RATE_LIMIT_QPS,
+                    self.capacity,
+                    self.get_reserve(lane),
+                ],
+            )
+        except RedisError:
+            logger.warning("Rate limit da PokeAPI indisponível, seguindo sem limite")
+            return 0.0
+        return float(wait)
+
+    def get_delay(
+        self, wait: float, waited: float, lane: str, max_wait: float | None = None
+    ) -> float | None:
+        """
+        How long to sleep before the next try, or None once the lane's
+        POKEAPI_RATE_LIMIT_MAX_WAIT_SECONDS (or max_wait, if shorter) would
+        be exceeded.
+        """
+        lane_max_wait = settings.POKEAPI_RATE_LIMIT_MAX_WAIT_SECONDS.get(lane, 0)
+        if max_wait is not None:
+            lane_max_wait = min(lane_max_wait, max_wait)
+        if waited + wait > lane_max_wait:
+            return None
+        # Jitter para que os nós que esperam não tentem todos ao mesmo tempo
+        return wait + random.uniform(0, wait / 2)
+
+    def acquire(
+        self, lane: str | None = None, max_wait: float | None = None
+    ) -> tuple[bool, float]:
+        """
+        Blocks until a token is available for the lane (the current one by
+        default). Returns (acquired, seconds waited); acquired is False when
+        the lane's maximum wait (or max_wait) was reached.
+        """
+        if not self.enabled:
+            return True, 0.0
+
+        lane = lane or get_current_lane()
+        started = time.monotonic()
+        while True:
+            waited = time.monotonic() - started
+            wait = self.try_acquire(lane)
+            if not wait:
+                return True, waited
+
+            delay = self.get_delay(wait, waited, lane, max_wait)
+            if delay is None:
+                return False, waited
+            time.sleep(delay)
+
+    async def aacquire(
+        self, lane: str | None = None, max_wait: float | None = None
+    ) -> tuple[bool, float]:
+        """
+        Async version of acquire: waits on the event loop.
+        """
+        if not self.enabled:
+            return True, 0.0
+
+        lane = lane or get_current_lane()
+        try_acquire = sync_to_async(self.try_acquire, thread_sensitive=False)
+        started = time.monotonic()
+        while True:
+            waited = time.monotonic() - started
+            wait = await try_acquire(lane)
+            if not wait:
+                return True, waited
+
+            delay = self.get_delay(wait, waited, lane, max_wait)
+            if delay is None:
+                return False, waited
+            await asyncio.sleep(delay)
+
+
+rate_limiter = UpstreamRateLimiter()
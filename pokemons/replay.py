@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+# cabeçalhos da resposta guardados junto com o corpo
+RECORDED_HEADERS = ("ETag", "Last-Modified", "Content-Type")
+
+
+class ReplayStore:
+    """
+    Content-addressed on-disk store of PokeAPI responses.
+
+    Bodies live under blobs/ named by the sha256 of their canonical JSON, so
+    identical responses are stored once. Each request (method + endpoint,
+    with the query string sorted) has an entry under requests/ pointing at
+    its body, with the status and the validators (ETag, Last-Modified).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def normalize_endpoint(endpoint: str) -> str:
+        """
+        Endpoint relative to the API root, without trailing slash and with
+        the query parameters sorted: /pokemon/1/ and /pokemon/1 are the same
+        request.
+        """
+        parts = urlsplit(endpoint)
+        path = parts.path.rstrip("/") or "/"
+        query = urlencode(sorted(parse_qsl(parts.query)))
+        return f"{path}?{query}" if query else path
+
+    @classmethod
+    def request_key(cls, method: str, endpoint: str) -> str:
+        key = f"{method.upper()} {cls.normalize_endpoint(endpoint)}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def encode_body(data) -> bytes:
+        return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}.json")
+
+    def entry_path(self, method: str, endpoint: str) -> str:
+        key = self.request_key(method, endpoint)
+        return os.path.join(self.root, "requests", key[:2], f"{key}.json")
+
+    def write_file(self, path: str, content: bytes):
+        # escrita atômica: leitores concorrentes nunca veem um arquivo parcial
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+
+    def save(
+        self,
+        method: str,
+        endpoint: str,
+        status: int,
+        data=None,
+        headers: dict | None = None,
+    ) -> str | None:
+        """
+        Records a response. data=None records a response without body (ex:
+        404). Returns the digest of the body.
+        """
+        digest = None
+        if data is not None:
+            body = self.encode_body(data)
+            digest = hashlib.sha256(body).hexdigest()
+            blob_path = self.blob_path(digest)
+            if not os.path.exists(blob_path):
+                self.write_file(blob_path, body)
+
+        headers = headers or {}
+        entry = {
+            "method": method.upper(),
+            "endpoint": self.normalize_endpoint(endpoint),
+            "status": status,
+            "body": digest,
+            "headers": {
+                name: headers[name] for name in RECORDED_HEADERS if name in headers
+            },
+        }
+        self.write_file(
+            self.entry_path(method, endpoint),
+            json.dumps(entry, sort_keys=True, indent=2).encode(),
+        )
+        return digest
+
+    def load_entry(self, method: str, endpoint: str) -> dict | None:
+        try:
+            with open(self.entry_path(method, endpoint), "rb") as entry_file:
+                return json.load(entry_file)
+        except FileNotFoundError:
+            return None
+
+    def load_body(self, digest: str) -> bytes:
+        with open(self.blob_path(digest), "rb") as blob_file:
+            return blob_file.read()
+
+    def load(self, method: str, endpoint: str) -> tuple | None:
+        """
+        Returns (data, status, headers) for a recorded request, or None when
+        it was never recorded. The ETag defaults to the body digest.
+        """
+        entry = self.load_entry(method, endpoint)
+        if entry is None:
+            return None
+
+        data = None
+        headers = dict(entry["headers"])
+        if entry["body"]:
+            data = json.loads(self.load_body(entry["body"]))
+            headers.setdefault("ETag", f'"{entry["body"]}"')
+        return data, entry["status"], headers
+
+
+def get_replay_store() -> ReplayStore | None:
+    """
+    The store used by PokeApiService when POKEAPI_REPLAY_MODE is set.
+    """
+    if settings.POKEAPI_REPLAY_MODE not in (MODE_RECORD, MODE_REPLAY):
+        return None
+    return ReplayStore(settings.POKEAPI_REPLAY_DIR)
+
+
+def record_response(store: ReplayStore, method: str, endpoint: str, response: tuple):
+    """
+    Records a (data, status, headers) response of make_api_request. Only
+    final answers are kept: 304s and failures without a status are skipped.
+    """
+    data, status, headers = response
+    if status is None or status == 304:
+        return
+    try:
+        store.save(method, endpoint, status, data or None, headers)
+    except OSError:
+        logger.exception(f"Erro ao gravar resposta de {endpoint}")
+
+
+def replay_response(
+    store: ReplayStore, method: str, endpoint: str, request_headers: dict | None
+) -> tuple:
+    """
+    Answers a request from the store with the make_api_request contract:
+    (data, status, headers), None on 304 and False on errors. Requests that
+    were never recorded answer 404.
+    """
+    recorded = store.load(method, endpoint)
+    if recorded is None:
+        logger.warning(f"PokeAPI replay: {method.upper()} {endpoint} não gravado")
+        return False, 404, {}
+
+    data, status, headers = recorded
+    if status >= 400:
+        return False, status, headers
+
+    request_headers = request_headers or {}
+    etag = headers.get("ETag")
+    if etag and request_headers.get("If-None-Match") == etag:
+        return None, 304, headers
+    return data, status, headers
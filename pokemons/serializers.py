@@ -1,23 +1,59 @@
 from rest_framework import serializers
-from pokemons.models import Pokemon
+from django.db import models
+from pokemons.models import Pokemon, FavoritedPokemon
 from users.models import User
+from pokemons import timing
 from pokemons.helpers import PokemonHelper
 
 
-class PokemonSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """
+    Accounts the serialization time as "serialize" in the request metrics
+    (see ServerTimingMiddleware).
+    """
+
+    @property
+    def data(self):
+        with timing.measure("serialize"):
+            return super().data
+
+
+class PokemonListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    Resolves the favorites of the whole page in a single query, so the
+    number of queries does not grow with the page size.
+    """
+
+    def to_representation(self, data):
+        pokemons = list(data.all() if isinstance(data, models.Manager) else data)
+        user = self.child.get_user()
+        if user is not None and user.is_authenticated:
+            self.context["favorited_pokemon_ids"] = set(
+                FavoritedPokemon.objects.filter(
+                    user=user, pokemon__in=[pokemon.id for pokemon in pokemons]
+                ).values_list("pokemon_id", flat=True)
+            )
+        return super().to_representation(pokemons)
+
+
+class PokemonSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     is_favorited = serializers.SerializerMethodField()
 
-    def get_is_favorited(self, obj: Pokemon) -> bool:
-        user = None
+    def get_user(self) -> User | None:
         if "request" in self.context and self.context["request"] is not None:
-            user = getattr(self.context["request"], "user", None)
-        elif "user" in self.context:
-            user = self.context["user"]
+            return getattr(self.context["request"], "user", None)
+        return self.context.get("user")
 
+    def get_is_favorited(self, obj: Pokemon) -> bool:
+        user = self.get_user()
         if user is None or not user.is_authenticated:
             return False
 
+        # favoritos já resolvidos em lote (PokemonListSerializer/structured_chain)
+        if "favorited_pokemon_ids" in self.context:
+            return obj.id in self.context["favorited_pokemon_ids"]
+
         return obj.is_favorited(user)
 
     def favorite(self, user: User, pokemon: Pokemon):
@@ -28,6 +64,7 @@ class PokemonSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Pokemon
+        list_serializer_class = PokemonListSerializer
         fields = [
             "id",
             "external_id",
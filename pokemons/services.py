@@ -1,9 +1,104 @@
+import asyncio
+import logging
+import math
 import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextvars import copy_context
+from functools import partial
 
-from common.utils import make_api_request
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from common.metrics import pokeapi_upstream_seconds
+from common.utils import (
+    RETRY_CONNECT,
+    RETRY_NONE,
+    make_api_request,
+    async_make_api_request,
+)
+from pokemons import deadline, timing
+from pokemons.circuitbreaker import circuit_breaker
+from pokemons.hedging import get_hedge_delay, get_hedge_executor, latency_tracker
+from pokemons.ratelimit import get_current_lane, rate_limiter
+from pokemons.replay import (
+    MODE_REPLAY,
+    get_replay_store,
+    record_response,
+    replay_response,
+)
+
+logger = logging.getLogger(__name__)
 
 POKE_API_BASE_URL = "https://pokeapi.co/api/v2"
 
+# recurso da PokeAPI -> (método do objeto, método da lista), rótulo das métricas
+SERVICE_METHODS = {
+    "pokemon": ("get_pokemon", "get_pokemon_list"),
+    "pokemon-species": ("get_pokemon_specie", "get_pokemon_species_list"),
+    "evolution-chain": ("get_evolution_chain", "get_evolution_chains_list"),
+    "type": ("get_pokemon_type", "get_pokemon_types_list"),
+    "move": ("get_pokemon_move", "get_pokemon_moves_list"),
+    "item": ("get_item", "get_items_list"),
+    "ability": ("get_ability", "get_abilities_list"),
+    "generation": ("get_generation", "get_generations_list"),
+    "location": ("get_location", "get_locations_list"),
+}
+
+
+class PokeApiError(Exception):
+    def __init__(self, endpoint: str, status_code: int | None = None):
+        self.endpoint = endpoint
+        self.status_code = status_code
+        super().__init__(f"PokeAPI request to {endpoint} failed (status {status_code})")
+
+
+class PokeApiNotFound(PokeApiError):
+    pass
+
+
+class PokeApiRateLimited(PokeApiError):
+    """
+    The shared upstream budget had no token for the lane within its
+    maximum wait and the request was never sent, or the PokeAPI itself
+    answered 429 (retry_after then comes from its Retry-After header).
+    """
+
+    def __init__(
+        self, endpoint: str, lane: str, waited: float, retry_after: int = None
+    ):
+        self.lane = lane
+        self.waited = waited
+        # um token é reposto a cada 1/QPS segundos
+        self.retry_after = retry_after or max(
+            1, math.ceil(1 / settings.POKEAPI_RATE_LIMIT_QPS)
+        )
+        super().__init__(endpoint, 429)
+
+
+class PokeApiUnavailable(PokeApiError):
+    """
+    The circuit breaker is open: the PokeAPI is considered down and the
+    request was never sent.
+    """
+
+    def __init__(self, endpoint: str):
+        # o circuito fica aberto por POKEAPI_CIRCUIT_OPEN_SECONDS
+        self.retry_after = settings.POKEAPI_CIRCUIT_OPEN_SECONDS
+        super().__init__(endpoint, 503)
+
+
+class PokeApiDeadlineExceeded(PokeApiError):
+    """
+    The time budget of the current request (see pokemons.deadline) ran out
+    before or while the request was sent.
+    """
+
+    def __init__(self, endpoint: str):
+        super().__init__(endpoint, 504)
+
 
 class PokeApiService:
 
@@ -12,36 +107,282 @@ class PokeApiService:
         self.base_url = os.getenv("BASE_URL", POKE_API_BASE_URL)
 
     def make_request(
-        self, endpoint: str, method: str, payload: dict = None, params: dict = None
+        self,
+        endpoint: str,
+        method: str,
+        payload: dict = None,
+        params: dict = None,
+        headers: dict = None,
+        return_response_headers: bool = False,
     ):
-        data, _ = make_api_request(
+        """
+        Returns the response data, or (data, response headers) when
+        return_response_headers is set. data is None on 304 Not Modified.
+        Every request goes through the circuit breaker and then takes a token
+        from the cluster-wide rate limiter. The transport only retries
+        connection failures, which never reach the PokeAPI, so a token pays
+        for exactly one upstream request; a 429 answer is not retried but
+        raised as PokeApiRateLimited. Within a request deadline, the wait and
+        the timeouts are capped by the remaining budget.
+        """
+        if deadline.is_expired():
+            raise PokeApiDeadlineExceeded(endpoint)
+
+        allowed, probe = circuit_breaker.allow_request()
+        if not allowed:
+            raise PokeApiUnavailable(endpoint)
+
+        lane = get_current_lane()
+        acquired, waited = rate_limiter.acquire(lane, deadline.get_remaining())
+        if not acquired:
+            # a requisição não sai: a sonda do half-open fica livre
+            circuit_breaker.release_probe(probe)
+        self.report_wait(endpoint, lane, acquired, waited)
+
+        started = time.monotonic()
+        data, status_code, response_headers = self.send(
+            endpoint, method, payload, params, headers
+        )
+        self.record_latency(endpoint, data, status_code, time.monotonic() - started)
+        # timeout causado pelo nosso prazo, não pela PokeAPI
+        if data is False and status_code is None and deadline.is_expired():
+            circuit_breaker.release_probe(probe)
+            raise PokeApiDeadlineExceeded(endpoint)
+
+        circuit_breaker.record(
+            self.is_healthy(data, status_code), time.monotonic() - started, probe
+        )
+        if data is False:
+            self.raise_error(endpoint, lane, status_code, response_headers)
+
+        if return_response_headers:
+            return data, response_headers
+        return data
+
+    def send_once(
+        self,
+        endpoint: str,
+        method: str,
+        payload: dict = None,
+        params: dict = None,
+        headers: dict = None,
+    ) -> tuple:
+        """
+        A single attempt. With POKEAPI_REPLAY_MODE=replay it is answered from
+        the replay store without touching the network; with record, the
+        response is written to it.
+        """
+        store = get_replay_store()
+        if store and settings.POKEAPI_REPLAY_MODE == MODE_REPLAY:
+            return replay_response(store, method, endpoint, headers)
+        if store:
+            headers = self.unconditional_headers(headers)
+
+        started = time.monotonic()
+        response = make_api_request(
             method=method,
             url=self.base_url + endpoint,
             payload=payload,
             params=params,
+            headers=headers,
             log_prefix="PokeAPI",
+            return_headers=True,
+            timeout=deadline.get_timeout(),
+            retry=self.get_retry(),
         )
-        return data
+        if response[0] is not False:
+            latency_tracker.add(time.monotonic() - started)
+        if store:
+            record_response(store, method, endpoint, response)
+        return response
+
+    @staticmethod
+    def get_retry() -> str:
+        """
+        Transport retry policy: within a request deadline there is no budget
+        for retries (nor their backoff), so none is made.
+        """
+        if deadline.get_remaining() is not None:
+            return RETRY_NONE
+        return RETRY_CONNECT
+
+    @staticmethod
+    def raise_error(
+        endpoint: str, lane: str, status_code: int | None, headers: dict | None
+    ):
+        if status_code == 404:
+            raise PokeApiNotFound(endpoint, status_code)
+        if status_code == 429:
+            # a PokeAPI pediu para esperar: repassa o Retry-After dela
+            retry_after = PokeApiService.get_retry_after(headers)
+            raise PokeApiRateLimited(endpoint, lane, 0, retry_after=retry_after)
+        raise PokeApiError(endpoint, status_code)
+
+    @staticmethod
+    def get_retry_after(headers: dict | None) -> int | None:
+        """
+        Seconds in a Retry-After header (delta-seconds or HTTP-date), or
+        None when it is missing or invalid.
+        """
+        value = (headers or {}).get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(1, math.ceil(float(value)))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(1, math.ceil(retry_at.timestamp() - time.time()))
+
+    @staticmethod
+    def unconditional_headers(headers: dict | None) -> dict | None:
+        # gravando: sempre pede o corpo completo, nunca um 304
+        if not headers:
+            return headers
+        return {
+            name: value
+            for name, value in headers.items()
+            if name not in ("If-None-Match", "If-Modified-Since")
+        }
+
+    def send(
+        self,
+        endpoint: str,
+        method: str,
+        payload: dict = None,
+        params: dict = None,
+        headers: dict = None,
+    ) -> tuple:
+        """
+        Sends the request and returns (data, status, headers). A GET still
+        unanswered after the hedging delay (see pokemons.hedging) gets a
+        second attempt, if the rate limiter has a token for it right away;
+        the first successful response wins. Without an idle hedge worker the
+        request is sent inline, without hedging.
+        """
+        send_once = partial(self.send_once, endpoint, method, payload, params, headers)
+        delay = self.get_hedge_delay(method)
+        if delay is None:
+            return send_once()
+
+        started = threading.Event()
+
+        def first_attempt():
+            started.set()
+            return send_once()
 
-    def get_pokemon(self, name_or_id: str | int):
+        # cada tentativa roda numa cópia do contexto (prazo do request)
+        executor = get_hedge_executor()
+        first = executor.try_submit(copy_context().run, first_attempt)
+        if first is None:
+            return send_once()
+
+        # o atraso conta a partir do início real da tentativa
+        started.wait()
+        attempts = [first]
+        done, _ = wait(attempts, timeout=delay)
+        if not done and self.acquire_hedge_token(endpoint, delay):
+            hedge = executor.try_submit(copy_context().run, send_once)
+            if hedge is not None:
+                attempts.append(hedge)
+
+        # as duas tentativas podem terminar na mesma rodada: olha todas
+        pending, response = set(attempts), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for attempt in done:
+                response = attempt.result()
+                if response[0] is not False:
+                    return response
+        return response
+
+    @staticmethod
+    def get_hedge_delay(method: str) -> float | None:
+        if method.lower() != "get":
+            return None
+        delay = get_hedge_delay()
+        remaining = deadline.get_remaining()
+        if delay is not None and remaining is not None and remaining <= delay:
+            return None
+        return delay
+
+    @staticmethod
+    def acquire_hedge_token(endpoint: str, delay: float) -> bool:
+        # o hedge conta no mesmo orçamento, mas nunca espera por um token
+        acquired, _ = rate_limiter.acquire(get_current_lane(), max_wait=0)
+        if acquired:
+            logger.debug(f"PokeAPI: {endpoint} sem resposta em {delay:.3f}s, hedge")
+        return acquired
+
+    @staticmethod
+    def is_healthy(data, status_code: int | None) -> bool:
+        """
+        Whether a response counts as a success for the circuit breaker:
+        client errors such as 404 mean the PokeAPI is up.
+        """
+        if data is not False:
+            return True
+        return status_code is not None and status_code < 500 and status_code != 429
+
+    @staticmethod
+    def get_method_name(endpoint: str) -> str:
+        """
+        Name of the get_* method that requests endpoint (ex: /pokemon/1 is
+        get_pokemon, /pokemon?limit=20 is get_pokemon_list).
+        """
+        path = endpoint.split("?", 1)[0].strip("/")
+        resource, _, identifier = path.partition("/")
+        if resource not in SERVICE_METHODS:
+            return "make_request"
+        return SERVICE_METHODS[resource][0 if identifier else 1]
+
+    def record_latency(
+        self, endpoint: str, data, status_code: int | None, elapsed: float
+    ):
+        timing.record("upstream", elapsed)
+        if data is False:
+            outcome = "not_found" if status_code == 404 else "error"
+        else:
+            outcome = "ok"
+        pokeapi_upstream_seconds.observe(
+            elapsed, method=self.get_method_name(endpoint), outcome=outcome
+        )
+
+    def report_wait(self, endpoint: str, lane: str, acquired: bool, waited: float):
+        if not acquired:
+            logger.warning(
+                f"PokeAPI: sem token para {endpoint} (lane {lane}) após {waited:.3f}s"
+            )
+            raise PokeApiRateLimited(endpoint, lane, waited)
+        if waited:
+            timing.record("ratelimit", waited)
+            logger.info(
+                f"PokeAPI: {endpoint} aguardou {waited:.3f}s no rate limit "
+                f"(lane {lane})"
+            )
+
+    def get_pokemon(self, name_or_id: str | int, **kwargs):
         endpoint = f"/pokemon/{name_or_id}"
-        return self.make_request(endpoint, "get")
+        return self.make_request(endpoint, "get", **kwargs)
 
     def get_pokemon_list(self, limit: int = 20, offset: int = 0):
         endpoint = f"/pokemon?limit={limit}&offset={offset}"
         return self.make_request(endpoint, "get")
 
-    def get_pokemon_specie(self, id: int):
+    def get_pokemon_specie(self, id: int, **kwargs):
         endpoint = f"/pokemon-species/{id}"
-        return self.make_request(endpoint, "get")
+        return self.make_request(endpoint, "get", **kwargs)
 
     def get_pokemon_species_list(self, limit: int = 20, offset: int = 0):
         endpoint = f"/pokemon-species?limit={limit}&offset={offset}"
         return self.make_request(endpoint, "get")
 
-    def get_evolution_chain(self, id: int):
+    def get_evolution_chain(self, id: int, **kwargs):
         endpoint = f"/evolution-chain/{id}"
-        return self.make_request(endpoint, "get")
+        return self.make_request(endpoint, "get", **kwargs)
 
     def get_evolution_chains_list(self, limit: int = 20, offset: int = 0):
         endpoint = f"/evolution-chain?limit={limit}&offset={offset}"
@@ -94,3 +435,135 @@ class PokeApiService:
     def get_locations_list(self, limit: int = 20, offset: int = 0):
         endpoint = f"/location?limit={limit}&offset={offset}"
         return self.make_request(endpoint, "get")
+
+
+class AsyncPokeApiService(PokeApiService):
+    """
+    PokeApiService for the ASGI stack: make_request (and therefore every
+    get_* method) returns a coroutine and the request runs on the event loop.
+    """
+
+    async def make_request(
+        self,
+        endpoint: str,
+        method: str,
+        payload: dict = None,
+        params: dict = None,
+        headers: dict = None,
+        return_response_headers: bool = False,
+    ):
+        if deadline.is_expired():
+            raise PokeApiDeadlineExceeded(endpoint)
+
+        allowed, probe = await circuit_breaker.aallow_request()
+        if not allowed:
+            raise PokeApiUnavailable(endpoint)
+
+        lane = get_current_lane()
+        acquired, waited = await rate_limiter.aacquire(lane, deadline.get_remaining())
+        if not acquired:
+            await circuit_breaker.arelease_probe(probe)
+        self.report_wait(endpoint, lane, acquired, waited)
+
+        started = time.monotonic()
+        try:
+            # o prazo cancela a requisição (e os retries) em andamento
+            data, status_code, response_headers = await asyncio.wait_for(
+                self.send(endpoint, method, payload, params, headers),
+                timeout=deadline.get_remaining(),
+            )
+        except asyncio.TimeoutError:
+            self.record_latency(endpoint, False, None, time.monotonic() - started)
+            await circuit_breaker.arelease_probe(probe)
+            raise PokeApiDeadlineExceeded(endpoint)
+        self.record_latency(endpoint, data, status_code, time.monotonic() - started)
+
+        await circuit_breaker.arecord(
+            self.is_healthy(data, status_code), time.monotonic() - started, probe
+        )
+        if data is False:
+            self.raise_error(endpoint, lane, status_code, response_headers)
+
+        if return_response_headers:
+            return data, response_headers
+        return data
+
+    async def send_once(
+        self,
+        endpoint: str,
+        method: str,
+        payload: dict = None,
+        params: dict = None,
+        headers: dict = None,
+    ) -> tuple:
+        store = get_replay_store()
+        if store and settings.POKEAPI_REPLAY_MODE == MODE_REPLAY:
+            return await sync_to_async(replay_response, thread_sensitive=False)(
+                store, method, endpoint, headers
+            )
+        if store:
+            headers = self.unconditional_headers(headers)
+
+        started = time.monotonic()
+        response = await async_make_api_request(
+            method=method,
+            url=self.base_url + endpoint,
+            payload=payload,
+            params=params,
+            headers=headers,
+            log_prefix="PokeAPI",
+            return_headers=True,
+            timeout=deadline.get_timeout(),
+            retry=self.get_retry(),
+        )
+        if response[0] is not False:
+            latency_tracker.add(time.monotonic() - started)
+        if store:
+            await sync_to_async(record_response, thread_sensitive=False)(
+                store, method, endpoint, response
+            )
+        return response
+
+    async def send(
+        self,
+        endpoint: str,
+        method: str,
+        payload: dict = None,
+        params: dict = None,
+        headers: dict = None,
+    ) -> tuple:
+        """
+        Async version of PokeApiService.send: the losing attempt is
+        cancelled.
+        """
+        send_once = partial(self.send_once, endpoint, method, payload, params, headers)
+        delay = self.get_hedge_delay(method)
+        if delay is None:
+            return await send_once()
+
+        attempts = [asyncio.ensure_future(send_once())]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and await self.aacquire_hedge_token(endpoint, delay):
+                attempts.append(asyncio.ensure_future(send_once()))
+
+            pending, response = set(attempts), None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in done:
+                    response = attempt.result()
+                    if response[0] is not False:
+                        return response
+            return response
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    @staticmethod
+    async def aacquire_hedge_token(endpoint: str, delay: float) -> bool:
+        acquired, _ = await rate_limiter.aacquire(get_current_lane(), max_wait=0)
+        if acquired:
+            logger.debug(f"PokeAPI: {endpoint} sem resposta em {delay:.3f}s, hedge")
+        return acquired
@@ -0,0 +1,87 @@
+from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+
+from common.utils import release_lock, release_locks
+from pokemons.helpers import (
+    PokemonHelper,
+    PokemonSpecieHelper,
+    PokemonEvolutionChainHelper,
+    PokeApiCatalogHelper,
+    PokeApiRefreshHelper,
+)
+from pokemons.ratelimit import LANE_BULK, LANE_REFRESH, upstream_lane
+
+HELPERS = {
+    helper.__name__: helper
+    for helper in (PokemonHelper, PokemonSpecieHelper, PokemonEvolutionChainHelper)
+}
+
+
+@shared_task
+def refresh_pokeapi_object(helper_name: str, name_or_id: str | int):
+    """
+    Refetches a stale object from the PokeAPI (stale-while-revalidate).
+    """
+    helper = HELPERS[helper_name]
+    try:
+        with upstream_lane(LANE_REFRESH):
+            helper.get_object(name_or_id, force_update=True)
+    finally:
+        release_lock(helper.refresh_lock_key(name_or_id))
+
+
+@shared_task
+def refresh_pokeapi_objects(helper_name: str, identifiers: list[str | int]):
+    """
+    Refetches a batch of stale objects from the PokeAPI concurrently (see
+    BasePokeApiHelper.schedule_refreshes).
+    """
+    helper = HELPERS[helper_name]
+    try:
+        with upstream_lane(LANE_REFRESH):
+            helper.get_many(identifiers, force_update=True, background_refresh=False)
+    finally:
+        release_locks([helper.refresh_lock_key(i) for i in identifiers])
+
+
+@shared_task(
+    bind=True,
+    soft_time_limit=settings.POKEAPI_SYNC_SOFT_TIME_LIMIT,
+    time_limit=settings.POKEAPI_SYNC_TIME_LIMIT,
+)
+def sync_pokeapi_catalog(
+    self,
+    stages: list[str] | None = None,
+    page_size: int = 100,
+    restart: bool = False,
+):
+    """
+    Ingests the PokeAPI catalog for up to POKEAPI_SYNC_BATCH_SECONDS, resuming
+    from the last checkpoint, and re-enqueues itself until it is complete.
+    """
+    try:
+        with upstream_lane(LANE_BULK):
+            summary = PokeApiCatalogHelper.sync(
+                stages=stages,
+                page_size=page_size,
+                restart=restart,
+                max_seconds=settings.POKEAPI_SYNC_BATCH_SECONDS,
+            )
+        pending = summary is not None and PokeApiCatalogHelper.is_pending()
+    except SoftTimeLimitExceeded:
+        # a página em andamento é refeita: o checkpoint é salvo por página
+        summary, pending = {}, True
+
+    if pending:
+        self.apply_async(kwargs={"stages": stages, "page_size": page_size})
+    return summary
+
+
+@shared_task
+def refresh_pokeapi_cache(budget: int | None = None):
+    """
+    Refreshes the rows about to expire, most requested first (Celery Beat).
+    """
+    with upstream_lane(LANE_REFRESH):
+        return PokeApiRefreshHelper.refresh_due(budget=budget)
@@ -1,3 +1,1663 @@
-from django.test import TestCase
+import importlib
+import tempfile
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.http import HttpResponse
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from common.utils import RETRY_CONNECT, RETRY_NONE
+from pokemons import deadline, timing
+from pokemons.benchmarks import (
+    CHAIN_SIZE,
+    BenchmarkRunner,
+    Scenario,
+    build_corpus,
+    compare_results,
+    percentile,
+    pokemon_name,
+    reset_pokeapi_cache,
+)
+from pokemons.circuitbreaker import UpstreamCircuitBreaker
+from pokemons.filters import PokemonFilter
+from pokemons.hedging import HedgeExecutor, LatencyTracker
+from pokemons.helpers import (
+    EXPIRED,
+    FRESH,
+    STALE,
+    PokeApiCatalogHelper,
+    PokeApiRefreshHelper,
+    PokemonEvolutionChainHelper,
+    PokemonHelper,
+    PokemonSpecieHelper,
+    mark_response_stale,
+)
+from pokemons.middlewares import (
+    RequestDeadlineMiddleware,
+    ServerTimingMiddleware,
+    StaleResponseMiddleware,
+)
+from pokemons.models import (
+    FavoritedPokemon,
+    Pokemon,
+    PokemonEvolutionChain,
+    PokemonSpecie,
+)
+from pokemons.ratelimit import LANE_BULK, LANE_INTERACTIVE, UpstreamRateLimiter
+from pokemons.replay import ReplayStore, replay_response
+from pokemons.serializers import PokemonSerializer
+from pokemons.services import (
+    PokeApiDeadlineExceeded,
+    PokeApiError,
+    PokeApiNotFound,
+    PokeApiRateLimited,
+    PokeApiService,
+    PokeApiUnavailable,
+)
+from pokemons.tasks import refresh_pokeapi_objects, sync_pokeapi_catalog
+from pokemons.views import (
+    PokemonEvolutionChainViewSet,
+    PokemonViewSet,
+    get_page_params,
+)
+from users.models import User
+
+
+def scenario_result(**overrides) -> dict:
+    return {
+        "p95_ms": 10.0,
+        "errors": 0,
+        "queries_per_request": 3.0,
+        "upstream_calls_per_request": 1.0,
+        **overrides,
+    }
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+def pokemon_payload(external_id: int, **overrides) -> dict:
+    return {
+        "id": external_id,
+        "name": f"pokemon-{external_id}",
+        "height": 7,
+        "weight": 69,
+        "types": [],
+        "abilities": [],
+        **overrides,
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PokeApiDataTestCase(TestCase):
+    """
+    Base of the tests that read and write PokeAPI rows. The PokeAPI itself is
+    mocked per test (helper.service_method).
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def create_pokemon(external_id: int, age=timedelta(0), **overrides) -> Pokemon:
+        pokemon = PokemonHelper.build_instance(
+            pokemon_payload(external_id, **overrides)
+        )
+        pokemon.last_updated = pokemon.verified_at = timezone.now() - age
+        pokemon.save()
+        return pokemon
+
+    @staticmethod
+    def respond(*payloads, headers: dict | None = None):
+        """
+        side_effect of a mocked service_method answering from payloads by id
+        or name, with 404 for the others.
+        """
+        by_key = {}
+        for payload in payloads:
+            by_key[payload["id"]] = by_key[payload["name"]] = payload
+
+        def service_method(name_or_id, **kwargs):
+            key = int(name_or_id) if str(name_or_id).isdigit() else name_or_id
+            if key not in by_key:
+                raise PokeApiNotFound(f"/pokemon/{name_or_id}", 404)
+            return by_key[key], headers or {}
+
+        return service_method
+
+
+class PercentileTestCase(SimpleTestCase):
+    def test_nearest_rank(self):
+        values = [5, 1, 4, 2, 3, 6, 8, 7, 10, 9]
+        self.assertEqual(percentile(values, 50), 5)
+        self.assertEqual(percentile(values, 95), 10)
+        self.assertEqual(percentile(values, 10), 1)
+        self.assertEqual(percentile(values, 0), 1)
+
+    def test_empty(self):
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+class CompareResultsTestCase(SimpleTestCase):
+    def compare(self, result: dict, base: dict, **kwargs) -> list[str]:
+        return compare_results(
+            {"scenarios": {"list-cold": result}},
+            {"scenarios": {"list-cold": base}},
+            latency_tolerance=0.25,
+            **kwargs,
+        )
+
+    def test_no_regression_within_tolerance(self):
+        self.assertEqual(
+            self.compare(scenario_result(p95_ms=12.5), scenario_result()), []
+        )
+
+    def test_latency_above_tolerance(self):
+        regressions = self.compare(scenario_result(p95_ms=12.6), scenario_result())
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("p95", regressions[0])
+
+    def test_any_increase_of_deterministic_metrics(self):
+        for metric in ("errors", "queries_per_request", "upstream_calls_per_request"):
+            with self.subTest(metric=metric):
+                base = scenario_result()
+                regressions = self.compare(
+                    scenario_result(**{metric: base[metric] + 1}), base
+                )
+                self.assertEqual(len(regressions), 1)
+                self.assertIn(metric, regressions[0])
+
+    def test_failing_requests_are_not_an_improvement(self):
+        # todas as requisições falhando: mais rápido e mais barato, mas pior
+        regressions = self.compare(
+            scenario_result(
+                p95_ms=1.0,
+                errors=20,
+                queries_per_request=0,
+                upstream_calls_per_request=0,
+            ),
+            scenario_result(),
+        )
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("errors", regressions[0])
+
+    def test_missing_scenario(self):
+        regressions = compare_results(
+            {"scenarios": {}},
+            {"scenarios": {"list-cold": scenario_result()}},
+            latency_tolerance=0.25,
+        )
+        self.assertEqual(regressions, ["list-cold: missing from the results"])
+
+    def test_missing_scenario_left_out_by_only(self):
+        regressions = compare_results(
+            {"scenarios": {}},
+            {"scenarios": {"list-cold": scenario_result()}},
+            latency_tolerance=0.25,
+            only=["retrieve"],
+        )
+        self.assertEqual(regressions, [])
+
+    def test_new_scenarios_are_ignored(self):
+        regressions = compare_results(
+            {"scenarios": {"list-cold": scenario_result()}},
+            {"scenarios": {}},
+            latency_tolerance=0.25,
+        )
+        self.assertEqual(regressions, [])
+
+
+class BenchmarkRunnerTestCase(SimpleTestCase):
+    def get_runner(self, **kwargs) -> BenchmarkRunner:
+        with mock.patch.object(BenchmarkRunner, "get_client"):
+            return BenchmarkRunner(
+                User(email="benchmark@example.com"),
+                size=8,
+                page_size=4,
+                iterations=8,
+                **kwargs,
+            )
+
+    def test_throughput_over_wall_clock_with_concurrent_clients(self):
+        runner = self.get_runner(concurrency=4)
+        client = mock.Mock()
+        client.get.side_effect = lambda path: threading.Event().wait(0.05)
+        scenario = Scenario("pokemon-retrieve-warm", lambda i: f"/{i}/", cold=False)
+        with (
+            mock.patch.object(runner, "get_client", return_value=client),
+            mock.patch("pokemons.benchmarks.connection"),
+        ):
+            throughput = runner.measure_throughput(scenario)
+        self.assertEqual(client.get.call_count, 8)
+        # sequencial seria no máximo 20 req/s (1 / 50 ms)
+        self.assertGreater(throughput, 40)
+
+    def test_cold_favorites_refetch_the_species(self):
+        with (
+            mock.patch("pokemons.benchmarks.cache") as cache,
+            mock.patch("pokemons.benchmarks.Pokemon") as pokemon,
+            mock.patch("pokemons.benchmarks.PokemonSpecie") as specie,
+            mock.patch("pokemons.benchmarks.PokemonEvolutionChain"),
+            mock.patch("pokemons.benchmarks.FavoritedPokemon") as favorite,
+        ):
+            reset_pokeapi_cache(keep_favorites=True)
+        cache.delete_pattern.assert_called_once_with("pokeapi:*")
+        specie.objects.all.return_value.delete.assert_called_once()
+        pokemon.objects.filter.assert_called_once_with(favorited_pokemons__isnull=True)
+        pokemon.objects.all.assert_not_called()
+        favorite.objects.all.assert_not_called()
+
+
+class ReplayStoreTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = ReplayStore(self.directory.name)
+
+    def test_normalize_endpoint(self):
+        self.assertEqual(ReplayStore.normalize_endpoint("/pokemon/1/"), "/pokemon/1")
+        self.assertEqual(
+            ReplayStore.normalize_endpoint("/pokemon?offset=20&limit=10"),
+            "/pokemon?limit=10&offset=20",
+        )
+
+    def test_save_and_load(self):
+        digest = self.store.save(
+            "get", "/pokemon/1/", 200, {"id": 1}, {"ETag": '"abc"', "Server": "x"}
+        )
+        data, status, headers = self.store.load("GET", "/pokemon/1")
+        self.assertEqual((data, status), ({"id": 1}, 200))
+        # só os cabeçalhos gravados
+        self.assertEqual(headers, {"ETag": '"abc"'})
+        self.assertEqual(len(digest), 64)
+
+    def test_identical_bodies_share_a_blob(self):
+        first = self.store.save("GET", "/pokemon/1", 200, {"id": 1, "name": "a"})
+        second = self.store.save("GET", "/pokemon/a", 200, {"name": "a", "id": 1})
+        self.assertEqual(first, second)
+
+    def test_default_etag_is_the_body_digest(self):
+        digest = self.store.save("GET", "/pokemon/1", 200, {"id": 1})
+        _, _, headers = self.store.load("GET", "/pokemon/1")
+        self.assertEqual(headers["ETag"], f'"{digest}"')
+
+    def test_not_recorded(self):
+        self.assertIsNone(self.store.load("GET", "/pokemon/1"))
+        with self.assertLogs("pokemons.replay", level="WARNING"):
+            response = replay_response(self.store, "get", "/pokemon/1", None)
+        self.assertEqual(response, (False, 404, {}))
+
+    def test_replay_contract(self):
+        self.store.save("GET", "/pokemon/1", 200, {"id": 1})
+        self.store.save("GET", "/pokemon/missing", 404)
+
+        data, status, headers = replay_response(self.store, "get", "/pokemon/1", {})
+        self.assertEqual((data, status), ({"id": 1}, 200))
+
+        not_modified = replay_response(
+            self.store, "get", "/pokemon/1", {"If-None-Match": headers["ETag"]}
+        )
+        self.assertEqual(not_modified[:2], (None, 304))
+
+        self.assertEqual(
+            replay_response(self.store, "get", "/pokemon/missing", {})[:2],
+            (False, 404),
+        )
+
+
+class BuildCorpusTestCase(SimpleTestCase):
+    size = 7
+    page_size = 3
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = ReplayStore(directory.name)
+        build_corpus(self.store, self.size, self.page_size)
+
+    def test_objects_by_id_and_name(self):
+        for external_id in range(1, self.size + 1):
+            name = pokemon_name(external_id)
+            by_id, status, _ = self.store.load("GET", f"/pokemon/{external_id}/")
+            by_name, _, _ = self.store.load("GET", f"/pokemon/{name}")
+            self.assertEqual(status, 200)
+            self.assertEqual(by_id, by_name)
+            self.assertEqual(by_id["name"], name)
+
+            specie, _, _ = self.store.load("GET", f"/pokemon-species/{external_id}")
+            chain_id = (external_id - 1) // CHAIN_SIZE + 1
+            self.assertTrue(
+                specie["evolution_chain"]["url"].endswith(
+                    f"/evolution-chain/{chain_id}/"
+                )
+            )
+
+    def test_evolution_chains(self):
+        chain, _, _ = self.store.load("GET", "/evolution-chain/1")
+        names = []
+        node = chain["chain"]
+        while node:
+            names.append(node["species"]["name"])
+            node = node["evolves_to"][0] if node["evolves_to"] else None
+        self.assertEqual(names, [pokemon_name(i) for i in range(1, CHAIN_SIZE + 1)])
+
+        # última chain incompleta: só o Pokémon 7
+        last, _, _ = self.store.load("GET", "/evolution-chain/3")
+        self.assertEqual(last["chain"]["species"]["name"], pokemon_name(7))
+        self.assertEqual(last["chain"]["evolves_to"], [])
+
+    def test_list_pages(self):
+        names = []
+        for offset in range(0, self.size, self.page_size):
+            page, _, _ = self.store.load(
+                "GET", f"/pokemon?offset={offset}&limit={self.page_size}"
+            )
+            self.assertEqual(page["count"], self.size)
+            names += [result["name"] for result in page["results"]]
+        self.assertEqual(names, [pokemon_name(i) for i in range(1, self.size + 1)])
+
+
+class ServiceMethodNameTestCase(SimpleTestCase):
+    def test_get_method_name(self):
+        cases = {
+            "/pokemon/1": "get_pokemon",
+            "/pokemon/bulbasaur/": "get_pokemon",
+            "/pokemon?limit=20&offset=0": "get_pokemon_list",
+            "/pokemon-species/1": "get_pokemon_specie",
+            "/evolution-chain?limit=20&offset=0": "get_evolution_chains_list",
+            "/unknown/1": "make_request",
+        }
+        for endpoint, method in cases.items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(PokeApiService.get_method_name(endpoint), method)
+
+
+class DeadlineTestCase(SimpleTestCase):
+    def test_no_deadline(self):
+        self.assertIsNone(deadline.get_remaining())
+        self.assertFalse(deadline.is_expired())
+        self.assertIsNone(deadline.get_timeout())
+
+    @override_settings(HTTP_CONNECT_TIMEOUT=5, HTTP_READ_TIMEOUT=30)
+    def test_nested_blocks_only_shorten(self):
+        with deadline.request_deadline(10):
+            with deadline.request_deadline(60):
+                self.assertLessEqual(deadline.get_remaining(), 10)
+            with deadline.request_deadline(2):
+                connect, read = deadline.get_timeout()
+                self.assertLessEqual(connect, 2)
+                self.assertLessEqual(read, 2)
+        self.assertIsNone(deadline.get_remaining())
+
+    def test_expired(self):
+        with deadline.request_deadline(0):
+            self.assertTrue(deadline.is_expired())
+
+    def test_no_transport_retries_within_a_deadline(self):
+        self.assertEqual(PokeApiService.get_retry(), RETRY_CONNECT)
+        with deadline.request_deadline(5):
+            self.assertEqual(PokeApiService.get_retry(), RETRY_NONE)
+
+
+class LatencyTrackerTestCase(SimpleTestCase):
+    @override_settings(POKEAPI_HEDGE_MIN_SAMPLES=5)
+    def test_percentile_needs_min_samples(self):
+        tracker = LatencyTracker(size=10)
+        for elapsed in (0.1, 0.2, 0.3, 0.4):
+            tracker.add(elapsed)
+        self.assertIsNone(tracker.percentile(95))
+
+        tracker.add(0.5)
+        self.assertEqual(tracker.percentile(95), 0.5)
+        self.assertEqual(tracker.percentile(50), 0.3)
+
+    @override_settings(POKEAPI_HEDGE_MIN_SAMPLES=1)
+    def test_window_keeps_the_latest_samples(self):
+        tracker = LatencyTracker(size=2)
+        for elapsed in (9.0, 0.1, 0.2):
+            tracker.add(elapsed)
+        self.assertEqual(tracker.percentile(100), 0.2)
+
+
+class HedgeExecutorTestCase(SimpleTestCase):
+    def test_rejects_work_without_an_idle_worker(self):
+        executor = HedgeExecutor(max_workers=1)
+        release = threading.Event()
+        busy = executor.try_submit(release.wait)
+        self.assertIsNone(executor.try_submit(lambda: "hedge"))
+
+        release.set()
+        busy.result()
+        # o slot é liberado no callback, logo depois do resultado
+        for _ in range(100):
+            future = executor.try_submit(lambda: "hedge")
+            if future is not None:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(future.result(), "hedge")
+
+    def test_success_wins_when_both_attempts_finish_together(self):
+        class InlineExecutor:
+            def try_submit(self, fn, *args):
+                future = Future()
+                future.set_result(fn(*args))
+                return future
+
+        service = PokeApiService()
+        responses = [(False, 500, {}), ({"id": 1}, 200, {})]
+        rounds = []
+
+        def fake_wait(attempts, timeout=None, return_when=None):
+            # 1ª rodada: o atraso do hedge estoura; 2ª: as duas terminaram
+            rounds.append(attempts)
+            if len(rounds) == 1:
+                return set(), set(attempts)
+            return set(attempts), set()
+
+        with (
+            mock.patch.object(service, "get_hedge_delay", return_value=0.1),
+            mock.patch.object(service, "send_once", side_effect=responses),
+            mock.patch.object(service, "acquire_hedge_token", return_value=True),
+            mock.patch(
+                "pokemons.services.get_hedge_executor", return_value=InlineExecutor()
+            ),
+            mock.patch("pokemons.services.wait", side_effect=fake_wait),
+        ):
+            response = service.send("/pokemon/1", "get")
+        self.assertEqual(response, ({"id": 1}, 200, {}))
+
+    def test_send_inline_when_the_pool_is_busy(self):
+        service = PokeApiService()
+        executor = mock.Mock()
+        executor.try_submit.return_value = None
+
+        def send_once(*args):
+            return threading.current_thread(), 200, {}
+
+        with (
+            mock.patch.object(service, "get_hedge_delay", return_value=0.1),
+            mock.patch.object(service, "send_once", side_effect=send_once),
+            mock.patch("pokemons.services.get_hedge_executor", return_value=executor),
+        ):
+            response = service.send("/pokemon/1", "get")
+        self.assertIs(response[0], threading.current_thread())
+
+
+class RequestMetricsTestCase(SimpleTestCase):
+    def test_records_only_inside_a_request(self):
+        timing.record("db", 1.0)
+        self.assertIsNone(timing.get_metrics())
+
+        with timing.collect_metrics() as metrics:
+            timing.record("db", 0.002)
+            timing.record("db", 0.003)
+            timing.record_cache("PokemonHelper", timing.CACHE_HIT, 2)
+            timing.record_cache("PokemonHelper", timing.CACHE_MISS)
+        metrics.finish()
+
+        self.assertEqual(metrics.counts["db"], 2)
+        self.assertAlmostEqual(metrics.durations["db"], 0.005)
+        header = metrics.server_timing()
+        self.assertIn('db;dur=5.0;desc="2x"', header)
+        self.assertIn('cache-pokemonhelper;desc="hit=2 stale=0 miss=1"', header)
+        self.assertIn("total;dur=", header)
+        self.assertEqual(
+            metrics.to_dict()["cache"],
+            {"PokemonHelper": {"hit": 2, "stale": 0, "miss": 1}},
+        )
+
+    @override_settings(SERVER_TIMING_ENABLED=True)
+    def test_queries_of_async_views_run_in_worker_threads(self):
+        # conexão aberta pela thread do sync_to_async, não pelo event loop
+        worker_connection = mock.Mock(execute_wrappers=[])
+        timing.install_db_execute_wrapper(None, worker_connection)
+        timing.install_db_execute_wrapper(None, worker_connection)
+        self.assertEqual(len(worker_connection.execute_wrappers), 1)
+
+        def query():
+            wrapper = worker_connection.execute_wrappers[0]
+            return wrapper(lambda *args: None, "SELECT 1", None, False, {})
+
+        async def view(request):
+            await sync_to_async(query, thread_sensitive=False)()
+            return HttpResponse("ok")
+
+        handler = ServerTimingMiddleware(view)
+        response = async_to_sync(handler)(RequestFactory().get("/"))
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn('desc="1x"', response["Server-Timing"])
+
+
+class HybridMiddlewareTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def build_chain(self, view):
+        handler = view
+        for middleware in (
+            RequestDeadlineMiddleware,
+            StaleResponseMiddleware,
+            ServerTimingMiddleware,
+        ):
+            handler = middleware(handler)
+        return handler
+
+    @override_settings(SERVER_TIMING_ENABLED=True, POKEAPI_REQUEST_DEADLINE_SECONDS=5)
+    def test_async_chain_stays_async(self):
+        async def view(request):
+            # roda no event loop, dentro do prazo e das métricas do request
+            self.assertIsNotNone(deadline.get_remaining())
+            self.assertIsNotNone(timing.get_metrics())
+            mark_response_stale("pokemon-list")
+            return HttpResponse("ok")
+
+        handler = self.build_chain(view)
+        self.assertTrue(iscoroutinefunction(handler))
+
+        response = async_to_sync(handler)(self.factory.get("/"))
+        self.assertEqual(response["X-Stale-Objects"], "pokemon-list")
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    @override_settings(SERVER_TIMING_ENABLED=True, POKEAPI_REQUEST_DEADLINE_SECONDS=5)
+    def test_sync_chain(self):
+        def view(request):
+            self.assertIsNotNone(deadline.get_remaining())
+            mark_response_stale("pokemon-list")
+            return HttpResponse("ok")
+
+        handler = self.build_chain(view)
+        self.assertFalse(iscoroutinefunction(handler))
+
+        response = handler(self.factory.get("/"))
+        self.assertEqual(response["X-Stale-Objects"], "pokemon-list")
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_server_timing_disabled(self):
+        handler = self.build_chain(lambda request: HttpResponse("ok"))
+        response = handler(self.factory.get("/"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+class RetrieveErrorTestCase(SimpleTestCase):
+    def dispatch(self, view, method, error):
+        request = getattr(APIRequestFactory(), method)("/")
+        force_authenticate(request, user=User(email="ash@example.com"))
+        with mock.patch("pokemons.views.PokemonHelper.get_object", side_effect=error):
+            return view(request, pk="pikachu")
+
+    def retrieve(self, error):
+        view = PokemonViewSet.as_view({"get": "retrieve"})
+        return self.dispatch(view, "get", error)
+
+    @override_settings(POKEAPI_RATE_LIMIT_QPS=0.5)
+    def test_rate_limited(self):
+        response = self.retrieve(PokeApiRateLimited("pokemon/pikachu", "bulk", 2))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "2")
+
+    @override_settings(POKEAPI_CIRCUIT_OPEN_SECONDS=30)
+    def test_circuit_open(self):
+        response = self.retrieve(PokeApiUnavailable("pokemon/pikachu"))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_deadline_exceeded(self):
+        response = self.retrieve(PokeApiDeadlineExceeded("pokemon/pikachu"))
+        self.assertEqual(response.status_code, 504)
+        self.assertFalse(response.has_header("Retry-After"))
+
+    def test_not_found(self):
+        response = self.retrieve(PokeApiNotFound("pokemon/pikachu", 404))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("Retry-After"))
+
+    def test_other_upstream_errors_are_not_a_404(self):
+        response = self.retrieve(PokeApiError("pokemon/pikachu", 500))
+        self.assertEqual(response.status_code, 502)
+
+    @override_settings(POKEAPI_CIRCUIT_OPEN_SECONDS=30)
+    def test_favorite_and_evolution_chain(self):
+        favorite = PokemonViewSet.as_view({"post": "favorite"})
+        response = self.dispatch(
+            favorite, "post", PokeApiUnavailable("pokemon/pikachu")
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "30")
+
+        chain = PokemonEvolutionChainViewSet.as_view({"get": "retrieve"})
+        response = self.dispatch(
+            chain, "get", PokeApiDeadlineExceeded("pokemon/pikachu")
+        )
+        self.assertEqual(response.status_code, 504)
+
+        response = self.dispatch(chain, "get", PokeApiNotFound("pikachu", 404))
+        self.assertEqual(response.status_code, 404)
+
+
+class IngestSpeciesTestCase(SimpleTestCase):
+    def test_matches_the_default_variety_by_id(self):
+        deoxys = Pokemon(external_id=386, name="deoxys-normal")
+        results = [
+            {"name": "deoxys", "url": "https://pokeapi.co/api/v2/pokemon-species/386/"}
+        ]
+
+        with (
+            mock.patch("pokemons.helpers.Pokemon.objects.filter") as filter_pokemons,
+            mock.patch.object(PokemonSpecieHelper, "get_many") as get_many,
+            mock.patch.object(PokemonSpecieHelper, "group_by_chain", return_value={}),
+            mock.patch("pokemons.helpers.PokemonEvolutionChainHelper") as chains,
+        ):
+            filter_pokemons.return_value = [deoxys]
+            get_many.return_value = ["deoxys"]
+            chains.get_many.return_value = []
+            self.assertEqual(PokeApiCatalogHelper.ingest_species(results), 1)
+
+        filter_pokemons.assert_called_once_with(external_id__in=[386])
+        self.assertEqual(get_many.call_args.args[0], [386])
+        self.assertEqual(
+            get_many.call_args.kwargs["instance_kwargs"], {386: {"pokemon": deoxys}}
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogSyncTestCase(SimpleTestCase):
+    def setUp(self):
+        self.offsets = []
+        patches = [
+            mock.patch("pokemons.helpers.acquire_lock", return_value=True),
+            mock.patch("pokemons.helpers.release_lock"),
+            mock.patch("pokemons.helpers.cache.touch"),
+            mock.patch.object(PokemonHelper, "set_upstream_count"),
+            mock.patch.object(PokeApiCatalogHelper, "ingest_pokemons", side_effect=len),
+            mock.patch(
+                "pokemons.helpers.service.get_pokemon_list", side_effect=self.get_page
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def get_page(self, limit, offset):
+        self.offsets.append(offset)
+        results = [{"name": pokemon_name(i)} for i in range(offset, offset + limit)]
+        return {"count": 30, "next": offset + limit < 30 or None, "results": results}
+
+    def test_stops_at_the_batch_limit_and_resumes(self):
+        with mock.patch("pokemons.helpers.time.monotonic", side_effect=[0, 1, 2]):
+            summary = PokeApiCatalogHelper.sync(
+                stages=["pokemon"], page_size=10, max_seconds=2
+            )
+        self.assertEqual(summary, {"pokemon": 20})
+        self.assertTrue(PokeApiCatalogHelper.is_pending())
+
+        summary = PokeApiCatalogHelper.sync(stages=["pokemon"], page_size=10)
+        self.assertEqual(summary, {"pokemon": 10})
+        self.assertEqual(self.offsets, [0, 10, 20])
+        self.assertFalse(PokeApiCatalogHelper.is_pending())
+
+    def test_task_reenqueues_itself_while_pending(self):
+        with (
+            mock.patch.object(PokeApiCatalogHelper, "sync", return_value={}),
+            mock.patch.object(PokeApiCatalogHelper, "is_pending", return_value=True),
+            mock.patch.object(sync_pokeapi_catalog, "apply_async") as apply_async,
+        ):
+            sync_pokeapi_catalog(stages=["species"], restart=True)
+        apply_async.assert_called_once_with(
+            kwargs={"stages": ["species"], "page_size": 100}
+        )
+
+
+class EvolutionTreeCacheKeyTestCase(SimpleTestCase):
+    def setUp(self):
+        self.chain = PokemonEvolutionChain(external_id=1, content_hash="chain")
+        self.chain.data = {"chain": {"species": {"name": "deoxys"}, "evolves_to": []}}
+
+    def get_key(self, members):
+        with mock.patch(
+            "pokemons.models.PokemonSpecie.objects.filter"
+        ) as filter_species:
+            queryset = filter_species.return_value.order_by.return_value
+            queryset.values_list.return_value = members
+            key = self.chain.get_tree_cache_key()
+        # por specie: o Pokémon de deoxys se chama deoxys-normal
+        filter_species.assert_called_once_with(name__in=["deoxys"])
+        return key
+
+    def test_member_changes_change_the_key(self):
+        key = self.get_key([(386, "specie", "pokemon")])
+        self.assertEqual(key, self.get_key([(386, "specie", "pokemon")]))
+        self.assertNotEqual(key, self.get_key([(386, "specie", "pokemon-v2")]))
+        self.assertNotEqual(key, self.get_key([(386, "specie-v2", "pokemon")]))
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_key_computed_once_per_request(self):
+        tree = {"pokemon": {"id": 386}, "evolution_text": None, "evolves_to": []}
+        with (
+            mock.patch.object(
+                PokemonEvolutionChain, "get_tree_cache_key", return_value="tree"
+            ) as get_key,
+            mock.patch.object(
+                PokemonEvolutionChain, "build_tree", return_value=(tree, True)
+            ) as build_tree,
+        ):
+            self.chain.structured_chain(None)
+            self.chain.structured_chain(None)
+        # miss e hit: uma chave por request
+        self.assertEqual(get_key.call_count, 2)
+        build_tree.assert_called_once()
+
+
+class PageParamsTestCase(SimpleTestCase):
+    @override_settings(POKEAPI_MAX_PAGE_SIZE=100)
+    def test_clamped(self):
+        self.assertEqual(get_page_params({}), (20, 0))
+        self.assertEqual(get_page_params({"limit": "5", "offset": "-3"}), (5, 0))
+        self.assertEqual(get_page_params({"limit": "100000"}), (100, 0))
+        self.assertEqual(get_page_params({"limit": "-1"}), (0, 0))
+
+    def test_not_an_integer(self):
+        with self.assertRaises(ValidationError):
+            get_page_params({"limit": "ten"})
+        with self.assertRaises(ValidationError):
+            get_page_params({"offset": "1.5"})
+
+
+@override_settings(
+    POKEAPI_CIRCUIT_BREAKER=True,
+    POKEAPI_CIRCUIT_OPEN_SECONDS=30,
+    POKEAPI_CIRCUIT_SLOW_SECONDS=3,
+)
+@override_settings(
+    POKEAPI_CIRCUIT_BREAKER=True,
+    POKEAPI_CIRCUIT_MIN_REQUESTS=4,
+    POKEAPI_CIRCUIT_ERROR_RATE=0.5,
+    POKEAPI_CIRCUIT_SLOW_SECONDS=3,
+    POKEAPI_CIRCUIT_SLOW_RATE=0.6,
+    POKEAPI_CIRCUIT_OPEN_SECONDS=30,
+)
+class CircuitBreakerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patch = mock.patch(
+            "pokemons.circuitbreaker.get_redis_connection", return_value=self.redis
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.breaker = UpstreamCircuitBreaker()
+
+    def half_open(self):
+        self.breaker.trip()
+        self.redis.delete(self.breaker.open_key)
+        self.assertEqual(self.breaker.get_state(), self.breaker.HALF_OPEN)
+
+    def test_only_the_probe_outcome_counts_while_half_open(self):
+        self.half_open()
+        allowed, probe = self.breaker.allow_request()
+        self.assertTrue(allowed)
+        self.assertIsNotNone(probe)
+        self.assertEqual(self.breaker.allow_request(), (False, None))
+
+        # iniciada antes do trip, termina tarde: não fecha o circuito
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.get_state(), self.breaker.HALF_OPEN)
+
+        self.breaker.record(True, 0.1, probe)
+        self.assertEqual(self.breaker.get_state(), self.breaker.CLOSED)
+
+    def test_release_probe(self):
+        self.half_open()
+        _, probe = self.breaker.allow_request()
+        self.breaker.release_probe("another-token")
+        self.assertEqual(self.breaker.allow_request(), (False, None))
+
+        self.breaker.release_probe(probe)
+        allowed, new_probe = self.breaker.allow_request()
+        self.assertTrue(allowed)
+        self.assertNotEqual(new_probe, probe)
+
+    def test_closed_trips_on_the_error_rate(self):
+        for success in (True, False, True):
+            self.breaker.record(success, 0.1)
+        # abaixo de POKEAPI_CIRCUIT_MIN_REQUESTS: não abre
+        self.assertEqual(self.breaker.get_state(), self.breaker.CLOSED)
+
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.get_state(), self.breaker.OPEN)
+        self.assertEqual(self.breaker.allow_request(), (False, None))
+
+    def test_closed_trips_on_the_slow_rate(self):
+        for _ in range(3):
+            self.breaker.record(True, 0.1)
+        self.breaker.record(True, 5)
+        self.assertEqual(self.breaker.get_state(), self.breaker.CLOSED)
+        for _ in range(4):
+            self.breaker.record(True, 5)
+        self.assertEqual(self.breaker.get_state(), self.breaker.OPEN)
+
+    def test_open_becomes_half_open_after_the_open_period(self):
+        self.breaker.trip()
+        self.assertEqual(self.redis.ttl(self.breaker.open_key), 30)
+        self.half_open()
+
+    def test_failed_probe_trips_again(self):
+        self.half_open()
+        _, probe = self.breaker.allow_request()
+        self.breaker.record(False, 0.1, probe)
+        self.assertEqual(self.breaker.get_state(), self.breaker.OPEN)
+
+    def test_slow_probe_trips_again(self):
+        self.half_open()
+        _, probe = self.breaker.allow_request()
+        self.breaker.record(True, 5, probe)
+        self.assertEqual(self.breaker.get_state(), self.breaker.OPEN)
+
+    def test_requests_flow_again_after_a_good_probe(self):
+        self.half_open()
+        _, probe = self.breaker.allow_request()
+        self.breaker.record(True, 0.1, probe)
+        self.assertEqual(self.breaker.get_state(), self.breaker.CLOSED)
+        self.assertEqual(self.breaker.allow_request(), (True, None))
+
+    def test_probe_released_when_the_request_is_not_sent(self):
+        with (
+            mock.patch("pokemons.services.circuit_breaker") as breaker,
+            mock.patch("pokemons.services.rate_limiter") as limiter,
+        ):
+            breaker.allow_request.return_value = (True, "probe")
+            limiter.acquire.return_value = (False, 2.0)
+            with self.assertRaises(PokeApiRateLimited):
+                PokeApiService().get_pokemon(1)
+        breaker.release_probe.assert_called_once_with("probe")
+        breaker.record.assert_not_called()
+
+
+class UpstreamRateLimitTestCase(SimpleTestCase):
+    def setUp(self):
+        for target in ("circuit_breaker", "rate_limiter"):
+            patch = mock.patch(f"pokemons.services.{target}")
+            self.addCleanup(patch.stop)
+            setattr(self, target, patch.start())
+        self.circuit_breaker.allow_request.return_value = (True, None)
+        self.rate_limiter.acquire.return_value = (True, 0)
+
+    def get_pokemon(self, response: tuple):
+        with (
+            mock.patch.object(PokeApiService, "get_hedge_delay", return_value=None),
+            mock.patch(
+                "pokemons.services.make_api_request", return_value=response
+            ) as request,
+        ):
+            try:
+                return PokeApiService().get_pokemon(1)
+            finally:
+                # só falhas de conexão são repetidas: uma requisição por token
+                self.assertEqual(request.call_args.kwargs["retry"], RETRY_CONNECT)
+
+    def test_upstream_429_raises_with_its_retry_after(self):
+        with self.assertRaises(PokeApiRateLimited) as context:
+            self.get_pokemon((False, 429, {"Retry-After": "7"}))
+        self.assertEqual(context.exception.retry_after, 7)
+        self.rate_limiter.acquire.assert_called_once()
+
+    def test_retry_after_http_date(self):
+        headers = {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        with mock.patch("pokemons.services.time.time", return_value=1445412470):
+            self.assertEqual(PokeApiService.get_retry_after(headers), 10)
+        self.assertIsNone(PokeApiService.get_retry_after({"Retry-After": "soon"}))
+        self.assertIsNone(PokeApiService.get_retry_after(None))
+
+
+POKEMON_DATA = {
+    "types": [{"type": {"name": "poison"}}, {"type": {"name": "Grass"}}],
+    "abilities": [{"ability": {"name": "overgrow"}}, {"ability": None}],
+    "height": 7,
+    "weight": 69,
+    "cries": {"latest": "https://example.com/1.ogg"},
+    "sprites": {"other": {"official-artwork": {"front_default": "https://x/1.png"}}},
+}
+SPECIE_DATA = {
+    "flavor_text_entries": [
+        {"language": {"name": "ja"}, "flavor_text": "..."},
+        {"language": {"name": "en"}, "flavor_text": "A strange\nseed.\fIt grows."},
+    ],
+    "evolution_chain": {"url": "https://pokeapi.co/api/v2/evolution-chain/1/"},
+}
+
+
+class ProjectionTestCase(SimpleTestCase):
+    def test_pokemon_projection(self):
+        self.assertEqual(
+            Pokemon.project(POKEMON_DATA),
+            {
+                "types": ["Grass", "poison"],
+                "abilities": ["overgrow"],
+                "height": 7,
+                "weight": 69,
+                "cry": "https://example.com/1.ogg",
+                "sprite_default": "https://x/1.png",
+                "sprite_shiny": None,
+            },
+        )
+        self.assertEqual(set(Pokemon.project({})), set(Pokemon.projection_fields))
+
+    def test_specie_projection(self):
+        self.assertEqual(
+            PokemonSpecie.project(SPECIE_DATA),
+            {
+                "flavor_text": "A strange seed. It grows.",
+                "evolution_chain_external_id": 1,
+            },
+        )
+        self.assertEqual(
+            PokemonSpecie.project({}),
+            {"flavor_text": "", "evolution_chain_external_id": None},
+        )
+
+    def test_backfill_uses_the_historical_models(self):
+        migration = importlib.import_module(
+            "pokemons.migrations.0007_pokemon_projection_columns"
+        )
+        instances = {
+            "Pokemon": mock.Mock(data=POKEMON_DATA),
+            "PokemonSpecie": mock.Mock(data=SPECIE_DATA),
+        }
+        models = {}
+
+        def get_model(app_label, model_name):
+            model = models[model_name] = mock.Mock()
+            model.objects.iterator.return_value = [instances[model_name]]
+            return model
+
+        migration.backfill_projections(mock.Mock(get_model=get_model), None)
+        self.assertEqual(instances["Pokemon"].types, ["Grass", "poison"])
+        self.assertEqual(instances["PokemonSpecie"].evolution_chain_external_id, 1)
+        models["Pokemon"].objects.bulk_update.assert_called_once_with(
+            [instances["Pokemon"]], Pokemon.projection_fields
+        )
+        models["PokemonSpecie"].objects.bulk_update.assert_called_once_with(
+            [instances["PokemonSpecie"]], PokemonSpecie.projection_fields
+        )
+
+
+class ScheduleRefreshesTestCase(SimpleTestCase):
+    def test_stale_page_schedules_a_single_task(self):
+        found = {key: mock.Mock() for key in (1, 2, 3)}
+        with (
+            mock.patch.object(PokemonHelper, "get_freshness", return_value=STALE),
+            mock.patch.object(PokemonHelper, "schedule_refreshes") as schedule,
+        ):
+            to_fetch = PokemonHelper.plan_fetches(
+                [1, 2, 3, 4], found, False, None, background_refresh=True
+            )
+        self.assertEqual(to_fetch, [4])
+        schedule.assert_called_once_with([1, 2, 3])
+
+    def test_only_free_locks_are_enqueued(self):
+        with (
+            mock.patch(
+                "pokemons.helpers.acquire_locks", return_value=[True, False, True]
+            ) as acquire,
+            mock.patch.object(refresh_pokeapi_objects, "delay") as delay,
+        ):
+            scheduled = PokemonHelper.schedule_refreshes([1, 2, 3])
+        self.assertEqual(scheduled, [1, 3])
+        acquire.assert_called_once()
+        delay.assert_called_once_with("PokemonHelper", [1, 3])
+
+    def test_locks_released_when_the_task_cannot_be_enqueued(self):
+        with (
+            mock.patch("pokemons.helpers.acquire_locks", return_value=[True]),
+            mock.patch("pokemons.helpers.release_locks") as release,
+            mock.patch.object(
+                refresh_pokeapi_objects, "delay", side_effect=ConnectionError
+            ),
+            self.assertLogs("pokemons.helpers", level="ERROR"),
+        ):
+            self.assertEqual(PokemonHelper.schedule_refreshes([1]), [])
+        release.assert_called_once_with([PokemonHelper.refresh_lock_key(1)])
+
+
+class RefreshDueTestCase(SimpleTestCase):
+    @override_settings(
+        POKEAPI_TTL_JITTER=0, POKEAPI_REFRESH_LEAD_HOURS=12, CACHES=LOCMEM_CACHES
+    )
+    def test_only_candidate_rows_are_scored(self):
+        now = timezone.now()
+        old = {
+            "external_id": 1,
+            "pokemon__external_id": 1,
+            "last_updated": now - timedelta(days=30),
+        }
+        popular = {
+            "external_id": 2,
+            "pokemon__external_id": 2,
+            "last_updated": now - timedelta(days=7),
+        }
+        rows = mock.Mock()
+        rows.order_by.return_value.__getitem__ = mock.Mock(return_value=rows.oldest)
+        rows.oldest.values.return_value = [{**old, "verified_at": None}]
+        rows.filter.return_value.values.return_value = [
+            {**popular, "verified_at": None}
+        ]
+
+        with mock.patch.object(
+            PokemonSpecieHelper.model.objects, "filter", return_value=rows
+        ) as filter_rows:
+            due = PokeApiRefreshHelper.get_due(PokemonSpecieHelper, {2: 9.0}, 10)
+
+        # corte no menor TTL possível, antes de ler qualquer linha
+        cutoff = filter_rows.call_args.args[0].children[0][1]
+        self.assertAlmostEqual(
+            (now - cutoff).total_seconds(), timedelta(days=6.5).total_seconds(), -1
+        )
+        rows.order_by.return_value.__getitem__.assert_called_once_with(slice(None, 10))
+        rows.filter.assert_called_once_with(pokemon__external_id__in=[2])
+        priorities = dict((external_id, p) for p, external_id in due)
+        self.assertGreater(priorities[2], priorities[1])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_budget_goes_to_the_highest_priorities(self):
+        due = {
+            PokemonHelper: [(5.0, 1), (1.0, 2)],
+            PokemonSpecieHelper: [(3.0, 10)],
+            PokemonEvolutionChainHelper: [(0.5, 20)],
+        }
+        with (
+            mock.patch.object(PokeApiRefreshHelper, "get_popularity", return_value={}),
+            mock.patch.object(PokeApiRefreshHelper, "decay_popularity"),
+            mock.patch.object(
+                PokeApiRefreshHelper,
+                "get_due",
+                side_effect=lambda helper, popularity, budget: due[helper],
+            ),
+            mock.patch.object(PokemonHelper, "get_many", return_value=[1]) as pokemons,
+            mock.patch.object(
+                PokemonSpecieHelper, "get_many", return_value=[10]
+            ) as species,
+            mock.patch.object(PokemonEvolutionChainHelper, "get_many") as chains,
+        ):
+            summary = PokeApiRefreshHelper.refresh_due(budget=2)
+
+        self.assertEqual(summary, {"PokemonHelper": 1, "PokemonSpecieHelper": 1})
+        self.assertEqual(pokemons.call_args.args[0], [1])
+        self.assertEqual(species.call_args.args[0], [10])
+        chains.assert_not_called()
+
+
+@override_settings(
+    POKEAPI_RATE_LIMIT_QPS=1,
+    POKEAPI_RATE_LIMIT_BURST=4,
+    POKEAPI_RATE_LIMIT_LANE_RESERVES={"interactive": 0, "bulk": 0.5},
+    POKEAPI_RATE_LIMIT_MAX_WAIT_SECONDS={"interactive": 2, "bulk": 300},
+)
+class RateLimiterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patch = mock.patch(
+            "pokemons.ratelimit.get_redis_connection", return_value=self.redis
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.limiter = UpstreamRateLimiter()
+
+    def test_bucket_starts_full_then_waits_for_refill(self):
+        for _ in range(4):
+            self.assertEqual(self.limiter.try_acquire(LANE_INTERACTIVE), 0)
+        # 1 QPS: o próximo token chega em ~1s
+        self.assertAlmostEqual(self.limiter.try_acquire(LANE_INTERACTIVE), 1, 1)
+
+    def test_lower_lanes_leave_their_reserve(self):
+        # reserva de 50% de 4 tokens: bulk só consome até sobrarem 2
+        self.assertEqual(self.limiter.try_acquire(LANE_BULK), 0)
+        self.assertEqual(self.limiter.try_acquire(LANE_BULK), 0)
+        self.assertAlmostEqual(self.limiter.try_acquire(LANE_BULK), 1, 1)
+
+        self.assertEqual(self.limiter.try_acquire(LANE_INTERACTIVE), 0)
+        self.assertEqual(self.limiter.try_acquire(LANE_INTERACTIVE), 0)
+        self.assertGreater(self.limiter.try_acquire(LANE_INTERACTIVE), 0)
+
+    def test_max_wait_per_lane(self):
+        self.assertIsNotNone(self.limiter.get_delay(1, 0.5, LANE_INTERACTIVE))
+        self.assertIsNone(self.limiter.get_delay(1, 1.5, LANE_INTERACTIVE))
+        self.assertIsNotNone(self.limiter.get_delay(1, 1.5, LANE_BULK))
+        # o prazo do request encurta a espera da lane
+        self.assertIsNone(self.limiter.get_delay(1, 0, LANE_BULK, max_wait=0.5))
+
+    def test_acquire_gives_up_after_the_max_wait(self):
+        with (
+            mock.patch.object(self.limiter, "try_acquire", return_value=0.8),
+            mock.patch("pokemons.ratelimit.time.sleep") as sleep,
+            mock.patch("pokemons.ratelimit.time.monotonic", side_effect=[0, 0, 1.5]),
+        ):
+            acquired, waited = self.limiter.acquire(LANE_INTERACTIVE)
+        self.assertFalse(acquired)
+        self.assertEqual(waited, 1.5)
+        sleep.assert_called_once()
+
+    def test_fails_open_without_redis(self):
+        self.redis.connection_pool.connection_kwargs["server"] = None
+        with (
+            mock.patch.object(
+                self.limiter, "get_script", side_effect=RedisConnectionError
+            ),
+            self.assertLogs("pokemons.ratelimit", level="WARNING"),
+        ):
+            self.assertEqual(self.limiter.try_acquire(LANE_INTERACTIVE), 0)
+
+
+class GetManyTestCase(PokeApiDataTestCase):
+    def test_only_missing_rows_are_fetched(self):
+        self.create_pokemon(1)
+        self.create_pokemon(2)
+        with mock.patch.object(
+            PokemonHelper,
+            "service_method",
+            side_effect=self.respond(pokemon_payload(3)),
+        ) as service_method:
+            # uma query para todos os identificadores, IDs e nomes
+            with self.assertNumQueries(3):
+                pokemons = PokemonHelper.get_many(
+                    [2, "Pokemon-1", 3, 1], with_relations=False
+                )
+
+        self.assertEqual([p.external_id for p in pokemons], [2, 1, 3])
+        service_method.assert_called_once()
+        self.assertEqual(service_method.call_args.args, (3,))
+        self.assertTrue(Pokemon.objects.filter(external_id=3).exists())
+
+    def test_unresolved_identifiers_are_skipped(self):
+        with (
+            mock.patch.object(
+                PokemonHelper,
+                "service_method",
+                side_effect=self.respond(pokemon_payload(1), pokemon_payload(2)),
+            ) as service_method,
+            self.assertLogs("pokemons.helpers", level="WARNING"),
+        ):
+            pokemons = PokemonHelper.get_many([1, 404, 2], with_relations=False)
+
+        self.assertEqual([p.external_id for p in pokemons], [1, 2])
+        self.assertEqual(service_method.call_count, 3)
+
+
+@override_settings(POKEAPI_LOCAL_CATALOG=True)
+class LocalCatalogListTestCase(PokeApiDataTestCase):
+    def setUp(self):
+        super().setUp()
+        for external_id in (3, 1, 2):
+            self.create_pokemon(external_id)
+        self.user = User.objects.create_user(email="ash@example.com")
+
+    def list(self, query: str = "") -> dict:
+        request = APIRequestFactory().get(f"/api/pokemons/{query}")
+        force_authenticate(request, user=self.user)
+        view = PokemonViewSet.as_view({"get": "list"})
+        with (
+            mock.patch.object(PokemonHelper, "record_hits"),
+            mock.patch.object(
+                PokemonHelper, "service_method", side_effect=self.respond()
+            ) as self.service_method,
+            # espécies ausentes: a PokeAPI não as conhece
+            mock.patch.object(
+                PokemonSpecieHelper, "service_method", side_effect=self.respond()
+            ),
+            mock.patch("pokemons.helpers.logger"),
+        ):
+            response = view(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    @mock.patch("pokemons.views.PokeApiService.get_pokemon_list")
+    def test_complete_catalog_is_paged_locally(self, get_pokemon_list):
+        PokemonHelper.set_upstream_count(3)
+
+        page = self.list("?limit=2&offset=1")
+
+        get_pokemon_list.assert_not_called()
+        self.service_method.assert_not_called()
+        self.assertEqual(page["count"], 3)
+        self.assertEqual(
+            [p["name"] for p in page["results"]], ["pokemon-2", "pokemon-3"]
+        )
+        self.assertIsNone(page["next"])
+        self.assertIn("offset=0", page["previous"])
+
+    @mock.patch("pokemons.views.PokeApiService.get_pokemon_list")
+    def test_incomplete_catalog_uses_the_pokeapi_list(self, get_pokemon_list):
+        PokemonHelper.set_upstream_count(4)
+        get_pokemon_list.return_value = {
+            "count": 4,
+            "next": None,
+            "previous": None,
+            "results": [{"name": "pokemon-1"}, {"name": "pokemon-2"}],
+        }
+
+        page = self.list("?limit=2")
+
+        get_pokemon_list.assert_called_once_with(limit=2, offset=0)
+        self.assertEqual(page["count"], 4)
+        self.assertEqual(
+            [p["name"] for p in page["results"]], ["pokemon-1", "pokemon-2"]
+        )
+
+    @override_settings(POKEAPI_LOCAL_CATALOG=False)
+    @mock.patch("pokemons.views.PokeApiService.get_pokemon_list")
+    def test_disabled_catalog_uses_the_pokeapi_list(self, get_pokemon_list):
+        PokemonHelper.set_upstream_count(3)
+        get_pokemon_list.return_value = {"count": 3, "results": []}
+
+        self.list()
+
+        get_pokemon_list.assert_called_once_with(limit=20, offset=0)
+
+
+@override_settings(POKEAPI_TTL_JITTER=0)
+class FreshnessTestCase(PokeApiDataTestCase):
+    def setUp(self):
+        super().setUp()
+        # sem specie (forma alternativa): a leitura depende só do Pokémon
+        cache.set(PokemonSpecieHelper.not_found_cache_key(25), True)
+
+    def freshness(self, age: timedelta) -> str:
+        pokemon = Pokemon(external_id=25, verified_at=timezone.now() - age)
+        return PokemonHelper.get_freshness(pokemon, cache_days=7)
+
+    @mock.patch.object(PokemonHelper, "hard_expiry_days", 30)
+    @mock.patch.object(PokemonHelper, "stale_while_revalidate", True)
+    def test_states_with_stale_while_revalidate(self):
+        self.assertEqual(self.freshness(timedelta(days=6)), FRESH)
+        self.assertEqual(self.freshness(timedelta(days=8)), STALE)
+        self.assertEqual(self.freshness(timedelta(days=31)), EXPIRED)
+
+    @mock.patch.object(PokemonHelper, "stale_while_revalidate", False)
+    def test_states_without_stale_while_revalidate(self):
+        self.assertEqual(self.freshness(timedelta(days=6)), FRESH)
+        self.assertEqual(self.freshness(timedelta(days=8)), EXPIRED)
+
+    def test_verified_at_takes_precedence_over_last_updated(self):
+        pokemon = Pokemon(
+            external_id=25,
+            last_updated=timezone.now() - timedelta(days=60),
+            verified_at=timezone.now(),
+        )
+        self.assertEqual(PokemonHelper.get_freshness(pokemon), FRESH)
+
+    @mock.patch.object(PokemonHelper, "hard_expiry_days", 30)
+    @mock.patch.object(PokemonHelper, "stale_while_revalidate", True)
+    def test_stale_row_is_served_and_refreshed_in_background(self):
+        pokemon = self.create_pokemon(25, age=timedelta(days=8))
+        with (
+            mock.patch.object(PokemonHelper, "service_method") as service_method,
+            mock.patch.object(PokemonHelper, "schedule_refresh") as schedule_refresh,
+        ):
+            self.assertEqual(PokemonHelper.get_object(25), pokemon)
+
+        service_method.assert_not_called()
+        schedule_refresh.assert_called_once_with(25)
+
+    @mock.patch.object(PokemonHelper, "hard_expiry_days", 30)
+    @mock.patch.object(PokemonHelper, "stale_while_revalidate", True)
+    def test_expired_row_is_refetched_before_being_served(self):
+        self.create_pokemon(25, age=timedelta(days=31))
+        payload = pokemon_payload(25, weight=60)
+        with (
+            mock.patch.object(
+                PokemonHelper, "service_method", side_effect=self.respond(payload)
+            ) as service_method,
+            mock.patch.object(PokemonHelper, "schedule_refresh") as schedule_refresh,
+            self.assertLogs("pokemons.helpers", level="WARNING"),
+        ):
+            pokemon = PokemonHelper.get_object(25)
+
+        service_method.assert_called_once()
+        schedule_refresh.assert_not_called()
+        self.assertEqual(pokemon.weight, 60)
+        self.assertEqual(PokemonHelper.get_freshness(pokemon), FRESH)
+
+
+class SingleFlightTestCase(PokeApiDataTestCase):
+    def setUp(self):
+        super().setUp()
+        for external_id in (1, 2):
+            cache.set(PokemonSpecieHelper.not_found_cache_key(external_id), True)
+
+    def hold_fetch_lock(self, external_id: int):
+        # outro worker está buscando o Pokémon na API
+        self.assertTrue(
+            cache.add(PokemonHelper.fetch_lock_key(external_id), "true", 60)
+        )
+
+    def finish_fetch(self, identifiers):
+        for identifier in identifiers:
+            self.create_pokemon(identifier)
+            cache.delete(PokemonHelper.fetch_lock_key(identifier))
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        self.hold_fetch_lock(1)
+        with (
+            mock.patch.object(PokemonHelper, "service_method") as service_method,
+            mock.patch.object(
+                PokemonHelper, "wait_for_fetches", side_effect=self.finish_fetch
+            ) as wait_for_fetches,
+            self.assertLogs("pokemons.helpers", level="WARNING"),
+        ):
+            pokemon = PokemonHelper.get_object(1)
+
+        wait_for_fetches.assert_called_once_with([1])
+        service_method.assert_not_called()
+        self.assertEqual(pokemon.external_id, 1)
+
+    def test_fetches_without_the_lock_when_the_other_worker_fails(self):
+        self.hold_fetch_lock(1)
+        with (
+            mock.patch.object(
+                PokemonHelper,
+                "service_method",
+                side_effect=self.respond(pokemon_payload(1)),
+            ) as service_method,
+            mock.patch.object(PokemonHelper, "wait_for_fetches"),
+            self.assertLogs("pokemons.helpers", level="WARNING"),
+        ):
+            pokemon = PokemonHelper.get_object(1)
+
+        service_method.assert_called_once()
+        self.assertEqual(pokemon.external_id, 1)
+        # o lock continua sendo do outro worker
+        self.assertTrue(cache.get(PokemonHelper.fetch_lock_key(1)))
+
+    def test_lock_is_released_after_the_fetch(self):
+        with (
+            mock.patch.object(
+                PokemonHelper,
+                "service_method",
+                side_effect=self.respond(pokemon_payload(1)),
+            ),
+            self.assertLogs("pokemons.helpers", level="WARNING"),
+        ):
+            PokemonHelper.get_object(1)
+
+        self.assertIsNone(cache.get(PokemonHelper.fetch_lock_key(1)))
+
+    def test_get_many_fetches_only_the_unlocked_keys(self):
+        self.hold_fetch_lock(2)
+        with (
+            mock.patch.object(
+                PokemonHelper,
+                "service_method",
+                side_effect=self.respond(pokemon_payload(1)),
+            ) as service_method,
+            mock.patch.object(
+                PokemonHelper, "wait_for_fetches", side_effect=self.finish_fetch
+            ),
+        ):
+            pokemons = PokemonHelper.get_many([1, 2], with_relations=False)
+
+        self.assertEqual([p.external_id for p in pokemons], [1, 2])
+        service_method.assert_called_once()
+        self.assertEqual(service_method.call_args.args, (1,))
+        self.assertIsNone(cache.get(PokemonHelper.fetch_lock_key(1)))
+
+
+class NegativeCacheTestCase(PokeApiDataTestCase):
+    def test_not_found_is_answered_locally_the_second_time(self):
+        with mock.patch.object(
+            PokemonHelper, "service_method", side_effect=self.respond()
+        ) as service_method:
+            for _ in range(2):
+                with self.assertRaises(PokeApiNotFound):
+                    PokemonHelper.get_object("MissingNo")
+
+        service_method.assert_called_once()
+        self.assertTrue(cache.get(PokemonHelper.not_found_cache_key("missingno")))
+
+    def test_get_many_skips_cached_not_found_identifiers(self):
+        with (
+            mock.patch.object(
+                PokemonHelper,
+                "service_method",
+                side_effect=self.respond(pokemon_payload(1)),
+            ) as service_method,
+            self.assertLogs("pokemons.helpers", level="WARNING"),
+        ):
+            PokemonHelper.get_many([1, "missingno"], with_relations=False)
+            service_method.reset_mock()
+            pokemons = PokemonHelper.get_many([1, "missingno"], with_relations=False)
+
+        service_method.assert_not_called()
+        self.assertEqual([p.external_id for p in pokemons], [1])
+
+    def test_other_errors_are_not_cached(self):
+        with mock.patch.object(
+            PokemonHelper,
+            "service_method",
+            side_effect=PokeApiError("pokemon/missingno", 500),
+        ) as service_method:
+            for _ in range(2):
+                with self.assertRaises(PokeApiError):
+                    PokemonHelper.get_object("missingno")
+
+        self.assertEqual(service_method.call_count, 2)
+        self.assertIsNone(cache.get(PokemonHelper.not_found_cache_key("missingno")))
+
+
+class ConditionalRefreshTestCase(PokeApiDataTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.set(PokemonSpecieHelper.not_found_cache_key(1), True)
+        self.pokemon = self.create_pokemon(1, age=timedelta(days=60))
+        self.pokemon.etag = '"v1"'
+        self.pokemon.save(update_fields=["etag"])
+
+    def refresh(self, data: dict | None, headers: dict | None = None, many=False):
+        with (
+            mock.patch.object(
+                PokemonHelper, "service_method", return_value=(data, headers or {})
+            ) as self.service_method,
+            self.assertLogs("pokemons.helpers", level="WARNING"),
+        ):
+            if many:
+                PokemonHelper.get_many([1], force_update=True)
+            else:
+                PokemonHelper.get_object(1, force_update=True)
+        return Pokemon.objects.get(external_id=1)
+
+    def assertVerifiedOnly(self, pokemon: Pokemon):
+        self.assertGreater(pokemon.verified_at, self.pokemon.verified_at)
+        self.assertEqual(pokemon.last_updated, self.pokemon.last_updated)
+        self.assertEqual(pokemon.data, self.pokemon.data)
+        self.assertEqual(pokemon.content_hash, self.pokemon.content_hash)
+
+    def test_request_is_conditional(self):
+        self.refresh(None)
+        headers = self.service_method.call_args.kwargs["headers"]
+        self.assertEqual(headers, {"If-None-Match": '"v1"'})
+
+    def test_not_modified_only_records_the_verification(self):
+        pokemon = self.refresh(None, {"ETag": '"v2"'})
+        self.assertVerifiedOnly(pokemon)
+        self.assertEqual(pokemon.etag, '"v2"')
+
+    def test_same_content_only_records_the_verification(self):
+        pokemon = self.refresh(pokemon_payload(1))
+        self.assertVerifiedOnly(pokemon)
+        self.assertEqual(pokemon.etag, '"v1"')
+
+    def test_get_many_only_records_the_verification(self):
+        pokemon = self.refresh(None, {"ETag": '"v2"'}, many=True)
+        self.assertVerifiedOnly(pokemon)
+        self.assertEqual(pokemon.etag, '"v2"')
+
+    def test_changed_content_is_rewritten(self):
+        pokemon = self.refresh(pokemon_payload(1, weight=60))
+        self.assertGreater(pokemon.last_updated, self.pokemon.last_updated)
+        self.assertEqual(pokemon.weight, 60)
+        self.assertNotEqual(pokemon.content_hash, self.pokemon.content_hash)
+
+
+@override_settings(POKEAPI_TTL_JITTER=0.2)
+class TTLJitterTestCase(SimpleTestCase):
+    def test_ttl_is_deterministic_per_row(self):
+        self.assertEqual(PokemonHelper.get_ttl(25), PokemonHelper.get_ttl(25))
+
+    def test_ttl_is_shortened_by_at_most_the_jitter(self):
+        for external_id in range(1, 200):
+            ttl = PokemonHelper.get_ttl(external_id, cache_days=10)
+            self.assertGreaterEqual(ttl, timedelta(days=8))
+            self.assertLessEqual(ttl, timedelta(days=10))
+
+    def test_rows_ingested_together_expire_apart(self):
+        ttls = {PokemonHelper.get_ttl(external_id) for external_id in range(1, 200)}
+        self.assertGreater(len(ttls), 150)
+
+    def test_helpers_jitter_independently(self):
+        self.assertNotEqual(
+            PokemonHelper.get_ttl(25, cache_days=10),
+            PokemonSpecieHelper.get_ttl(25, cache_days=10),
+        )
+
+    @override_settings(POKEAPI_TTL_JITTER=0)
+    def test_no_jitter(self):
+        self.assertEqual(PokemonHelper.get_ttl(25, cache_days=10), timedelta(days=10))
+
+
+class FilteredListTestCase(PokeApiDataTestCase):
+    def setUp(self):
+        super().setUp()
+        for external_id, height, weight in [(1, 5, 40), (2, 10, 130), (3, 20, 1000)]:
+            self.create_pokemon(external_id, height=height, weight=weight)
+        for external_id in range(4, 8):
+            self.create_pokemon(external_id, height=10, weight=100)
+        self.user = User.objects.create_user(email="ash@example.com")
+
+    def list(self, url: str) -> dict:
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.user)
+        view = PokemonViewSet.as_view({"get": "list"})
+        with (
+            mock.patch.object(PokemonHelper, "record_hits"),
+            mock.patch.object(PokemonHelper, "get_many") as get_many,
+            mock.patch("pokemons.views.PokeApiService") as service,
+        ):
+            response = view(request)
+
+        # filtros são respondidos só pelo catálogo local
+        get_many.assert_not_called()
+        service.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_weight_and_height_ranges(self):
+        page = self.list("/api/pokemons/?min_height=10&max_weight=130&min_weight=100")
+        self.assertEqual(
+            [p["name"] for p in page["results"]],
+            ["pokemon-2", "pokemon-4", "pokemon-5", "pokemon-6", "pokemon-7"],
+        )
+
+    def test_cursor_pages_follow_the_external_id(self):
+        url, names = "/api/pokemons/?min_height=10&limit=3", []
+        while url:
+            page = self.list(url)
+            self.assertLessEqual(len(page["results"]), 3)
+            names += [p["name"] for p in page["results"]]
+            url = page["next"]
+
+        self.assertEqual(names, [f"pokemon-{i}" for i in range(2, 8)])
+
+    def test_type_filter_matches_every_value(self):
+        queryset = mock.Mock()
+        PokemonFilter().filter_contains(queryset, "types", "Fire, flying,")
+        queryset.filter.assert_called_once_with(types__contains=["fire", "flying"])
+
+    def test_empty_type_filter_is_ignored(self):
+        queryset = mock.Mock()
+        self.assertIs(
+            PokemonFilter().filter_contains(queryset, "types", " , "), queryset
+        )
+        queryset.filter.assert_not_called()
+
+
+class PokemonListSerializerTestCase(PokeApiDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="ash@example.com")
+
+    def serialize(self, count: int, user) -> list[dict]:
+        pokemons = [self.create_pokemon(external_id) for external_id in range(count)]
+        for pokemon in pokemons[::2]:
+            FavoritedPokemon.objects.create(user=self.user, pokemon=pokemon)
+        PokemonHelper.prefetch_species(pokemons)
+
+        # uma query para os favoritos da página inteira, qualquer que seja o tamanho
+        with self.assertNumQueries(1 if user.is_authenticated else 0):
+            return PokemonSerializer(pokemons, many=True, context={"user": user}).data
+
+    def test_favorites_are_resolved_in_one_query(self):
+        data = self.serialize(10, self.user)
+        self.assertEqual([item["is_favorited"] for item in data], [True, False] * 5)
+
+    def test_anonymous_user_makes_no_query(self):
+        data = self.serialize(4, AnonymousUser())
+        self.assertFalse(any(item["is_favorited"] for item in data))
+
+
+@override_settings(POKEAPI_TTL_JITTER=0)
+class GetHydratedTestCase(PokeApiDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pokemon = self.create_pokemon(1)
+        self.specie = PokemonSpecieHelper.create_instance(
+            {"id": 1, "name": "pokemon-1", **SPECIE_DATA}, pokemon=self.pokemon
+        )
+        self.chain = PokemonEvolutionChainHelper.create_instance(
+            {"id": 1, "chain": {}}, specie=self.specie
+        )
+
+    def test_warm_object_is_read_in_two_queries(self):
+        with self.assertNumQueries(2):
+            pokemon = PokemonHelper.get_hydrated("Pokemon-1")
+            # specie e cadeia já carregadas, sem queries extras
+            self.assertEqual(pokemon.specie, self.specie)
+            self.assertEqual(list(pokemon.evolution_chains.all()), [self.chain])
+
+    def test_get_object_uses_the_hydrated_read(self):
+        with (
+            mock.patch.object(PokemonHelper, "service_method") as service_method,
+            self.assertNumQueries(2),
+        ):
+            self.assertEqual(PokemonHelper.get_object(1), self.pokemon)
+        service_method.assert_not_called()
+
+    def test_missing_chain_falls_back(self):
+        self.chain.delete()
+        self.assertIsNone(PokemonHelper.get_hydrated(1))
+
+    def test_expired_specie_falls_back(self):
+        PokemonSpecie.objects.filter(pk=self.specie.pk).update(
+            verified_at=timezone.now() - timedelta(days=365)
+        )
+        self.assertIsNone(PokemonHelper.get_hydrated(1))
+
+    @mock.patch.object(PokemonSpecieHelper, "hard_expiry_days", 30)
+    @mock.patch.object(PokemonSpecieHelper, "stale_while_revalidate", True)
+    def test_stale_specie_is_served_and_refreshed(self):
+        PokemonSpecie.objects.filter(pk=self.specie.pk).update(
+            verified_at=timezone.now() - timedelta(days=10)
+        )
+        with mock.patch.object(
+            PokemonSpecieHelper, "schedule_refresh"
+        ) as schedule_refresh:
+            self.assertEqual(PokemonHelper.get_hydrated(1), self.pokemon)
+        schedule_refresh.assert_called_once_with(1)
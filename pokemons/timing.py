@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+CACHE_HIT = "hit"
+CACHE_STALE = "stale"
+CACHE_MISS = "miss"
+
+# métricas do request atual (ver ServerTimingMiddleware)
+_metrics: ContextVar["RequestMetrics | None"] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+class RequestMetrics:
+    """
+    Where a request spent its time: duration and count per metric (db,
+    upstream, serialize...) and cache lookups per helper. Shared by the
+    worker threads and tasks the request spawns, hence the lock.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.cache = defaultdict(lambda: {CACHE_HIT: 0, CACHE_STALE: 0, CACHE_MISS: 0})
+        self._lock = threading.Lock()
+
+    def add(self, name: str, elapsed: float, count: int = 1):
+        with self._lock:
+            self.durations[name] += elapsed
+            self.counts[name] += count
+
+    def add_cache(self, helper: str, state: str, count: int = 1):
+        with self._lock:
+            self.cache[helper][state] += count
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Value of the Server-Timing header: one entry per metric (duration in
+        ms, count in the description) and one per helper with its cache
+        lookups.
+        """
+        entries = [
+            f'{name};dur={self.durations[name] * 1000:.1f};desc="{self.counts[name]}x"'
+            for name in sorted(self.durations)
+        ]
+        entries += [
+            f'cache-{helper.lower()};desc="'
+            + " ".join(f"{state}={count}" for state, count in states.items())
+            + '"'
+            for helper, states in sorted(self.cache.items())
+        ]
+        if self.total is not None:
+            entries.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "total_ms": None if self.total is None else round(self.total * 1000, 1),
+            **{
+                f"{name}_ms": round(duration * 1000, 1)
+                for name, duration in self.durations.items()
+            },
+            **{f"{name}_count": count for name, count in self.counts.items()},
+            "cache": {helper: dict(states) for helper, states in self.cache.items()},
+        }
+
+
+@contextmanager
+def collect_metrics():
+    metrics = RequestMetrics()
+    token = _metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _metrics.reset(token)
+
+
+def get_metrics() -> RequestMetrics | None:
+    return _metrics.get()
+
+
+def record(name: str, elapsed: float, count: int = 1):
+    metrics = _metrics.get()
+    if metrics is not None:
+        metrics.add(name, elapsed, count)
+
+
+def record_cache(helper: str, state: str, count: int = 1):
+    metrics = _metrics.get()
+    if metrics is not None and count:
+        metrics.add_cache(helper, state, count)
+
+
+@contextmanager
+def measure(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """
+    connection.execute_wrapper hook: times every query of the request.
+    """
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record("db", time.perf_counter() - started)
+
+
+def install_db_execute_wrapper(sender, connection, **kwargs):
+    """
+    connection_created receiver: every connection, in whatever thread it is
+    opened, times its queries. Async views run the ORM in sync_to_async
+    threads, whose connections the middleware never sees; the request
+    metrics reach them through the context copied into the thread.
+    """
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
@@ -1,7 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import PokemonViewSet, FavoritedPokemonViewSet, PokemonEvolutionChainViewSet
+from .views import (
+    AsyncPokemonView,
+    PokemonViewSet,
+    FavoritedPokemonViewSet,
+    PokemonEvolutionChainViewSet,
+)
 
 app_name = "pokemons"
 
@@ -17,4 +22,10 @@ router.register(
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("async/pokemons/", AsyncPokemonView.as_view(), name="async-pokemon-list"),
+    path(
+        "async/pokemons/<str:pk>/",
+        AsyncPokemonView.as_view(),
+        name="async-pokemon-detail",
+    ),
 ]
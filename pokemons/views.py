@@ -1,19 +1,166 @@
 from urllib.parse import urlparse, parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.exceptions import NotFound
-from pokemons.helpers import PokemonHelper
-from pokemons.services import PokeApiService
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
+from pokemons.filters import PokemonFilter
+from pokemons.helpers import PokemonHelper, mark_response_stale
+from pokemons.services import (
+    AsyncPokeApiService,
+    PokeApiDeadlineExceeded,
+    PokeApiError,
+    PokeApiNotFound,
+    PokeApiRateLimited,
+    PokeApiService,
+    PokeApiUnavailable,
+)
 from pokemons.models import Pokemon, FavoritedPokemon, PokemonEvolutionChain
 from pokemons.serializers import PokemonSerializer
 
 
-class PokemonViewSet(viewsets.ModelViewSet):
+def build_page_url(request, limit: int, offset: int) -> str:
+    return f"{request.build_absolute_uri(request.path)}?limit={limit}&offset={offset}"
+
+
+def get_page_params(params) -> tuple[int, int]:
+    """
+    Reads limit and offset from the query string. limit is capped by
+    POKEAPI_MAX_PAGE_SIZE and negative values are clamped to 0, since they
+    would break the queryset slice; non-integers raise ValidationError (400).
+    """
+    try:
+        limit = int(params.get("limit", 20))
+        offset = int(params.get("offset", 0))
+    except ValueError:
+        raise ValidationError({"detail": "limit and offset must be integers."})
+    return min(max(0, limit), settings.POKEAPI_MAX_PAGE_SIZE), max(0, offset)
+
+
+def get_upstream_error_response(error: PokeApiError, response_class=Response):
+    """
+    Builds the response for a failed PokeAPI call: 404 only when the PokeAPI
+    does not know the identifier, 429/503 when the call was refused (rate
+    limited or circuit open, with a Retry-After header), 504 when it ran out
+    of the request deadline and 502 for any other upstream error.
+    """
+    if isinstance(error, PokeApiNotFound):
+        detail, status_code = "Not found.", status.HTTP_404_NOT_FOUND
+    elif isinstance(
+        error, (PokeApiRateLimited, PokeApiUnavailable, PokeApiDeadlineExceeded)
+    ):
+        detail = "PokeAPI is temporarily unavailable, try again later."
+        status_code = error.status_code
+    else:
+        detail, status_code = "PokeAPI request failed.", status.HTTP_502_BAD_GATEWAY
+
+    response = response_class({"detail": detail}, status=status_code)
+    if getattr(error, "retry_after", None):
+        response["Retry-After"] = str(error.retry_after)
+    return response
+
+
+class UpstreamErrorMixin:
+    """
+    Answers the PokeAPI errors raised anywhere in the view (get_object
+    included) with get_upstream_error_response instead of a 500.
+    """
+
+    def handle_exception(self, exc):
+        if isinstance(exc, PokeApiError):
+            return get_upstream_error_response(exc)
+        return super().handle_exception(exc)
+
+
+def get_local_page(
+    request, limit: int, offset: int, partial: bool = False
+) -> dict | None:
+    """
+    Returns the page (count, next, previous and Pokémon names) from the local
+    catalog, or None when the catalog is not known to be complete.
+    partial=True pages over whatever is stored locally instead (used when
+    the PokeAPI is unavailable).
+    """
+    if partial:
+        count = Pokemon.objects.count()
+        mark_response_stale("pokemon-list")
+    elif not settings.POKEAPI_LOCAL_CATALOG:
+        return None
+    else:
+        count = PokemonHelper.get_local_catalog_count()
+        if count is None:
+            return None
+
+    # local catalog is complete: page over the DB, no upstream calls
+    names = list(
+        Pokemon.objects.order_by("external_id").values_list("name", flat=True)[
+            offset : offset + limit
+        ]
+    )
+    return {
+        "count": count,
+        "next": (
+            build_page_url(request, limit, offset + limit)
+            if offset + limit < count
+            else None
+        ),
+        "previous": (
+            build_page_url(request, limit, max(offset - limit, 0))
+            if offset > 0
+            else None
+        ),
+        "names": names,
+    }
+
+
+def get_upstream_page(request, limit: int, offset: int, api_response: dict) -> dict:
+    """
+    Returns the page (count, next, previous and Pokémon names) from a PokeAPI
+    list response, converting its URLs to local ones.
+    """
+    PokemonHelper.set_upstream_count(api_response.get("count"))
+
+    # utility function to convert PokeAPI URLs to local URLs
+    def convert_url(external_url):
+        if not external_url:
+            return None
+        parsed = urlparse(external_url)
+        params = parse_qs(parsed.query)
+        next_limit = params.get("limit", [limit])[0]
+        next_offset = params.get("offset", [offset])[0]
+        return build_page_url(request, next_limit, next_offset)
+
+    return {
+        "count": api_response.get("count"),
+        "next": convert_url(api_response.get("next")),
+        "previous": convert_url(api_response.get("previous")),
+        "names": [
+            item.get("name")
+            for item in api_response.get("results", [])
+            if item.get("name")
+        ],
+    }
+
+
+class PokemonCursorPagination(CursorPagination):
+    ordering = "external_id"
+    page_size = 20
+    page_size_query_param = "limit"
+    max_page_size = settings.POKEAPI_MAX_PAGE_SIZE
+
+
+class PokemonViewSet(UpstreamErrorMixin, viewsets.ModelViewSet):
     queryset = Pokemon.objects.all()
     serializer_class = PokemonSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filterset_class = PokemonFilter
+    pagination_class = PokemonCursorPagination
 
     def get_object(self):
         """
@@ -25,58 +172,59 @@ class PokemonViewSet(viewsets.ModelViewSet):
         if identifier.isdigit():
             identifier = int(identifier)
 
-        try:
-            pokemon = PokemonHelper.get_object(identifier)
-        except Exception:
-            raise NotFound(f"Pokemon '{identifier}' not found or could not be fetched.")
-
-        return pokemon
+        # erros da PokeAPI viram 404/429/503/504 em handle_exception
+        return PokemonHelper.get_object(identifier)
 
     def list(self, request, *args, **kwargs):
         """
-        Overrides default list to fetch the list directly from the PokeAPI,
-        then ensures each Pokémon is synchronized locally via PokemonHelper.
+        Overrides default list to serve the page from the local catalog when it
+        is known to be complete, falling back to the PokeAPI list otherwise.
+        The page is then synchronized locally via PokemonHelper.get_many.
+        Attribute filters are answered locally by filtered_list.
         """
-        limit = int(request.query_params.get("limit", 20))
-        offset = int(request.query_params.get("offset", 0))
-
-        service = PokeApiService()
-        api_response = service.get_pokemon_list(limit=limit, offset=offset)
-
-        results = []
-        for item in api_response.get("results", []):
-            name = item.get("name")
-            if not name:
-                continue
-
-            # get or create/update the pokemon via our helper
-            pokemon = PokemonHelper.get_object(name)
-            results.append(pokemon)
+        filter_params = set(PokemonFilter.base_filters) | {"cursor"}
+        if filter_params & set(request.query_params):
+            return self.filtered_list(request)
+
+        limit, offset = get_page_params(request.query_params)
+
+        page = get_local_page(request, limit, offset)
+        if page is None:
+            service = PokeApiService()
+            try:
+                api_response = service.get_pokemon_list(limit=limit, offset=offset)
+                page = get_upstream_page(request, limit, offset, api_response)
+            except PokeApiError:
+                # PokeAPI fora do ar, com erro ou sem prazo: pagina sobre o DB
+                page = get_local_page(request, limit, offset, partial=True)
+
+        # get or create/update the whole page in bulk via our helper
+        results = PokemonHelper.get_many(page.pop("names"))
+        PokemonHelper.record_hits(results)
+        PokemonHelper.prefetch_species(results)
 
         # serialize local Pokémon objects
         serializer = self.get_serializer(results, many=True)
 
-        # utility function to convert PokeAPI URLs to local URLs
-        def convert_url(external_url):
-            if not external_url:
-                return None
-            parsed = urlparse(external_url)
-            params = parse_qs(parsed.query)
-            next_limit = params.get("limit", [limit])[0]
-            next_offset = params.get("offset", [offset])[0]
-            base_url = request.build_absolute_uri(request.path)
-            return f"{base_url}?limit={next_limit}&offset={next_offset}"
-
         return Response(
-            {
-                "count": api_response.get("count"),
-                "next": convert_url(api_response.get("next")),
-                "previous": convert_url(api_response.get("previous")),
-                "results": serializer.data,
-            },
+            {**page, "results": serializer.data},
             status=status.HTTP_200_OK,
         )
 
+    def filtered_list(self, request):
+        """
+        Answers attribute filters (type, ability, weight and height ranges)
+        from the local catalog only, with keyset (cursor) pagination.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+
+        PokemonHelper.record_hits(page)
+        PokemonHelper.prefetch_species(page)
+
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def retrieve(self, request, *args, **kwargs):
         """
         Overrides default retrieve to use the PokemonHelper,
@@ -88,15 +236,12 @@ class PokemonViewSet(viewsets.ModelViewSet):
         if identifier.isdigit():
             identifier = int(identifier)
 
-        try:
-            pokemon = PokemonHelper.get_object(identifier)
-        except Exception:
-            return Response(
-                {
-                    "detail": f"Pokémon '{identifier}' not found or could not be fetched."
-                },
-                status=status.HTTP_404_NOT_FOUND,
-            )
+        # só PokeApiNotFound é 404: com rate limit, circuito aberto ou sem prazo
+        # o Pokémon pode existir (ver handle_exception)
+        pokemon = PokemonHelper.get_object(identifier)
+
+        PokemonHelper.record_hits([pokemon])
+        PokemonHelper.prefetch_species([pokemon])
 
         serializer = self.get_serializer(pokemon)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -116,7 +261,7 @@ class PokemonViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class PokemonEvolutionChainViewSet(viewsets.ViewSet):
+class PokemonEvolutionChainViewSet(UpstreamErrorMixin, viewsets.ViewSet):
     """
     Retrieve the evolution chain of a given Pokémon.
     """
@@ -131,10 +276,7 @@ class PokemonEvolutionChainViewSet(viewsets.ViewSet):
             raise NotFound("Pokémon identifier is required.")
 
         # Resolve Pokémon by name or external_id
-        try:
-            pokemon = PokemonHelper.get_object(pk)
-        except Exception:
-            raise NotFound(f"Pokémon '{pk}' not found.")
+        pokemon = PokemonHelper.get_object(pk)
 
         # Find the evolution chain related to this Pokémon
         chain_qs = PokemonEvolutionChain.objects.filter(pokemons=pokemon)
@@ -164,15 +306,95 @@ class FavoritedPokemonViewSet(viewsets.ViewSet):
 
     def list(self, request):
         user = request.user
-        favorites_qs = FavoritedPokemon.objects.filter(user=user).select_related(
-            "pokemon"
+        favorites_qs = (
+            FavoritedPokemon.objects.filter(user=user)
+            .select_related("pokemon")
+            .defer("pokemon__data")
         )
 
         paginator = FavoritedPokemonPagination()
         page = paginator.paginate_queryset(favorites_qs, request)
         pokemons = [fav.pokemon for fav in page] if page else []
+        PokemonHelper.prefetch_species(pokemons)
 
         serializer = PokemonSerializer(
             pokemons, many=True, context={"request": request}
         )
         return paginator.get_paginated_response(serializer.data)
+
+
+class AsyncPokemonView(View):
+    """
+    Async versions of the Pokémon list and retrieve endpoints for the ASGI
+    stack: the upstream fetches run on the event loop, so a single worker can
+    keep many of them in flight. Attribute filters are served by the sync
+    list, which never calls the PokeAPI.
+    """
+
+    async def get(self, request, pk=None):
+        user = await sync_to_async(self.authenticate)(request)
+        if user is None or not user.is_authenticated:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if pk is None:
+            return await self.list(request, user)
+        return await self.retrieve(request, user, pk)
+
+    @staticmethod
+    def authenticate(request):
+        drf_request = Request(
+            request,
+            authenticators=[
+                auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+            ],
+        )
+        try:
+            return drf_request.user
+        except AuthenticationFailed:
+            return None
+
+    @staticmethod
+    def serialize(pokemons: list[Pokemon], user, many: bool = True):
+        PokemonHelper.record_hits(pokemons)
+        PokemonHelper.prefetch_species(pokemons)
+        instance = pokemons if many else pokemons[0]
+        return PokemonSerializer(instance, many=many, context={"user": user}).data
+
+    async def list(self, request, user):
+        try:
+            limit, offset = get_page_params(request.GET)
+        except ValidationError as error:
+            return JsonResponse(error.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        page = await sync_to_async(get_local_page)(request, limit, offset)
+        if page is None:
+            service = AsyncPokeApiService()
+            try:
+                api_response = await service.get_pokemon_list(
+                    limit=limit, offset=offset
+                )
+                page = await sync_to_async(get_upstream_page)(
+                    request, limit, offset, api_response
+                )
+            except PokeApiError:
+                page = await sync_to_async(get_local_page)(
+                    request, limit, offset, partial=True
+                )
+
+        results = await PokemonHelper.aget_many(page.pop("names"))
+        data = await sync_to_async(self.serialize)(results, user)
+        return JsonResponse({**page, "results": data}, status=status.HTTP_200_OK)
+
+    async def retrieve(self, request, user, pk):
+        identifier = int(pk) if pk.isdigit() else pk
+
+        try:
+            pokemon = await PokemonHelper.aget_object(identifier)
+        except PokeApiError as error:
+            return get_upstream_error_response(error, JsonResponse)
+
+        data = await sync_to_async(self.serialize)([pokemon], user, many=False)
+        return JsonResponse(data, status=status.HTTP_200_OK)
@@ -1,6 +1,8 @@
 import os
+import time
 
 from celery import Celery
+from celery.signals import task_postrun, task_prerun
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "service.settings")
@@ -17,3 +19,25 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 app.conf.task_track_started = True
+
+
+# início de cada task em execução neste worker, para a métrica de duração
+_task_started = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.monotonic()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is None:
+        return
+
+    from common.metrics import celery_task_seconds
+
+    celery_task_seconds.observe(
+        time.monotonic() - started, task=task.name, state=state or "UNKNOWN"
+    )
@@ -2,6 +2,7 @@ import logging
 import traceback
 from channelsmultiplexer import AsyncJsonWebsocketDemultiplexer
 from authentication.consumers import JWTTokenConsumer
+from common.metrics import websocket_connections, websocket_connections_total
 from users.consumers import LoggedUserConsumer
 
 logger = logging.getLogger(__name__)
@@ -21,6 +22,9 @@ class AppApplicationDemultiplexer(AsyncJsonWebsocketDemultiplexer):
                 f"WebSocket connecting for user: {getattr(user, 'id', 'anonymous')}"
             )
             await super().connect()
+            self.is_counted = True
+            websocket_connections.inc()
+            websocket_connections_total.inc()
         except Exception as e:
             logger.error(f"Error during WebSocket connection: {traceback.format_exc()}")
             await self.close(code=4000)
@@ -32,6 +36,9 @@ class AppApplicationDemultiplexer(AsyncJsonWebsocketDemultiplexer):
             logger.info(
                 f"WebSocket disconnecting for user: {getattr(user, 'id', 'anonymous')} with code: {close_code}"
             )
+            if getattr(self, "is_counted", False):
+                self.is_counted = False
+                websocket_connections.dec()
             await super().disconnect(close_code)
         except Exception as e:
             logger.error(
@@ -0,0 +1,149 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# módulos pesados que não devem ser carregados no boot dos workers
+HEAVY_MODULES = ("cv2", "pytesseract", "fitz", "pandas", "docx", "numpy", "bizdays")
+
+# cenário -> código medido num interpretador novo
+TARGETS = {
+    "common.utils": "import common.utils",
+    "make_api_request": "from common.utils import make_api_request",
+    "django.setup": "import django; django.setup()",
+    "worker": (
+        "import django; django.setup(); "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+}
+
+# pico de memória via VmHWM: no Linux o ru_maxrss herda o pico do processo pai
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+exec(sys.argv[1])
+elapsed = time.perf_counter() - started
+try:
+    with open("/proc/self/status") as status:
+        line = next(line for line in status if line.startswith("VmHWM:"))
+    max_rss_mb = int(line.split()[1]) / 1024
+except OSError:
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": max_rss_mb,
+    "modules": len(sys.modules),
+    "heavy_modules": [name for name in json.loads(sys.argv[2]) if name in sys.modules],
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the cold import time and resident memory of common.utils, "
+        "django.setup() and a full worker boot (URL conf loaded), each in a "
+        "fresh interpreter, and lists the heavy modules (OpenCV, Tesseract, "
+        "PyMuPDF, pandas...) they pull in. Optionally fails on regressions "
+        "against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--only",
+            action="append",
+            choices=list(TARGETS),
+            help="Measure only this scenario (can be repeated).",
+        )
+        parser.add_argument("--output", default="startup-benchmark.json")
+        parser.add_argument("--baseline", help="Results JSON to compare against.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed import time increase over the baseline (fraction).",
+        )
+
+    def handle(self, *args, **options):
+        results = {
+            name: self.measure(code, options["repeat"])
+            for name, code in TARGETS.items()
+            if not options["only"] or name in options["only"]
+        }
+
+        with open(options["output"], "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+        self.stdout.write(f"{'scenario':<20}{'ms':>10}{'rss MB':>10}{'modules':>10}")
+        for name, result in results.items():
+            line = (
+                f"{name:<20}{result['ms']:>10}{result['max_rss_mb']:>10}"
+                f"{result['modules']:>10}"
+            )
+            if result["heavy_modules"]:
+                line += f"  ({', '.join(result['heavy_modules'])})"
+            self.stdout.write(line)
+        self.stdout.write(f"Results saved to {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = self.compare(results, baseline, options["tolerance"])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f"{len(regressions)} regression(s) against baseline")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def measure(self, code: str, repeat: int) -> dict:
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE
+            ),
+        }
+        runs = []
+        for _ in range(repeat):
+            completed = subprocess.run(
+                [sys.executable, "-c", CHILD_SCRIPT, code, json.dumps(HEAVY_MODULES)],
+                capture_output=True,
+                text=True,
+                env=env,
+                cwd=settings.BASE_DIR,
+            )
+            if completed.returncode:
+                raise CommandError(f"{code!r} failed:\n{completed.stderr}")
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+        return {
+            "ms": round(statistics.median(run["seconds"] for run in runs) * 1000, 1),
+            "max_rss_mb": round(
+                statistics.median(run["max_rss_mb"] for run in runs), 1
+            ),
+            "modules": runs[-1]["modules"],
+            "heavy_modules": runs[-1]["heavy_modules"],
+        }
+
+    @staticmethod
+    def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+
+            if result["ms"] > base["ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {result['ms']}ms > baseline {base['ms']}ms "
+                    f"(+{tolerance:.0%} tolerance)"
+                )
+            new_modules = set(result["heavy_modules"]) - set(base["heavy_modules"])
+            if new_modules:
+                regressions.append(
+                    f"{name}: now imports {', '.join(sorted(new_modules))}"
+                )
+        return regressions
@@ -111,7 +111,6 @@ INSTALLED_APPS = [
     "mapwidgets",
     "import_export",
     "widget_tweaks",
-    "memoize",
     "polymorphic",
     "nested_admin",
     "multiselectfield",
@@ -142,6 +141,9 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.locale.LocaleMiddleware",
+    "pokemons.middlewares.ServerTimingMiddleware",
+    "pokemons.middlewares.StaleResponseMiddleware",
+    "pokemons.middlewares.RequestDeadlineMiddleware",
 ]
 
 APPEND_SLASH = False
@@ -585,3 +587,127 @@ MARTOR_ENABLE_CONFIGS = {
     "spellcheck": "false",  # Enable/disable spellcheck
     "hljs": "true",  # Enable/disable syntax highlighting
 }
+
+
+# HTTP (sessão compartilhada de common.utils.requests)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 10))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 20))
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", 200))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_RETRY_BACKOFF_FACTOR = float(os.getenv("HTTP_RETRY_BACKOFF_FACTOR", 0.5))
+
+
+# PokeAPI
+POKEAPI_MAX_CONCURRENCY = int(os.getenv("POKEAPI_MAX_CONCURRENCY", 8))
+POKEAPI_ASYNC_MAX_CONCURRENCY = int(os.getenv("POKEAPI_ASYNC_MAX_CONCURRENCY", 50))
+POKEAPI_LOCAL_CATALOG = os.getenv("POKEAPI_LOCAL_CATALOG", "True").lower() == "true"
+# limite de ?limit= nas listas: cada item da página é hidratado via get_many
+POKEAPI_MAX_PAGE_SIZE = int(os.getenv("POKEAPI_MAX_PAGE_SIZE", 100))
+POKEAPI_UPSTREAM_COUNT_CACHE_SECONDS = int(
+    os.getenv("POKEAPI_UPSTREAM_COUNT_CACHE_SECONDS", 60 * 60 * 24)
+)
+POKEAPI_STALE_WHILE_REVALIDATE = (
+    os.getenv("POKEAPI_STALE_WHILE_REVALIDATE", "True").lower() == "true"
+)
+POKEAPI_HARD_EXPIRY_DAYS = int(os.getenv("POKEAPI_HARD_EXPIRY_DAYS", 30))
+POKEAPI_REFRESH_LOCK_SECONDS = int(os.getenv("POKEAPI_REFRESH_LOCK_SECONDS", 60 * 5))
+POKEAPI_FETCH_LOCK_SECONDS = int(os.getenv("POKEAPI_FETCH_LOCK_SECONDS", 30))
+POKEAPI_FETCH_WAIT_SECONDS = float(os.getenv("POKEAPI_FETCH_WAIT_SECONDS", 5))
+POKEAPI_NOT_FOUND_CACHE_SECONDS = int(
+    os.getenv("POKEAPI_NOT_FOUND_CACHE_SECONDS", 60 * 10)
+)
+POKEAPI_SYNC_LOCK_SECONDS = int(os.getenv("POKEAPI_SYNC_LOCK_SECONDS", 60 * 10))
+# a task de sync para após POKEAPI_SYNC_BATCH_SECONDS e se reenfileira a partir
+# do checkpoint; os limites próprios substituem os do worker (90s/120s)
+POKEAPI_SYNC_BATCH_SECONDS = int(os.getenv("POKEAPI_SYNC_BATCH_SECONDS", 60 * 5))
+POKEAPI_SYNC_SOFT_TIME_LIMIT = int(os.getenv("POKEAPI_SYNC_SOFT_TIME_LIMIT", 60 * 15))
+POKEAPI_SYNC_TIME_LIMIT = POKEAPI_SYNC_SOFT_TIME_LIMIT + 60
+POKEAPI_TTL_JITTER = float(os.getenv("POKEAPI_TTL_JITTER", 0.2))
+POKEAPI_REFRESH_BUDGET = int(os.getenv("POKEAPI_REFRESH_BUDGET", 200))
+POKEAPI_REFRESH_LEAD_HOURS = int(os.getenv("POKEAPI_REFRESH_LEAD_HOURS", 12))
+POKEAPI_REFRESH_INTERVAL_MINUTES = int(
+    os.getenv("POKEAPI_REFRESH_INTERVAL_MINUTES", 15)
+)
+POKEAPI_POPULARITY_DECAY = float(os.getenv("POKEAPI_POPULARITY_DECAY", 0.9))
+POKEAPI_CHAIN_TREE_CACHE_SECONDS = int(
+    os.getenv("POKEAPI_CHAIN_TREE_CACHE_SECONDS", 60 * 60 * 24)
+)
+
+# Teto global de requisições à PokeAPI (somado entre todos os nós; 0 desliga).
+# As reservas são frações do bucket que cada lane deixa para as de maior
+# prioridade: interactive (usuários) > refresh > bulk (ingestão).
+POKEAPI_RATE_LIMIT_QPS = float(os.getenv("POKEAPI_RATE_LIMIT_QPS", 20))
+POKEAPI_RATE_LIMIT_BURST = float(os.getenv("POKEAPI_RATE_LIMIT_BURST", 0))
+POKEAPI_RATE_LIMIT_LANE_RESERVES = {
+    "interactive": 0,
+    "refresh": float(os.getenv("POKEAPI_RATE_LIMIT_REFRESH_RESERVE", 0.25)),
+    "bulk": float(os.getenv("POKEAPI_RATE_LIMIT_BULK_RESERVE", 0.5)),
+}
+POKEAPI_RATE_LIMIT_MAX_WAIT_SECONDS = {
+    "interactive": float(os.getenv("POKEAPI_RATE_LIMIT_INTERACTIVE_MAX_WAIT", 2)),
+    "refresh": float(os.getenv("POKEAPI_RATE_LIMIT_REFRESH_MAX_WAIT", 30)),
+    "bulk": float(os.getenv("POKEAPI_RATE_LIMIT_BULK_MAX_WAIT", 60 * 5)),
+}
+
+# Circuit breaker da PokeAPI: abre quando a taxa de erros ou de respostas
+# lentas na janela passa do limite; aberto, os helpers servem só o DB local.
+POKEAPI_CIRCUIT_BREAKER = os.getenv("POKEAPI_CIRCUIT_BREAKER", "True").lower() == "true"
+POKEAPI_CIRCUIT_WINDOW_SECONDS = int(os.getenv("POKEAPI_CIRCUIT_WINDOW_SECONDS", 60))
+POKEAPI_CIRCUIT_MIN_REQUESTS = int(os.getenv("POKEAPI_CIRCUIT_MIN_REQUESTS", 20))
+POKEAPI_CIRCUIT_ERROR_RATE = float(os.getenv("POKEAPI_CIRCUIT_ERROR_RATE", 0.5))
+POKEAPI_CIRCUIT_SLOW_SECONDS = float(os.getenv("POKEAPI_CIRCUIT_SLOW_SECONDS", 3))
+POKEAPI_CIRCUIT_SLOW_RATE = float(os.getenv("POKEAPI_CIRCUIT_SLOW_RATE", 0.8))
+POKEAPI_CIRCUIT_OPEN_SECONDS = int(os.getenv("POKEAPI_CIRCUIT_OPEN_SECONDS", 30))
+
+# Prazo de cada request para chamadas à PokeAPI (0 desliga), abaixo do
+# GUNICORN_TIMEOUT. O cliente pode reduzi-lo pelo cabeçalho (em segundos).
+POKEAPI_REQUEST_DEADLINE_SECONDS = float(
+    os.getenv("POKEAPI_REQUEST_DEADLINE_SECONDS", 25)
+)
+POKEAPI_REQUEST_DEADLINE_HEADER = os.getenv(
+    "POKEAPI_REQUEST_DEADLINE_HEADER", "X-Request-Timeout"
+)
+
+# Hedging: um GET sem resposta após o percentil de latência recente ganha uma
+# segunda tentativa (que consome token do rate limit); vale a primeira resposta.
+POKEAPI_HEDGE_REQUESTS = os.getenv("POKEAPI_HEDGE_REQUESTS", "False").lower() == "true"
+POKEAPI_HEDGE_PERCENTILE = float(os.getenv("POKEAPI_HEDGE_PERCENTILE", 95))
+POKEAPI_HEDGE_MIN_DELAY_SECONDS = float(
+    os.getenv("POKEAPI_HEDGE_MIN_DELAY_SECONDS", 0.05)
+)
+POKEAPI_HEDGE_MIN_SAMPLES = int(os.getenv("POKEAPI_HEDGE_MIN_SAMPLES", 50))
+POKEAPI_HEDGE_WINDOW = int(os.getenv("POKEAPI_HEDGE_WINDOW", 500))
+POKEAPI_HEDGE_MAX_WORKERS = int(os.getenv("POKEAPI_HEDGE_MAX_WORKERS", 32))
+
+# Record/replay das respostas da PokeAPI (pokemons.replay): "record" grava no
+# diretório, "replay" responde só a partir dele, sem rede. Vazio desliga.
+POKEAPI_REPLAY_MODE = os.getenv("POKEAPI_REPLAY_MODE", "")
+POKEAPI_REPLAY_DIR = os.getenv(
+    "POKEAPI_REPLAY_DIR", os.path.join(BASE_DIR, "pokeapi-replay")
+)
+
+# Métricas por request (pokemons.timing): tempo de DB, PokeAPI, serialização e
+# cache dos helpers no header Server-Timing e/ou numa linha de log JSON. O header
+# expõe detalhes internos a qualquer cliente: ligar só em ambientes de debug.
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "False").lower() == "true"
+SERVER_TIMING_LOG = os.getenv("SERVER_TIMING_LOG", "False").lower() == "true"
+
+# Métricas Prometheus em /metrics/ (common.metrics), somadas entre os workers
+# via Redis. Desligadas por padrão: o endpoint é público sem METRICS_TOKEN, com
+# ele o scrape precisa de "Authorization: Bearer".
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 5))
+# gauges de processos sem flush há mais que isso (workers mortos) são descartados
+METRICS_PROCESS_TIMEOUT_SECONDS = float(
+    os.getenv("METRICS_PROCESS_TIMEOUT_SECONDS", 60)
+)
+
+CELERY_BEAT_SCHEDULE = {
+    "refresh-pokeapi-cache": {
+        "task": "pokemons.tasks.refresh_pokeapi_cache",
+        "schedule": timedelta(minutes=POKEAPI_REFRESH_INTERVAL_MINUTES),
+    },
+}
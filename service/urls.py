@@ -9,7 +9,7 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
-from common.views import media_proxy
+from common.views import media_proxy, metrics
 
 
 def admin_redirect(request):
@@ -41,6 +41,7 @@ urlpatterns = [
         name="swagger-ui",
     ),
     path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
+    path("metrics/", metrics, name="metrics"),
     re_path(
         r"^media-proxy/(?P<token>[^/]+)/(?P<path>.+)$", media_proxy, name="media_proxy"
     ),